@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from datetime import date
+from typing import List, Optional
+
+from app.core.storage import ATLETA_PATTERN
 
 
 class SessionInput(BaseModel):
@@ -9,6 +12,16 @@ class SessionInput(BaseModel):
     peso_actual: float = Field(gt=0)
     reps: int = Field(ge=1)
     rpe: int = Field(ge=1, le=10)
+    # Opcional: separa el historial por atleta (sin atleta, el historial compartido de siempre)
+    atleta: Optional[str] = Field(default=None, pattern=ATLETA_PATTERN)
+
+
+class SessionRecord(BaseModel):
+    """Fila de historial.csv (export/import): mismas reglas que SessionInput, sin RPE."""
+    ejercicio: str = Field(min_length=1)
+    peso_actual: float = Field(gt=0)
+    reps: int = Field(ge=1)
+    fecha: date
 
 
 class SessionOutput(BaseModel):
@@ -18,3 +31,66 @@ class SessionOutput(BaseModel):
     rpe: int
     proximo_peso: float
     promedio_reps_semana: Optional[float]
+
+
+class SessionBatchResult(BaseModel):
+    ok: bool
+    item: Optional[SessionOutput] = None
+    error: Optional[str] = None
+
+
+class SessionBatchOutput(BaseModel):
+    ok: bool
+    registradas: int
+    resultados: List[SessionBatchResult]
+
+
+class ProgressPoint(BaseModel):
+    fecha: date
+    e1rm: float
+    e1rm_media: float
+    peso_max: float
+    tonelaje: float
+
+
+class ProgressTrend(BaseModel):
+    pendiente_semanal: float  # kg de e1RM por semana
+    e1rm_inicial: float
+    r2: float
+
+
+class ProgressOutput(BaseModel):
+    ejercicio: str
+    sesiones: int
+    series: int
+    e1rm_max: Optional[float]
+    tonelaje_total: float
+    tendencia: Optional[ProgressTrend]
+    puntos: List[ProgressPoint]
+
+
+class RecommendBatchInput(BaseModel):
+    """Entradas en columnas (mismo largo): una recomendación por posición."""
+    peso_actual: List[float] = Field(min_length=1)
+    reps: List[int] = Field(min_length=1)
+    rpe: List[int] = Field(min_length=1)
+
+
+class RecommendBatchOutput(BaseModel):
+    proximo_peso: List[float]
+
+
+class SimulationInput(BaseModel):
+    """Escenarios de planificación: reps/rpe fijos por escenario o un plan semana a semana."""
+    peso_inicial: List[float] = Field(min_length=1)
+    reps: List[int] | List[List[int]]
+    rpe: List[int] | List[List[int]]
+    semanas: int = Field(ge=1, le=520)
+    trayectorias: bool = False  # incluir la matriz completa de pesos por semana
+
+
+class SimulationOutput(BaseModel):
+    escenarios: int
+    semanas: int
+    peso_final: List[float]
+    trayectorias: Optional[List[List[float]]] = None
@@ -3,6 +3,8 @@ from __future__ import annotations
 from pydantic import BaseModel, Field
 from typing import List, Optional
 
+from app.core.storage import ATLETA_PATTERN
+
 
 class FoodItem(BaseModel):
     nombre: str
@@ -29,6 +31,7 @@ class MealInput(BaseModel):
     prot_100: Optional[float] = Field(default=None, ge=0)
     carb_100: Optional[float] = Field(default=None, ge=0)
     grasa_100: Optional[float] = Field(default=None, ge=0)
+    atleta: Optional[str] = Field(default=None, pattern=ATLETA_PATTERN)
 
 
 class MealEntry(BaseModel):
@@ -51,6 +54,38 @@ class DaySummary(BaseModel):
     comidas: List[MealEntry]
 
 
+class MealBatchResult(BaseModel):
+    ok: bool
+    entry: Optional[MealEntry] = None
+    error: Optional[str] = None
+
+
+class MealBatchOutput(BaseModel):
+    ok: bool
+    registradas: int
+    resultados: List[MealBatchResult]
+
+
+class DayTotals(BaseModel):
+    fecha: str
+    kcal: float
+    prot: float
+    carb: float
+    grasa: float
+    comidas: int
+
+
+class RangeSummary(BaseModel):
+    desde: str
+    hasta: str
+    kcal: float
+    prot: float
+    carb: float
+    grasa: float
+    comidas: int
+    dias: List[DayTotals]
+
+
 class ProductInfo(BaseModel):
     nombre: str
     marca: Optional[str] = None
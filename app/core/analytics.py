@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    # numpy se importa en el primer cálculo: importar este módulo (p. ej. por sus
+    # constantes) no lo carga
+    import numpy as np
+
+# Puntos por defecto de la curva enviada al navegador
+DEFAULT_POINTS = 200
+# Ventana (días) de la media móvil de e1RM
+DEFAULT_WINDOW = 28
+
+
+def estimated_1rm(pesos: np.ndarray, reps: np.ndarray) -> np.ndarray:
+    """1RM estimado (Epley): peso * (1 + reps/30); con 1 rep es el propio peso."""
+    import numpy as np
+
+    return np.where(reps <= 1, pesos, pesos * (1.0 + reps / 30.0))
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Índices elegidos por Largest-Triangle-Three-Buckets (conserva picos y forma).
+
+    Siempre incluye el primer y el último punto. Si ya hay `n_out` puntos o menos,
+    devuelve todos.
+    """
+    import numpy as np
+
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # Límites de los n_out - 2 baldes interiores
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Promedio del balde siguiente (o el último punto)
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def progress(
+    fechas: Sequence[int],
+    pesos: Sequence[float],
+    reps: Sequence[int],
+    *,
+    points: int = DEFAULT_POINTS,
+    window: int = DEFAULT_WINDOW,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+) -> Dict[str, object]:
+    """Métricas de progreso de un ejercicio a partir de sus series (ordinales de fecha ordenados).
+
+    Agrupa por día (e1RM máximo, peso máximo, tonelaje = Σ peso·reps), calcula la
+    media móvil de e1RM en una ventana de `window` días y la tendencia lineal, todo
+    en pasadas vectorizadas; la curva se reduce a `points` puntos con LTTB.
+    """
+    import numpy as np
+
+    f = np.asarray(fechas, dtype=np.int64)
+    w = np.asarray(pesos, dtype=np.float64)
+    r = np.asarray(reps, dtype=np.int64)
+    keep = np.isfinite(w) & (w > 0) & (r > 0)
+    if desde is not None:
+        keep &= f >= desde.toordinal()
+    if hasta is not None:
+        keep &= f <= hasta.toordinal()
+    f, w, r = f[keep], w[keep], r[keep]
+    if f.size == 0:
+        return {"sesiones": 0, "series": 0, "e1rm_max": None, "tonelaje_total": 0.0, "tendencia": None, "puntos": []}
+
+    # Agrupación por día: las fechas vienen ordenadas, así que alcanza con reduceat
+    dias, starts = np.unique(f, return_index=True)
+    e1rm_dia = np.maximum.reduceat(estimated_1rm(w, r), starts)
+    peso_dia = np.maximum.reduceat(w, starts)
+    tonelaje_dia = np.add.reduceat(w * r, starts)
+
+    # Media móvil por calendario: para cada día, los días dentro de (d - window, d]
+    acum = np.concatenate(([0.0], np.cumsum(e1rm_dia)))
+    inicio = np.searchsorted(dias, dias - window + 1, side="left")
+    fin = np.arange(1, dias.size + 1)
+    media = (acum[fin] - acum[inicio]) / (fin - inicio)
+
+    tendencia = None
+    if dias.size >= 2:
+        x = (dias - dias[0]).astype(np.float64)
+        pendiente, intercepto = np.polyfit(x, e1rm_dia, 1)
+        ajuste = pendiente * x + intercepto
+        ss_tot = float(((e1rm_dia - e1rm_dia.mean()) ** 2).sum())
+        r2 = 1.0 - float(((e1rm_dia - ajuste) ** 2).sum()) / ss_tot if ss_tot > 0 else 1.0
+        tendencia = {
+            "pendiente_semanal": round(float(pendiente) * 7, 3),
+            "e1rm_inicial": round(float(intercepto), 2),
+            "r2": round(r2, 4),
+        }
+
+    idx = lttb(dias.astype(np.float64), e1rm_dia, max(points, 2))
+    puntos: List[Dict[str, object]] = [
+        {
+            "fecha": date.fromordinal(int(d)).isoformat(),
+            "e1rm": round(float(e), 2),
+            "e1rm_media": round(float(m), 2),
+            "peso_max": round(float(p), 2),
+            "tonelaje": round(float(t), 2),
+        }
+        for d, e, m, p, t in zip(dias[idx], e1rm_dia[idx], media[idx], peso_dia[idx], tonelaje_dia[idx])
+    ]
+    return {
+        "sesiones": int(dias.size),
+        "series": int(f.size),
+        "e1rm_max": round(float(e1rm_dia.max()), 2),
+        "tonelaje_total": round(float(tonelaje_dia.sum()), 2),
+        "tendencia": tendencia,
+        "puntos": puntos,
+    }
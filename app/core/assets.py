@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # opcional: sin el paquete `brotli` se sirve gzip
+    brotli = None  # type: ignore[assignment]
+
+from app.core.httpcache import IMMUTABLE, REVALIDATE, accepted_encodings, etag_matches
+
+FRONTEND_DIR = Path(__file__).resolve().parent.parent / "frontend"
+
+# Tipos que vale la pena comprimir (las imágenes JPEG/PNG ya vienen comprimidas)
+_COMPRESSIBLE = re.compile(r"^(text/|application/(javascript|json|xml|manifest\+json)|image/svg\+xml)")
+# Referencias a /static/... dentro del HTML, para agregarles la huella
+_STATIC_REF = re.compile(r"""(?<=["'(])/static/([^"'()?#\s]+)""")
+
+
+def _content_type(path: Path) -> str:
+    content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    return content_type + "; charset=utf-8" if content_type.startswith("text/") else content_type
+
+
+@dataclass
+class Asset:
+    content_type: str
+    version: str  # primeros caracteres del sha256 del contenido
+    # codificación ("" = identidad) -> (cuerpo, ETag fuerte de esa representación)
+    variants: Dict[str, Tuple[bytes, str]] = field(default_factory=dict)
+
+
+def _build(data: bytes, content_type: str) -> Asset:
+    version = hashlib.sha256(data).hexdigest()[:16]
+    asset = Asset(content_type, version, {"": (data, f'"{version}"')})
+    if _COMPRESSIBLE.match(content_type):
+        gz = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(gz) < len(data):
+            asset.variants["gzip"] = (gz, f'"{version}-gz"')
+    return asset
+
+
+def _add_brotli(asset: Asset) -> None:
+    data = asset.variants[""][0]
+    br = brotli.compress(data, quality=11)
+    if len(br) < len(data):
+        asset.variants["br"] = (br, f'"{asset.version}-br"')
+
+
+class AssetStore:
+    """Frontend cargado una sola vez en memoria, con variantes precomprimidas.
+
+    `index.html` se reescribe para pedir cada asset con su huella (`?v=<hash>`),
+    así esas URLs se pueden cachear como inmutables y un cambio de contenido
+    cambia la URL. Al cargar se arma identidad + gzip; brotli se agrega después.
+    """
+
+    def __init__(self, root: Path = FRONTEND_DIR) -> None:
+        self.root = root
+        self.files: Dict[str, Asset] = {}
+        index: Optional[Path] = None
+        for path in sorted(root.rglob("*")):
+            rel = path.relative_to(root)
+            if not path.is_file() or any(part.startswith(".") for part in rel.parts):
+                continue
+            if rel.as_posix() == "index.html":
+                index = path  # al final, cuando ya se conocen las huellas del resto
+                continue
+            self.files[rel.as_posix()] = _build(path.read_bytes(), _content_type(path))
+        if index is not None:
+            html = _STATIC_REF.sub(self._fingerprint, index.read_text(encoding="utf-8"))
+            self.files["index.html"] = _build(html.encode("utf-8"), _content_type(index))
+
+    def _fingerprint(self, m: re.Match) -> str:
+        asset = self.files.get(m.group(1))
+        return m.group(0) if asset is None else f"{m.group(0)}?v={asset.version}"
+
+    def add_brotli(self) -> None:
+        """Agrega las variantes brotli (calidad máxima, lenta): se llama en el pre-calentado.
+
+        Hasta entonces se sirve gzip; las ETag de cada variante son distintas, así que
+        el cambio no invalida nada que los clientes tengan cacheado.
+        """
+        if brotli is None:
+            return
+        for asset in list(self.files.values()):
+            if "gzip" in asset.variants and "br" not in asset.variants:
+                _add_brotli(asset)
+
+    def get(self, rel: str) -> Optional[Asset]:
+        return self.files.get(rel)
+
+
+def negotiate(
+    asset: Asset, headers: Mapping[str, str], *, immutable: bool = False
+) -> Tuple[int, bytes, Dict[str, str]]:
+    """Elige la representación según Accept-Encoding y resuelve If-None-Match.
+
+    Devuelve (status, cuerpo, cabeceras): 200 con la variante elegida o 304 vacío.
+    """
+    accepted = accepted_encodings(headers.get("accept-encoding", ""))
+    encoding = ""
+    for candidate in ("br", "gzip"):
+        if candidate in asset.variants and accepted.get(candidate, accepted.get("*", 0.0)) > 0:
+            encoding = candidate
+            break
+    body, etag = asset.variants[encoding]
+    out = {"ETag": etag, "Cache-Control": IMMUTABLE if immutable else REVALIDATE}
+    if len(asset.variants) > 1:
+        out["Vary"] = "Accept-Encoding"
+    inm = headers.get("if-none-match")
+    if inm and etag_matches(inm, etag):
+        return 304, b"", out
+    out["Content-Type"] = asset.content_type
+    if encoding:
+        out["Content-Encoding"] = encoding
+    return 200, body, out
+
+
+_store: Optional[AssetStore] = None
+_store_lock = threading.Lock()
+
+
+def load_assets(root: Path = FRONTEND_DIR) -> AssetStore:
+    """Lee y comprime el frontend (se llama al arrancar; si no, en el primer request)."""
+    global _store
+    with _store_lock:
+        _store = AssetStore(root)
+        return _store
+
+
+def assets() -> AssetStore:
+    return _store or load_assets()
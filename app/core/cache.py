@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+# Tope de filas por archivo en disco (entre todas las cachés que lo comparten)
+DISK_MAX_ENTRIES = 100_000
+# Cada cuántas escrituras al disco se purgan vencidos y excedentes
+PRUNE_EVERY = 1000
+
+
+class TTLCache:
+    """Caché LRU en memoria con TTL por entrada y un nivel opcional en disco (SQLite).
+
+    Un valor `None` se guarda como resultado negativo ("no encontrado") con su propio
+    TTL, para no volver a consultar upstream por códigos inexistentes. Los valores
+    deben ser serializables a JSON.
+
+    `path` puede ser una función: el archivo se resuelve y se abre recién en el
+    primer acceso, así importar el módulo no crea nada en disco.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_entries: int = 2048,
+        ttl: float = 7 * 24 * 3600,
+        negative_ttl: float = 3600,
+        path: Union[Path, Callable[[], Optional[Path]], None] = None,
+    ) -> None:
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._mem: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._path = path
+        self._disk: Optional[_DiskTier] = None
+        self._disk_ready = path is None
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+    def _disk_tier(self) -> Optional["_DiskTier"]:
+        # Se llama con self._lock tomado
+        if not self._disk_ready:
+            path = self._path() if callable(self._path) else self._path
+            # Las cachés que comparten archivo comparten conexión y lock
+            self._disk = _open_disk(path) if path is not None else None
+            self._disk_ready = True
+        return self._disk
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Devuelve (encontrado, valor). `valor` es None para un negativo cacheado."""
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._mem[key]
+                entry = None
+            disk = self._disk_tier()
+            if entry is None and disk is not None:
+                entry = disk.get(self.name, key, now)
+                if entry is not None:
+                    self.disk_hits += 1
+                    self._mem_put(key, entry)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._mem.move_to_end(key)
+            self.hits += 1
+            if entry[1] is None:
+                self.negative_hits += 1
+            return True, entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        entry = (time.time() + ttl, value)
+        with self._lock:
+            self._mem_put(key, entry)
+            disk = self._disk_tier()
+            if disk is not None:
+                disk.put(self.name, key, entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            disk = self._disk_tier()
+            if disk is not None:
+                disk.clear(self.name)
+
+    def stats(self) -> Dict[str, float | int]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._mem),
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _mem_put(self, key: str, entry: Tuple[float, Any]) -> None:
+        self._mem[key] = entry
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.evictions += 1
+
+
+class _DiskTier:
+    """Archivo SQLite de caché: una conexión y un lock por archivo, compartidos entre cachés.
+
+    Los vencidos se borran al abrir y cada PRUNE_EVERY escrituras (no sólo cuando se
+    vuelven a leer), y si hay más de `max_entries` filas se descartan las que vencen antes.
+    """
+
+    def __init__(self, path: Path, max_entries: int = DISK_MAX_ENTRIES) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._writes = 0
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " ns TEXT NOT NULL, key TEXT NOT NULL, expires_at REAL NOT NULL, value TEXT NOT NULL,"
+            " PRIMARY KEY (ns, key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+        self.prune()
+
+    def get(self, ns: str, key: str, now: float) -> Optional[Tuple[float, Any]]:
+        with self.lock:
+            row = self._db.execute(
+                "SELECT expires_at, value FROM cache WHERE ns = ? AND key = ?", (ns, key)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[0] <= now:
+                self._db.execute("DELETE FROM cache WHERE ns = ? AND key = ?", (ns, key))
+                return None
+        return row[0], json.loads(row[1])
+
+    def put(self, ns: str, key: str, entry: Tuple[float, Any]) -> None:
+        with self.lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache (ns, key, expires_at, value) VALUES (?, ?, ?, ?)",
+                (ns, key, entry[0], json.dumps(entry[1], ensure_ascii=False)),
+            )
+            self._writes += 1
+            due = self._writes % PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def clear(self, ns: str) -> None:
+        with self.lock:
+            self._db.execute("DELETE FROM cache WHERE ns = ?", (ns,))
+
+    def prune(self) -> int:
+        """Borra vencidos y, si sobran, las filas que vencen antes. Devuelve filas borradas."""
+        with self.lock:
+            removed = self._db.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),)).rowcount
+            excess = self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+            if excess > 0:
+                removed += self._db.execute(
+                    "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY expires_at LIMIT ?)",
+                    (excess,),
+                ).rowcount
+            return removed
+
+
+_disks: Dict[Path, _DiskTier] = {}
+_disks_lock = threading.Lock()
+
+
+def _open_disk(path: Path) -> _DiskTier:
+    path = path.resolve()
+    with _disks_lock:
+        disk = _disks.get(path)
+        if disk is None:
+            disk = _disks[path] = _DiskTier(path)
+        return disk
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import gzip
+import os
+from typing import Dict, Mapping, Optional, Tuple
+
+import pydantic_core
+
+from app.core.httpcache import REVALIDATE, accepted_encodings, etag_matches
+
+CONTENT_TYPE = "application/json"
+# Por debajo de esto comprimir no ahorra nada que se note (entra en uno o dos paquetes)
+GZIP_MIN_BYTES = 1400
+
+
+def dumps(obj: object) -> bytes:
+    """JSON compacto en UTF-8, directo a bytes.
+
+    Es el mismo serializador que usa FastAPI con `response_model` (pydantic-core),
+    así la salida es idéntica byte a byte a la de antes, incluidos los floats y
+    NaN/inf como `null`. Las claves salen en el orden del dict: tiene que ser el
+    de los campos del esquema.
+    """
+    return pydantic_core.to_json(obj, inf_nan_mode="null")
+
+
+def gzip_enabled() -> bool:
+    # PI_JSON_GZIP=0 desactiva la compresión de respuestas JSON grandes
+    return os.environ.get("PI_JSON_GZIP", "1") != "0"
+
+
+class JSONPayload:
+    """Cuerpo ya serializado; la variante gzip se calcula la primera vez que se pide."""
+
+    __slots__ = ("body", "_gz")
+
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+        self._gz: Optional[bytes] = None
+
+    def gzipped(self) -> Optional[bytes]:
+        if self._gz is None:
+            gz = gzip.compress(self.body, compresslevel=6, mtime=0)
+            self._gz = gz if len(gz) < len(self.body) else b""
+        return self._gz or None
+
+
+def validators(version: str) -> Dict[str, str]:
+    """ETag débil (identidad y gzip son el mismo JSON) y revalidación en cada uso."""
+    out = {"ETag": f'W/"{version}"', "Cache-Control": REVALIDATE}
+    if gzip_enabled():
+        out["Vary"] = "Accept-Encoding"
+    return out
+
+
+def not_modified(version: str, headers: Mapping[str, str]) -> bool:
+    """True si el cliente ya tiene esta versión (If-None-Match): se responde 304 sin armar el cuerpo."""
+    inm = headers.get("if-none-match")
+    return bool(inm) and etag_matches(inm, f'W/"{version}"')
+
+
+def encode(
+    payload: JSONPayload, headers: Mapping[str, str], *, version: Optional[str] = None
+) -> Tuple[bytes, Dict[str, str]]:
+    """Elige identidad o gzip según el tamaño y Accept-Encoding. Devuelve (cuerpo, cabeceras).
+
+    Con `version` se agregan las cabeceras de `validators` para los GET condicionales.
+    """
+    out = {"Content-Type": CONTENT_TYPE}
+    if version is not None:
+        out.update(validators(version))
+    if len(payload.body) < GZIP_MIN_BYTES or not gzip_enabled():
+        return payload.body, out
+    out["Vary"] = "Accept-Encoding"
+    accepted = accepted_encodings(headers.get("accept-encoding", ""))
+    if accepted.get("gzip", accepted.get("*", 0.0)) > 0:
+        gz = payload.gzipped()
+        if gz is not None:
+            out["Content-Encoding"] = "gzip"
+            return gz, out
+    return payload.body, out
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import heapq
+import math
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, defaultdict
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+# Prefijos cortos (los más frecuentes) se precalculan; los largos se resuelven por rango en el vocabulario ordenado
+PREFIX_LEN = 3
+GRAM = 3
+FUZZY_MIN_SCORE = 0.6
+# Tope de nombres que se verifican en los niveles de subcadena y por similitud, para que
+# una consulta sin resultados no recorra postings enormes (se revisan los más cortos primero)
+SUBSTRING_MAX_CANDIDATES = 20_000
+FUZZY_MAX_CANDIDATES = 2_000
+# Consultas cuyo ranking se conserva para continuar la paginación
+MAX_CACHED_RANKINGS = 64
+
+_EMPTY = array("I")
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sin tildes y con separadores simples: 'Salmón (fresco)' -> 'salmon fresco'."""
+    folded = unicodedata.normalize("NFKD", text)
+    chars = []
+    for ch in folded:
+        if unicodedata.combining(ch):
+            continue
+        chars.append(ch.lower() if ch.isalnum() else " ")
+    return " ".join("".join(chars).split())
+
+
+def _grams(token: str, n: int = GRAM) -> Iterable[str]:
+    return (token[i:i + n] for i in range(len(token) - n + 1))
+
+
+def _query_grams(token: str) -> Iterable[str]:
+    # Palabras de 2 caracteres se buscan enteras en los postings de bigramas; las de 1, en ninguno
+    return _grams(token) if len(token) >= GRAM else _grams(token, 2)
+
+
+class _PrefixPostings:
+    """Postings por prefijo de término, con ids ascendentes (= orden de ranking)."""
+
+    def __init__(self, terms: Dict[str, List[int]]) -> None:
+        self.postings: Dict[str, array] = {t: array("I", ids) for t, ids in terms.items()}
+        self.terms: List[str] = sorted(self.postings)
+        short: Dict[str, List[int]] = {}
+        for term, ids in terms.items():
+            for n in range(1, min(PREFIX_LEN, len(term)) + 1):
+                short.setdefault(term[:n], []).extend(ids)
+        self.short: Dict[str, array] = {p: array("I", sorted(set(ids))) for p, ids in short.items()}
+
+    def size(self, prefix: str) -> int:
+        if len(prefix) <= PREFIX_LEN:
+            return len(self.short.get(prefix, ()))
+        lo = bisect_left(self.terms, prefix)
+        hi = bisect_left(self.terms, prefix + "\uffff")
+        return sum(len(self.postings[t]) for t in self.terms[lo:hi])
+
+    def lookup(self, prefix: str) -> Optional[array]:
+        """Postings ordenados del prefijo si están materializados en un único array."""
+        if len(prefix) <= PREFIX_LEN:
+            return self.short.get(prefix, _EMPTY)
+        lo = bisect_left(self.terms, prefix)
+        hi = bisect_left(self.terms, prefix + "\uffff")
+        if hi - lo <= 1:
+            return self.postings[self.terms[lo]] if hi > lo else _EMPTY
+        return None
+
+    def iter(self, prefix: str) -> Iterator[int]:
+        found = self.lookup(prefix)
+        if found is not None:
+            return iter(found)
+        lo = bisect_left(self.terms, prefix)
+        hi = bisect_left(self.terms, prefix + "\uffff")
+        return heapq.merge(*(self.postings[t] for t in self.terms[lo:hi]))
+
+
+def _contains(ids: array, doc: int) -> bool:
+    i = bisect_left(ids, doc)
+    return i < len(ids) and ids[i] == doc
+
+
+def _intersect(arrays: List[array]) -> Iterator[int]:
+    """Intersección de postings ordenados, saltando con bisect (leapfrog)."""
+    if not arrays or not all(arrays):
+        return
+    arrays = sorted(arrays, key=len)
+    pos = [0] * len(arrays)
+    doc = arrays[0][0]
+    while True:
+        for k, ids in enumerate(arrays):
+            i = bisect_left(ids, doc, pos[k])
+            if i == len(ids):
+                return
+            pos[k] = i
+            if ids[i] != doc:
+                doc = ids[i]
+                break
+        else:
+            yield doc
+            pos[0] += 1
+            if pos[0] == len(arrays[0]):
+                return
+            doc = arrays[0][pos[0]]
+
+
+def _unique(ids: Iterable[int]) -> Iterator[int]:
+    last = -1
+    for doc in ids:
+        if doc != last:
+            yield doc
+            last = doc
+
+
+class _Ranking:
+    """Resultados de una consulta ya rankeados, más el generador para seguir desde ahí.
+
+    Pedir la página siguiente continúa donde quedó la anterior en vez de volver a rankear.
+    """
+
+    __slots__ = ("docs", "seen", "rest")
+
+    def __init__(self, ranked: Iterator[int]) -> None:
+        self.docs: List[int] = []
+        self.seen: set[int] = set()
+        self.rest: Optional[Iterator[int]] = ranked
+
+    def take(self, need: int) -> List[int]:
+        while self.rest is not None and len(self.docs) < need:
+            doc = next(self.rest, None)
+            if doc is None:
+                self.rest = None
+            elif doc not in self.seen:
+                self.seen.add(doc)
+                self.docs.append(doc)
+        return self.docs
+
+
+class FoodSearchIndex:
+    """Índice de búsqueda sobre los nombres del catálogo.
+
+    Devuelve posiciones del catálogo ordenadas por relevancia: coincidencia exacta,
+    luego prefijo (el nombre empieza con la consulta, o cada palabra de la consulta
+    es prefijo de alguna palabra del nombre), luego subcadena en cualquier parte del
+    nombre (así 'ch' encuentra 'Leche', como la búsqueda original) y, por último,
+    similitud por trigramas (tolera errores de tipeo). Dentro de cada nivel, nombres
+    más cortos primero. Los niveles se calculan a medida que hacen falta, y el
+    ranking de las últimas consultas se conserva para servir las páginas siguientes.
+    """
+
+    def __init__(self, names: Sequence[str]) -> None:
+        norms = [normalize(n) for n in names]
+        # ids internos ordenados por (largo, nombre): recorrer postings en orden ya es recorrer por ranking
+        order = sorted(range(len(names)), key=lambda i: (len(norms[i]), norms[i], i))
+        self._positions = array("I", order)
+        self._norms = [norms[i] for i in order]
+        self._tokens = [n.split() for n in self._norms]
+
+        exact: Dict[str, List[int]] = {}
+        head: Dict[str, List[int]] = {}
+        anyt: Dict[str, List[int]] = {}
+        # Trigramas y bigramas de cada palabra (no se pisan: difieren en el largo)
+        grams: Dict[str, List[int]] = defaultdict(list)
+        for doc, (norm, toks) in enumerate(zip(self._norms, self._tokens)):
+            if not toks:
+                continue
+            exact.setdefault(norm, []).append(doc)
+            head.setdefault(toks[0], []).append(doc)
+            for tok in set(toks):
+                anyt.setdefault(tok, []).append(doc)
+            for g in {g for tok in toks for n in (GRAM, 2) for g in _grams(tok, n)}:
+                grams[g].append(doc)
+        self._exact = exact
+        self._head = _PrefixPostings(head)
+        self._any = _PrefixPostings(anyt)
+        self._grams: Dict[str, array] = {g: array("I", ids) for g, ids in grams.items()}
+        self._rankings: "OrderedDict[str, _Ranking]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def search(self, query: str, *, offset: int = 0, limit: int = 20) -> List[int]:
+        q = normalize(query)
+        qtoks = q.split()
+        if not qtoks or limit <= 0:
+            return []
+        need = offset + limit
+        with self._lock:
+            ranking = self._rankings.pop(q, None)
+            if ranking is None:
+                ranking = _Ranking(self._ranked(q, qtoks))
+            # La consulta más reciente queda al final: se descartan las menos usadas
+            self._rankings[q] = ranking
+            while len(self._rankings) > MAX_CACHED_RANKINGS:
+                self._rankings.popitem(last=False)
+            docs = ranking.take(need)
+            return [self._positions[doc] for doc in docs[offset:need]]
+
+    def _ranked(self, q: str, qtoks: List[str]) -> Iterator[int]:
+        yield from self._exact.get(q, ())
+        if len(qtoks) == 1:
+            # Nombres que empiezan con la consulta: sus postings ya vienen ordenados
+            yield from self._head.iter(q)
+        yield from self._token_prefix(qtoks)
+        yield from self._substring(q, qtoks)
+        yield from self._fuzzy(qtoks)
+
+    def _token_prefix(self, qtoks: List[str]) -> Iterator[int]:
+        # Cada palabra de la consulta es prefijo de alguna palabra del nombre
+        qtoks = sorted(qtoks, key=self._any.size)
+        arrays = [self._any.lookup(t) for t in qtoks]
+        materialized = [ids for ids in arrays if ids is not None]
+        pending = [t for t, ids in zip(qtoks, arrays) if ids is None]
+        if arrays[0] is not None:
+            candidates = _intersect(materialized)
+        else:
+            # El prefijo más raro abarca varios términos: se recorre su unión y se verifica el resto
+            candidates = (d for d in self._any.iter(pending.pop(0)) if all(_contains(ids, d) for ids in materialized))
+        for doc in candidates:
+            toks = self._tokens[doc]
+            if all(any(t.startswith(p) for t in toks) for p in pending):
+                yield doc
+
+    def _substring(self, q: str, qtoks: List[str]) -> Iterator[int]:
+        # Cada palabra de la consulta es subcadena de una palabra del nombre, así que
+        # sus n-gramas están en el nombre: el n-grama más raro acota los candidatos
+        postings = [self._grams.get(g, _EMPTY) for tok in qtoks for g in _query_grams(tok)]
+        # Sólo palabras de una letra: cualquier nombre es candidato, en orden de ranking
+        candidates: Sequence[int] = min(postings, key=len) if postings else range(len(self._norms))
+        for doc in islice(candidates, SUBSTRING_MAX_CANDIDATES):
+            if q in self._norms[doc]:
+                yield doc
+
+    def _fuzzy(self, qtoks: List[str]) -> Iterator[int]:
+        qgrams = sorted({g for tok in qtoks for g in _grams(tok)}, key=lambda g: len(self._grams.get(g, _EMPTY)))
+        if not qgrams:
+            return
+        postings = [self._grams.get(g, _EMPTY) for g in qgrams]
+        minimum = math.ceil(FUZZY_MIN_SCORE * len(qgrams))
+        # Un nombre con `minimum` de los k trigramas tiene al menos uno de los k - minimum + 1
+        # más raros: alcanza con recorrer esos postings (en orden de ranking, con tope)
+        seeds = postings[:len(qgrams) - minimum + 1]
+        slack = len(qgrams) - minimum
+        scored = []
+        for doc, _ in zip(_unique(heapq.merge(*seeds)), range(FUZZY_MAX_CANDIDATES)):
+            misses = 0
+            for ids in postings:
+                if not _contains(ids, doc):
+                    misses += 1
+                    if misses > slack:
+                        break
+            else:
+                scored.append((misses, doc))
+        scored.sort()
+        for _, doc in scored:
+            yield doc
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import re
+from typing import Dict
+
+# Assets pedidos con su huella (?v=<hash>) no cambian nunca: se cachean un año
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Sin huella (o index.html, o JSON versionado): el navegador revalida siempre, normalmente con un 304
+REVALIDATE = "no-cache"
+
+
+def accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Codificaciones de Accept-Encoding con su peso q (1.0 si no se indica)."""
+    out: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        m = re.search(r"q=([0-9.]+)", params)
+        if m:
+            try:
+                q = float(m.group(1))
+            except ValueError:
+                q = 0.0
+        if name:
+            out[name.strip().lower()] = q
+    return out
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Comparación débil (RFC 9110 §13.1.2): W/"x" equivale a "x"
+    etag = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
@@ -0,0 +1,509 @@
+from __future__ import annotations
+
+import csv
+import io
+import os
+import threading
+import time
+import uuid
+from datetime import date
+from pathlib import Path
+from typing import Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from app.core import metrics
+from app.core.writer import fsync_enabled, process_lock
+
+MEALS_HEADERS = ["id", "fecha", "alimento", "cantidad_g", "kcal", "prot", "carb", "grasa"]
+TOTALS_HEADERS = ["fecha", "kcal", "prot", "carb", "grasa", "comidas"]
+
+# Filas por lote al migrar el CSV histórico (memoria acotada)
+_MIGRATION_BATCH = 10_000
+# Borrados pendientes a partir de los cuales se compacta en segundo plano
+COMPACT_THRESHOLD = 256
+
+
+class AppendLog:
+    """CSV append-only que se mantiene en memoria leyendo sólo su cola nueva.
+
+    `on_row` aplica cada fila al estado en memoria y `on_reset` lo vacía cuando el
+    archivo fue reemplazado por otro proceso. Si el archivo no existe, `build` devuelve
+    las filas iniciales (p. ej. reconstruidas desde las particiones).
+
+    `guard` es el lock entre procesos que serializa las escrituras (appends, creación
+    y compactación); siempre se toma antes que `lock`, que sólo protege la memoria.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        headers: List[str],
+        on_row: Callable[[List[str]], None],
+        on_reset: Callable[[], None],
+        build: Optional[Callable[[], Iterable[Sequence[object]]]] = None,
+        guard: Optional[ContextManager] = None,
+        durable: bool = True,
+    ) -> None:
+        self.path = path
+        self.headers = headers
+        self.lock = threading.RLock()
+        self.guard = guard or process_lock(path.with_name(path.name + ".lock"))
+        self.durable = durable
+        self._on_row = on_row
+        self._on_reset = on_reset
+        self._build = build
+        self._offset = 0
+        # Descriptor abierto del archivo leído: mientras esté abierto su inodo no se
+        # reutiliza, así que comparar inodos detecta con certeza un reemplazo
+        self._fd: Optional[int] = None
+        self._generation = 0  # cambia en cada reapertura
+        self._signature: Optional[tuple] = None
+
+    def append(self, rows: Iterable[Sequence[object]]) -> None:
+        rows = list(rows)
+        if not rows:
+            return
+        with self.guard:
+            self._ensure()
+            start = time.perf_counter()
+            with self.path.open("a", newline="", encoding="utf-8") as f:
+                offset = f.tell()
+                csv.writer(f).writerows(rows)
+                _commit(f, self.durable)
+                metrics.observe_io("nutrition", "write", start, f.tell() - offset)
+            self.sync()
+
+    def _ensure(self) -> None:
+        if self.path.exists():
+            return
+        with self.guard, self.lock:
+            if self.path.exists():
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            _write_csv(tmp, self.headers, self._build() if self._build else (), durable=self.durable)
+            os.replace(tmp, self.path)
+
+    def sync(self) -> None:
+        self._ensure()
+        with self.lock:
+            st = self.path.stat()
+            signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if signature == self._signature:
+                return
+            if self._fd is None or os.fstat(self._fd).st_ino != st.st_ino or st.st_size < self._offset:
+                # Log reemplazado (reconstrucción o compactación): releer completo
+                self._reopen()
+                self._on_reset()
+                self._offset = 0
+            start = time.perf_counter()
+            size = os.fstat(self._fd).st_size
+            data = os.pread(self._fd, max(size - self._offset, 0), self._offset)
+            metrics.observe_io("nutrition", "read", start, len(data))
+            # Sólo líneas completas: otro writer puede estar a mitad de fila
+            end = data.rfind(b"\n") + 1
+            for row in csv.reader(io.StringIO(data[:end].decode("utf-8"), newline="")):
+                if row and row != self.headers:
+                    self._on_row(row)
+            self._offset += end
+            self._signature = signature if end == len(data) else None
+
+    def _reopen(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(self.path, os.O_RDONLY)
+        self._generation += 1
+
+    def compact(
+        self,
+        fold: Callable[[Iterator[List[str]]], Iterable[Sequence[object]]],
+        after: Optional[Callable[[], None]] = None,
+    ) -> bool:
+        """Reescribe el log con `fold(filas)` sin bloquear appends durante el trabajo pesado.
+
+        Se pliega la parte existente fuera de los locks; luego, con ellos, se copian al
+        nuevo archivo las filas agregadas mientras tanto y se lo renombra encima, y
+        `after` ajusta el estado en memoria (que así no hace falta releer). Si otro
+        proceso compactó el log entretanto, se descarta el trabajo y devuelve False.
+        """
+        # Crear el log toma `guard`: no puede pasar con `lock` tomado (orden guard -> lock)
+        self._ensure()
+        with self.lock:
+            self.sync()
+            cut, generation = self._offset, self._generation
+            head = os.pread(self._fd, cut, 0).decode("utf-8")
+        # Único por compactación: dos instancias del mismo proceso pueden compactar a la vez
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.compact")
+        rows = (r for r in csv.reader(io.StringIO(head, newline="")) if r and r != self.headers)
+        _write_csv(tmp, self.headers, fold(rows), durable=self.durable)
+        with self.guard, self.lock:
+            self.sync()
+            if self._generation != generation:
+                tmp.unlink()
+                return False
+            with tmp.open("ab") as dst:
+                dst.write(os.pread(self._fd, self._offset - cut, cut))
+                _commit(dst, self.durable)
+            os.replace(tmp, self.path)
+            self._reopen()
+            st = os.fstat(self._fd)
+            self._offset = st.st_size
+            self._signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if after is not None:
+                after()
+            return True
+
+
+class MealStore:
+    """Comidas particionadas por día: `<root>/<YYYY-MM>/<YYYY-MM-DD>.csv`.
+
+    Cada partición es un CSV con MEALS_HEADERS, así que leer un día sólo abre su
+    archivo, sin importar cuántos años de comidas haya guardados. Junto a las
+    particiones hay tres logs append-only: `_ids.csv` (id -> fecha), `_tombstones.csv`
+    (comidas borradas aún presentes en su partición) y `_totales.csv` (ver DailyTotals).
+    Borrar una comida es buscar su fecha y agregar una lápida; `compact()` reescribe
+    luego las particiones afectadas en segundo plano.
+
+    Todas las escrituras (particiones y logs) van bajo un mismo lock entre procesos
+    (`<root>/.lock`), así varios workers de uvicorn pueden compartir el directorio.
+    Con `durable` cada lote termina en un fsync por archivo tocado.
+    """
+
+    def __init__(self, root: Path, *, durable: bool = True) -> None:
+        self.root = root
+        self.durable = durable
+        self._lock = process_lock(root / ".lock")
+        self.totals = DailyTotals(self)
+        self._ids: Dict[str, str] = {}
+        self.ids = AppendLog(
+            root / "_ids.csv", ["id", "fecha"],
+            on_row=self._apply_id, on_reset=self._ids.clear, build=self._scan_ids,
+            guard=self._lock, durable=durable,
+        )
+        self._dead: Dict[str, Set[str]] = {}
+        self.tombstones = AppendLog(
+            root / "_tombstones.csv", ["id", "fecha"],
+            on_row=self._apply_tombstone, on_reset=self._dead.clear,
+            guard=self._lock, durable=durable,
+        )
+        self._compacting = threading.Lock()
+
+    # --- estado en memoria de los logs ---
+    def _apply_id(self, row: List[str]) -> None:
+        if len(row) >= 2:
+            self._ids[row[0]] = row[1]
+
+    def _apply_tombstone(self, row: List[str]) -> None:
+        if len(row) >= 2:
+            self._dead.setdefault(row[1], set()).add(row[0])
+
+    def _scan_ids(self) -> Iterator[Tuple[str, str]]:
+        for fecha in self.days():
+            for row in self._read_partition(fecha):
+                if row.get("id"):
+                    yield row["id"], fecha
+
+    def contains(self, meal_id: str) -> bool:
+        self.ids.sync()
+        return meal_id in self._ids
+
+    def pending_tombstones(self) -> int:
+        self.tombstones.sync()
+        with self.tombstones.lock:
+            return sum(len(ids) for ids in self._dead.values())
+
+    # --- particiones ---
+    def partition_path(self, fecha: str) -> Path:
+        fecha = date.fromisoformat(fecha).isoformat()  # valida antes de usarla como nombre de archivo
+        return self.root / fecha[:7] / f"{fecha}.csv"
+
+    def _read_partition(self, fecha: str) -> List[Dict[str, str]]:
+        start = time.perf_counter()
+        try:
+            with self.partition_path(fecha).open("r", newline="", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+                metrics.observe_io("nutrition", "read", start, os.fstat(f.fileno()).st_size)
+                return rows
+        except FileNotFoundError:
+            return []
+
+    def append(self, rows: Sequence[Sequence[object]]) -> None:
+        """Agrega filas (en orden de MEALS_HEADERS), con un solo append por partición."""
+        by_day: Dict[str, List[Sequence[object]]] = {}
+        for row in rows:
+            by_day.setdefault(str(row[1]), []).append(row)
+        # Asegura los logs antes de escribir, para no contar estas filas dos veces al construirlos
+        self.totals.sync()
+        self.ids.sync()
+        with self._lock:
+            for fecha, day_rows in by_day.items():
+                path = self.partition_path(fecha)
+                new = not path.exists()
+                if new:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                start = time.perf_counter()
+                with path.open("a", newline="", encoding="utf-8") as f:
+                    offset = f.tell()
+                    w = csv.writer(f)
+                    if new:
+                        w.writerow(MEALS_HEADERS)
+                    w.writerows(day_rows)
+                    _commit(f, self.durable)
+                    metrics.observe_io("nutrition", "write", start, f.tell() - offset)
+            self.ids.append((r[0], r[1]) for r in rows)
+            self.totals.record([row_delta(r, +1) for r in rows])
+
+    def append_new(self, rows: Sequence[Sequence[object]]) -> int:
+        """Agrega sólo las filas cuyo id no existe (ni repetido en `rows`). Devuelve cuántas."""
+        with self._lock:
+            self.ids.sync()
+            seen: Set[str] = set()
+            fresh = []
+            for row in rows:
+                meal_id = str(row[0])
+                if meal_id in seen or meal_id in self._ids:
+                    continue
+                seen.add(meal_id)
+                fresh.append(row)
+            self.append(fresh)
+            return len(fresh)
+
+    def write_batch(self, rows: List[Sequence[object]]) -> None:
+        """Destino del writer con commit grupal (ver app.core.writer)."""
+        self.append(rows)
+
+    def read_day(self, fecha: str) -> List[Dict[str, str]]:
+        rows = self._read_partition(fecha)
+        self.tombstones.sync()
+        dead = self._dead.get(fecha)
+        if dead:
+            rows = [r for r in rows if r.get("id") not in dead]
+        return rows
+
+    def iter_all(self) -> Iterator[Dict[str, str]]:
+        """Todas las comidas, día por día (memoria acotada por el día más grande)."""
+        for fecha in self.days():
+            yield from self.read_day(fecha)
+
+    def daily_totals(self, desde: date, hasta: date) -> List[Tuple[str, List[float]]]:
+        return self.totals.range(desde, hasta)
+
+    def days(self) -> Iterator[str]:
+        """Fechas con partición, en orden."""
+        if not self.root.exists():
+            return
+        for month in sorted(p for p in self.root.iterdir() if p.is_dir()):
+            for part in sorted(month.glob("*.csv")):
+                yield part.stem
+
+    def fecha_of(self, meal_id: str) -> Optional[str]:
+        """Fecha de una comida según el índice de ids (incluye borradas aún sin compactar)."""
+        self.ids.sync()
+        return self._ids.get(meal_id)
+
+    def remove(self, meal_id: str) -> bool:
+        """Borra por id: índice -> fecha, y una lápida append-only. No reescribe la partición."""
+        fecha = self.fecha_of(meal_id)
+        if fecha is None:
+            return False
+        with self._lock:
+            self.tombstones.sync()
+            if meal_id in self._dead.get(fecha, ()):
+                return False
+            gone = [r for r in self._read_partition(fecha) if r.get("id") == meal_id]
+            if not gone:
+                return False
+            self.tombstones.append([(meal_id, fecha)])
+            self.totals.record([row_delta([r.get(h) for h in MEALS_HEADERS], -1) for r in gone])
+        if self.pending_tombstones() >= COMPACT_THRESHOLD:
+            self.compact_in_background()
+        return True
+
+    # --- compactación ---
+    def compact_in_background(self) -> Optional[threading.Thread]:
+        if self._compacting.locked():
+            return None
+        t = threading.Thread(target=self.compact, name="meals-compaction", daemon=True)
+        t.start()
+        return t
+
+    def compact(self) -> int:
+        """Aplica las lápidas a sus particiones y pliega los logs. Devuelve comidas purgadas."""
+        if not self._compacting.acquire(blocking=False):
+            return 0
+        try:
+            self.tombstones.sync()
+            pending = {fecha: set(ids) for fecha, ids in self._dead.items()}
+            purged: Set[str] = set()
+            for fecha, ids in pending.items():
+                # Una partición por vez: los appends de ese día esperan sólo esta reescritura
+                with self._lock:
+                    path = self.partition_path(fecha)
+                    rows = self._read_partition(fecha)
+                    kept = [r for r in rows if r.get("id") not in ids]
+                    if len(kept) != len(rows):
+                        tmp = path.with_name(path.name + ".tmp")
+                        rows_out = ([r.get(h, "") for h in MEALS_HEADERS] for r in kept)
+                        _write_csv(tmp, MEALS_HEADERS, rows_out, durable=self.durable)
+                        os.replace(tmp, path)
+                purged |= ids
+
+            def drop(rows: Iterator[List[str]]) -> Iterator[List[str]]:
+                return (r for r in rows if r[0] not in purged)
+
+            def forget_tombstones() -> None:
+                for fecha, ids in pending.items():
+                    live = self._dead.get(fecha)
+                    if live is not None:
+                        live -= ids
+                        if not live:
+                            del self._dead[fecha]
+
+            def forget_ids() -> None:
+                for meal_id in purged:
+                    self._ids.pop(meal_id, None)
+
+            # Las lápidas se pliegan sólo si el índice de ids ya no tiene esas comidas; si otro
+            # proceso compactó en paralelo quedan para la próxima pasada (es idempotente)
+            if self.ids.compact(drop, forget_ids):
+                self.tombstones.compact(drop, forget_tombstones)
+            self.totals.compact()
+            return len(purged)
+        finally:
+            self._compacting.release()
+
+
+def row_delta(row: Sequence[object], sign: int) -> List[object]:
+    """Delta de totales (TOTALS_HEADERS) que aporta una fila de comida; macros inválidos suman 0."""
+    try:
+        macros = [float(row[4]), float(row[5]), float(row[6]), float(row[7])]  # type: ignore[arg-type]
+        float(row[3])  # type: ignore[arg-type]
+    except (TypeError, ValueError, IndexError):
+        return [str(row[1]), 0.0, 0.0, 0.0, 0.0, 0]
+    return [str(row[1])] + [sign * m for m in macros] + [sign]
+
+
+def _fold_totals(rows: Iterable[Sequence[object]]) -> Dict[str, List[float]]:
+    folded: Dict[str, List[float]] = {}
+    for r in rows:
+        try:
+            vals = [float(v) for v in r[1:6]]  # type: ignore[arg-type]
+        except (ValueError, TypeError):
+            continue
+        acc = folded.setdefault(str(r[0]), [0.0, 0.0, 0.0, 0.0, 0])
+        for i in range(5):
+            acc[i] += vals[i]
+    return folded
+
+
+class DailyTotals:
+    """Totales de macros por día, mantenidos de forma incremental.
+
+    Se persisten como un log de deltas (`_totales.csv`): cada alta o baja de comida
+    agrega una fila con lo que suma o resta a su día, y en memoria se guarda el
+    acumulado por fecha. Si el log no existe se reconstruye una vez a partir de las
+    particiones.
+    """
+
+    def __init__(self, store: MealStore) -> None:
+        self.store = store
+        self.days: Dict[str, List[float]] = {}
+        self.log = AppendLog(
+            store.root / "_totales.csv", TOTALS_HEADERS,
+            on_row=self._apply, on_reset=self.days.clear, build=self._rebuild,
+            guard=store._lock, durable=store.durable,
+        )
+
+    def _apply(self, row: List[str]) -> None:
+        try:
+            vals = [float(v) for v in row[1:6]]
+        except ValueError:
+            return
+        acc = self.days.setdefault(row[0], [0.0, 0.0, 0.0, 0.0, 0])
+        for i in range(5):
+            acc[i] += vals[i]
+        if acc[4] <= 0:
+            # Día vacío: descartar el residuo de punto flotante
+            del self.days[row[0]]
+
+    def _rebuild(self) -> Iterator[List[object]]:
+        deltas = (
+            row_delta([row.get(h) for h in MEALS_HEADERS], +1)
+            for fecha in self.store.days()
+            for row in self.store.read_day(fecha)
+        )
+        for fecha, vals in _fold_totals(deltas).items():
+            yield [fecha, *vals]
+
+    def record(self, deltas: Sequence[Sequence[object]]) -> None:
+        self.log.append([fecha, *vals] for fecha, vals in _fold_totals(deltas).items())
+
+    def sync(self) -> None:
+        self.log.sync()
+
+    def compact(self) -> None:
+        def fold(rows: Iterator[List[str]]) -> Iterator[List[object]]:
+            for fecha, vals in _fold_totals(rows).items():
+                if vals[4] > 0:
+                    yield [fecha, *vals]
+
+        self.log.compact(fold)
+
+    def range(self, desde: date, hasta: date) -> List[Tuple[str, List[float]]]:
+        """Totales por día (incluye días sin comidas) entre `desde` y `hasta`, inclusive."""
+        self.sync()
+        out: List[Tuple[str, List[float]]] = []
+        with self.log.lock:
+            for ordinal in range(desde.toordinal(), hasta.toordinal() + 1):
+                fecha = date.fromordinal(ordinal).isoformat()
+                out.append((fecha, list(self.days.get(fecha, (0.0, 0.0, 0.0, 0.0, 0)))))
+        return out
+
+
+def _commit(f: io.IOBase, durable: bool) -> None:
+    f.flush()
+    if durable and fsync_enabled():
+        os.fsync(f.fileno())
+
+
+def _write_csv(path: Path, headers: List[str], rows: Iterable[Sequence[object]], *, durable: bool = False) -> None:
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(headers)
+        w.writerows(rows)
+        _commit(f, durable)
+
+
+def migrate_legacy_csv(legacy: Path, root: Path) -> int:
+    """Migra un comidas.csv único al layout particionado. Devuelve filas migradas.
+
+    Escribe en un directorio temporal y lo renombra al final, así una migración
+    interrumpida no deja particiones a medias. El CSV original queda como
+    `<nombre>.migrated` a modo de respaldo. Si `root` ya existe no hace nada.
+    """
+    if root.exists() or not legacy.exists():
+        return 0
+    staging = root.with_name(root.name + ".migrating")
+    if staging.exists():
+        for part in sorted(staging.rglob("*.csv"), reverse=True):
+            part.unlink()
+    # Sin fsync por lote: hasta el rename final el CSV original sigue siendo la fuente
+    store = MealStore(staging, durable=False)
+    migrated = 0
+    batch: List[List[str]] = []
+    with legacy.open("r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                row["fecha"] = date.fromisoformat(row.get("fecha") or "").isoformat()
+            except ValueError:
+                continue
+            batch.append([row.get(h) or "" for h in MEALS_HEADERS])
+            if len(batch) >= _MIGRATION_BATCH:
+                store.append(batch)
+                migrated += len(batch)
+                batch = []
+    store.append(batch)
+    migrated += len(batch)
+    staging.mkdir(parents=True, exist_ok=True)
+    os.replace(staging, root)
+    os.replace(legacy, legacy.with_name(legacy.name + ".migrated"))
+    return migrated
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+# Formato de texto de Prometheus (exposition format 0.0.4)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Segundos: de 1 ms (lectura en memoria) a 10 s (timeouts de OFF)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class Sample(NamedTuple):
+    suffix: str
+    labels: Dict[str, str]
+    value: float
+
+
+class Family(NamedTuple):
+    name: str
+    kind: str  # counter | gauge | histogram
+    documentation: str
+    samples: List[Sample]
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Sequence[object]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name}: se esperaban las etiquetas {self.labelnames}")
+        return tuple(str(v) for v in labels)
+
+    def _labels(self, key: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    @abstractmethod
+    def collect(self) -> Family:
+        ...
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: object, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> Family:
+        with self._lock:
+            items = list(self._values.items())
+        return Family(self.name, self.kind, self.documentation, [Sample("", self._labels(k), v) for k, v in items])
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: object, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por combinación de etiquetas: [cuentas por balde (no acumuladas) + Inf, suma]
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: object) -> None:
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][i] += 1
+            entry[1][0] += value
+
+    def collect(self) -> Family:
+        with self._lock:
+            items = [(k, list(counts), total[0]) for k, (counts, total) in self._values.items()]
+        samples: List[Sample] = []
+        for key, counts, total in items:
+            labels = self._labels(key)
+            acum = 0
+            for le, n in zip(self.buckets + (float("inf"),), counts):
+                acum += n
+                samples.append(Sample("_bucket", {**labels, "le": _format_value(le)}, acum))
+            samples.append(Sample("_sum", labels, total))
+            samples.append(Sample("_count", labels, acum))
+        return Family(self.name, self.kind, self.documentation, samples)
+
+
+class Registry:
+    """Métricas del proceso; `collector` agrega familias calculadas al momento del scrape."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"métrica duplicada: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))  # type: ignore[return-value]
+
+    def collector(self, fn: Callable[[], Iterable[Family]]) -> Callable[[], Iterable[Family]]:
+        with self._lock:
+            self._collectors.append(fn)
+        return fn
+
+    def collect(self) -> Iterable[Family]:
+        with self._lock:
+            metrics, collectors = list(self._metrics.values()), list(self._collectors)
+        for metric in metrics:
+            yield metric.collect()
+        for fn in collectors:
+            yield from fn()
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for family in self.collect():
+            lines.append(f"# HELP {family.name} {_escape_help(family.documentation)}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for s in family.samples:
+                lines.append(f"{family.name}{s.suffix}{_format_labels(s.labels)} {_format_value(s.value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == float("-inf"):
+        return "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY = Registry()
+
+# --- HTTP ---
+HTTP_REQUESTS = REGISTRY.counter(
+    "pi_http_requests_total", "Requests HTTP atendidos", ("method", "route", "status")
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "pi_http_request_duration_seconds", "Latencia de los requests HTTP por ruta", ("method", "route")
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge("pi_http_requests_in_flight", "Requests HTTP en curso")
+
+# --- Archivos CSV ---
+STORAGE_LATENCY = REGISTRY.histogram(
+    "pi_storage_io_seconds", "Tiempo de lectura/escritura de los CSV", ("module", "op")
+)
+STORAGE_BYTES = REGISTRY.counter(
+    "pi_storage_io_bytes_total", "Bytes leídos/escritos de los CSV", ("module", "op")
+)
+
+# --- Open Food Facts ---
+OFF_LATENCY = REGISTRY.histogram(
+    "pi_off_request_duration_seconds", "Latencia de las consultas a Open Food Facts", ("endpoint",)
+)
+OFF_REQUESTS = REGISTRY.counter(
+    "pi_off_requests_total",
+    "Consultas a Open Food Facts por resultado (ok, not_found, http_error, timeout, transport_error)",
+    ("endpoint", "outcome"),
+)
+
+
+def observe_io(module: str, op: str, started: float, nbytes: int) -> None:
+    """Registra una lectura/escritura de CSV que empezó en `started` (time.perf_counter())."""
+    STORAGE_LATENCY.observe(time.perf_counter() - started, module, op)
+    STORAGE_BYTES.inc(module, op, amount=nbytes)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latencia, estado y requests en curso por plantilla de ruta.
+
+    Se etiqueta con la ruta declarada (`/progress/{ejercicio}`), no con la URL, para
+    que la cantidad de series no crezca con los parámetros.
+    """
+
+    def __init__(self, app: Callable) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500  # si la app lanza antes de responder
+
+        async def send_wrapper(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # El router deja la ruta elegida en el scope
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_LATENCY.observe(time.perf_counter() - start, scope["method"], route)
+            HTTP_REQUESTS.inc(scope["method"], route, status)
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -1,27 +1,52 @@
 from __future__ import annotations
 
+import asyncio
 import csv
+import importlib.util
+import os
+import threading
+import time
 import uuid
-import httpx
+from collections import OrderedDict
 from dataclasses import dataclass
 from datetime import date
 from pathlib import Path
-from typing import List, Optional, Dict
+from functools import partial
+from typing import TYPE_CHECKING, Awaitable, Callable, Iterator, List, Optional, Dict, Sequence, Tuple, TypeVar
+
+from app.core import metrics, off_local, storage
+from app.core.cache import TTLCache
+from app.core.fastjson import JSONPayload, dumps
+from app.core.food_index import FoodSearchIndex, normalize
+from app.core.meal_store import MEALS_HEADERS, MealStore, migrate_legacy_csv
+from app.core.versions import DataVersions
+from app.core.writer import ProcessLock, fsync_enabled, process_lock, submit_append, submit_exclusive
+
+if TYPE_CHECKING:
+    # httpx se importa recién al crear el cliente de OFF (arranque en frío más rápido)
+    import httpx
 
 FOODS_HEADERS = ["nombre", "kcal_100", "prot_100", "carb_100", "grasa_100"]
-MEALS_HEADERS = ["id", "fecha", "alimento", "cantidad_g", "kcal", "prot", "carb", "grasa"]
 
+T = TypeVar("T")
+
+MAX_RANGE_DAYS = 3660
 
-def _project_root() -> Path:
-    return Path(__file__).resolve().parent.parent.parent
+# Páginas de /foods ya serializadas que se guardan por versión del catálogo
+MAX_CACHED_FOOD_PAGES = 256
 
 
 def foods_path() -> Path:
-    return _project_root() / "alimentos.csv"
+    return storage.data_dir() / "alimentos.csv"
 
 
 def meals_path() -> Path:
-    return _project_root() / "comidas.csv"
+    """Legacy single-file meal log; migrated into meals_dir() on first use."""
+    return storage.data_dir() / "comidas.csv"
+
+
+def meals_dir(atleta: Optional[str] = None) -> Path:
+    return storage.shard_dir(atleta) / "comidas"
 
 
 def _ensure_csv(path: Path, headers: List[str]) -> None:
@@ -31,6 +56,11 @@ def _ensure_csv(path: Path, headers: List[str]) -> None:
             csv.writer(f).writerow(headers)
 
 
+def _foods_lock() -> ProcessLock:
+    # Serializa escrituras de alimentos.csv entre hilos y workers
+    return process_lock(foods_path().with_name(foods_path().name + ".lock"))
+
+
 def _upgrade_meals_csv_if_needed() -> None:
     """Ensure comidas.csv exists and includes an 'id' column; migrate if needed."""
     path = meals_path()
@@ -64,6 +94,97 @@ def _upgrade_meals_csv_if_needed() -> None:
             ])
 
 
+_meals_lock = threading.Lock()
+_meals_stores: Dict[Path, storage.MealRepository] = {}
+
+
+def prepare_meals_storage(atleta: Optional[str] = None) -> storage.MealRepository:
+    """Open an athlete's PI_STORAGE meal repository, migrating legacy data once.
+
+    For the default shard, the legacy comidas.csv is upgraded and split into day
+    partitions; with the SQLite backend the partitions are then imported into the
+    shard's database once.
+    """
+    shard = storage.shard_dir(atleta)
+    with _meals_lock:
+        store = _meals_stores.get(shard)
+        if store is None:
+            if atleta is None and meals_path().exists() and not meals_dir().exists():
+                # Con varios workers, sólo uno migra; los demás ven el directorio ya creado
+                with process_lock(meals_path().with_name(meals_path().name + ".lock")):
+                    if meals_path().exists() and not meals_dir().exists():
+                        _upgrade_meals_csv_if_needed()
+                        migrate_legacy_csv(meals_path(), meals_dir())
+            store = MealStore(meals_dir(atleta))
+            if storage.backend() == "sqlite":
+                db = storage.sqlite_database(storage.sqlite_path(atleta))
+                repo = storage.SQLiteMeals(db)
+                rows = ([r.get(h, "") for h in MEALS_HEADERS] for r in store.iter_all())
+                storage.import_rows(db, "import:comidas", repo, rows)
+                store = repo
+            _meals_stores[shard] = store
+        return store
+
+
+def _meals(atleta: Optional[str] = None) -> storage.MealRepository:
+    return _meals_stores.get(storage.shard_dir(atleta)) or prepare_meals_storage(atleta)
+
+
+# =====================
+# Data versions (ETags)
+# =====================
+CATALOG_KEY = "catalogo"
+
+_versions_lock = threading.Lock()
+_versions_stores: Dict[Path, DataVersions] = {}
+
+
+def _versions(atleta: Optional[str] = None) -> DataVersions:
+    """Shard's version log: the catalog's version lives in the default shard, each day's in its own."""
+    shard = storage.shard_dir(atleta)
+    with _versions_lock:
+        versions = _versions_stores.get(shard)
+        if versions is None:
+            versions = _versions_stores[shard] = DataVersions(shard / "versiones.csv")
+        return versions
+
+
+def _day_key(fecha: str) -> str:
+    return f"dia:{fecha}"
+
+
+def _bump_days(atleta: Optional[str], rows: Sequence[Sequence[object]]) -> None:
+    _versions(atleta).bump(_day_key(str(r[1])) for r in rows)
+
+
+class _MealSink:
+    """Group-commit target for one shard: stores the meals, then bumps their days' versions."""
+
+    def __init__(self, atleta: Optional[str]) -> None:
+        self.atleta = atleta
+        self.store = _meals(atleta)
+
+    def write_batch(self, rows: List[Sequence[object]]) -> None:
+        self.store.write_batch(rows)
+        _bump_days(self.atleta, rows)
+
+
+_meal_sinks: Dict[Path, _MealSink] = {}
+
+
+def _meal_sink(atleta: Optional[str] = None) -> _MealSink:
+    shard = storage.shard_dir(atleta)
+    sink = _meal_sinks.get(shard)
+    if sink is None:
+        sink = _meal_sinks.setdefault(shard, _MealSink(atleta))
+    return sink
+
+
+def day_etag(fecha: date, *, atleta: Optional[str] = None) -> str:
+    """Validator for one day's summary; read it before the data so a concurrent write is never missed."""
+    return f"{fecha.isoformat()}.{_versions(atleta).tag(_day_key(fecha.isoformat()))}"
+
+
 @dataclass
 class Food:
     nombre: str
@@ -92,28 +213,51 @@ class Food:
         }
 
 
+_SEED_FOODS = [
+    ("Pechuga de pollo", 165, 31, 0, 3.6),
+    ("Arroz blanco cocido", 130, 2.7, 28, 0.3),
+    ("Avena", 389, 16.9, 66.3, 6.9),
+    ("Huevo (entero)", 155, 13, 1.1, 11),
+    ("Leche entera", 61, 3.2, 4.8, 3.3),
+    ("Pan blanco", 265, 9, 49, 3.2),
+    ("Pasta cocida", 157, 5.8, 30.9, 0.9),
+    ("Aceite de oliva", 884, 0, 0, 100),
+    ("Manzana", 52, 0.3, 14, 0.2),
+    ("Banana", 89, 1.1, 23, 0.3),
+    ("Yogur natural", 61, 3.5, 4.7, 3.3),
+]
+
+_EXTRA_FOODS = [
+    ("Yogur griego (descremado)", 59, 10.0, 3.6, 0.4),
+    ("Batata cocida", 90, 2.0, 21.0, 0.1),
+    ("Salmón", 208, 20.0, 0.0, 13.0),
+    ("Atún en lata (agua)", 132, 29.0, 0.0, 1.0),
+    ("Lentejas cocidas", 116, 9.0, 20.0, 0.4),
+    ("Garbanzos cocidos", 164, 8.9, 27.4, 2.6),
+    ("Mantequilla de maní", 588, 25.0, 20.0, 50.0),
+    ("Proteína whey", 370, 90.0, 5.0, 2.0),
+    ("Brócoli", 34, 2.8, 7.0, 0.4),
+    ("Espinaca", 23, 2.9, 3.6, 0.4),
+    ("Quinoa cocida", 120, 4.4, 21.3, 1.9),
+    ("Requesón (cottage) 2%", 82, 11.0, 3.4, 2.3),
+    ("Almendras", 579, 21.0, 22.0, 50.0),
+    ("Arroz integral cocido", 111, 2.6, 23.0, 0.9),
+    ("Palta (aguacate)", 160, 2.0, 9.0, 15.0),
+]
+
+# Lista blanca de nombres permitidos (seed + extras) para evitar mostrar alimentos ad-hoc agregados previamente
+_ALLOWED_FOODS = frozenset(r[0].lower() for r in _SEED_FOODS + _EXTRA_FOODS)
+
+
 def seed_foods_if_missing() -> None:
     """Create alimentos.csv with common foods if missing."""
     path = foods_path()
     if path.exists():
         return
     _ensure_csv(path, FOODS_HEADERS)
-    seed = [
-        ("Pechuga de pollo", 165, 31, 0, 3.6),
-        ("Arroz blanco cocido", 130, 2.7, 28, 0.3),
-        ("Avena", 389, 16.9, 66.3, 6.9),
-        ("Huevo (entero)", 155, 13, 1.1, 11),
-        ("Leche entera", 61, 3.2, 4.8, 3.3),
-        ("Pan blanco", 265, 9, 49, 3.2),
-        ("Pasta cocida", 157, 5.8, 30.9, 0.9),
-        ("Aceite de oliva", 884, 0, 0, 100),
-        ("Manzana", 52, 0.3, 14, 0.2),
-        ("Banana", 89, 1.1, 23, 0.3),
-        ("Yogur natural", 61, 3.5, 4.7, 3.3),
-    ]
     with path.open("a", newline="", encoding="utf-8") as f:
         w = csv.writer(f)
-        for r in seed:
+        for r in _SEED_FOODS:
             w.writerow([r[0], r[1], r[2], r[3], r[4]])
 
 
@@ -124,24 +268,6 @@ def ensure_additional_foods() -> None:
     path = foods_path()
     _ensure_csv(path, FOODS_HEADERS)
 
-    extras = [
-        ("Yogur griego (descremado)", 59, 10.0, 3.6, 0.4),
-        ("Batata cocida", 90, 2.0, 21.0, 0.1),
-        ("Salmón", 208, 20.0, 0.0, 13.0),
-        ("Atún en lata (agua)", 132, 29.0, 0.0, 1.0),
-        ("Lentejas cocidas", 116, 9.0, 20.0, 0.4),
-        ("Garbanzos cocidos", 164, 8.9, 27.4, 2.6),
-        ("Mantequilla de maní", 588, 25.0, 20.0, 50.0),
-        ("Proteína whey", 370, 90.0, 5.0, 2.0),
-        ("Brócoli", 34, 2.8, 7.0, 0.4),
-        ("Espinaca", 23, 2.9, 3.6, 0.4),
-        ("Quinoa cocida", 120, 4.4, 21.3, 1.9),
-        ("Requesón (cottage) 2%", 82, 11.0, 3.4, 2.3),
-        ("Almendras", 579, 21.0, 22.0, 50.0),
-        ("Arroz integral cocido", 111, 2.6, 23.0, 0.9),
-        ("Palta (aguacate)", 160, 2.0, 9.0, 15.0),
-    ]
-
     # Load existing names
     existing: set[str] = set()
     with path.open("r", newline="", encoding="utf-8") as f:
@@ -152,7 +278,7 @@ def ensure_additional_foods() -> None:
                 existing.add(nombre)
 
     # Append missing extras
-    to_add = [r for r in extras if r[0].strip().lower() not in existing]
+    to_add = [r for r in _EXTRA_FOODS if r[0].strip().lower() not in existing]
     if not to_add:
         return
     with path.open("a", newline="", encoding="utf-8") as f:
@@ -161,40 +287,180 @@ def ensure_additional_foods() -> None:
             w.writerow([r[0], r[1], r[2], r[3], r[4]])
 
 
+def prepare_foods_catalog() -> None:
+    """Seed and migrate alimentos.csv. Runs once per process (normally at startup)."""
+    global _catalog_prepared
+    with _catalog_lock:
+        if _catalog_prepared:
+            return
+        with _foods_lock():
+            seed_foods_if_missing()
+            ensure_additional_foods()
+        _catalog_prepared = True
+
+
+class _FoodCatalog:
+    """Process-wide cache of the parsed food catalog.
+
+    The CSV is parsed once and reused until its (mtime, size) signature changes
+    or `invalidate()` is called after a write. `version` increases on every rebuild;
+    `stamp` is the signature the current build was read with.
+    """
+
+    def __init__(self) -> None:
+        self.foods: List[Food] = []
+        self.by_name: Dict[str, Food] = {}
+        self.version = 0
+        self.stamp = "0"
+        self._signature: Optional[tuple] = None
+        self._index: Optional[FoodSearchIndex] = None
+        self._fragments: Optional[List[bytes]] = None
+        self.pages: "OrderedDict[tuple, Tuple[JSONPayload, Optional[str]]]" = OrderedDict()
+
+    @property
+    def index(self) -> FoodSearchIndex:
+        with _catalog_lock:
+            if self._index is None:
+                self._index = FoodSearchIndex([f.nombre for f in self.foods])
+            return self._index
+
+    @property
+    def fragments(self) -> List[bytes]:
+        """Each food serialized once, in `foods` order; pages are joined from these."""
+        with _catalog_lock:
+            if self._fragments is None:
+                self._fragments = [dumps(f.to_dict()) for f in self.foods]
+            return self._fragments
+
+    def invalidate(self) -> None:
+        with _catalog_lock:
+            self._signature = None
+
+    def refresh(self) -> "_FoodCatalog":
+        if not _catalog_prepared:
+            prepare_foods_catalog()
+        path = foods_path()
+        try:
+            st = path.stat()
+            signature = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            signature = None
+        if signature is not None and signature == self._signature:
+            return self
+        with _catalog_lock:
+            if signature is not None and signature == self._signature:
+                return self
+            foods: List[Food] = []
+            if signature is not None:
+                start = time.perf_counter()
+                with path.open("r", newline="", encoding="utf-8") as f:
+                    for row in csv.DictReader(f):
+                        try:
+                            food = Food.from_row(row)
+                        except Exception:
+                            continue
+                        if food.nombre.lower() in _ALLOWED_FOODS:
+                            foods.append(food)
+                metrics.observe_io("nutrition", "read", start, signature[1])
+            self.foods = foods
+            self.by_name = {f.nombre.lower(): f for f in foods}
+            self._index = None
+            self._fragments = None
+            self.pages = OrderedDict()
+            self.version += 1
+            self.stamp = "0" if signature is None else f"{signature[0]:x}{signature[1]:x}"
+            self._signature = signature
+        return self
+
+
+_catalog_lock = threading.RLock()
+_catalog_prepared = False
+_catalog = _FoodCatalog()
+
+
+def catalog_version() -> str:
+    """Catalog version shared by all processes, plus the CSV stamp (catches hand edits).
+
+    Used as the `/foods` validator: it changes whenever the served catalog can.
+    """
+    return f"{_versions().tag(CATALOG_KEY)}.{_catalog.refresh().stamp}"
+
+
 def load_foods() -> List[Food]:
-    seed_foods_if_missing()
-    ensure_additional_foods()
-    with foods_path().open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        foods: List[Food] = []
-        for row in reader:
-            try:
-                foods.append(Food.from_row(row))
-            except Exception:
-                continue
-        # Lista blanca de nombres permitidos (seed + extras) para evitar mostrar alimentos ad-hoc agregados previamente
-        allowed = {
-            "pechuga de pollo","arroz blanco cocido","avena","huevo (entero)","leche entera","pan blanco","pasta cocida","aceite de oliva","manzana","banana","yogur natural",
-            "yogur griego (descremado)","batata cocida","salmón","atún en lata (agua)","lentejas cocidas","garbanzos cocidos","mantequilla de maní","proteína whey","brócoli","espinaca","quinoa cocida","requesón (cottage) 2%","almendras","arroz integral cocido","palta (aguacate)"
-        }
-        return [f for f in foods if f.nombre.lower() in allowed]
+    """Return the cached catalog. The list is shared: callers must not mutate it."""
+    return _catalog.refresh().foods
 
 
-def search_foods(query: Optional[str] = None, limit: int = 20) -> List[Dict[str, float | str]]:
-    q = (query or "").strip().lower()
-    items = [f.to_dict() for f in load_foods()]
+def warm_caches(atleta: Optional[str] = None) -> None:
+    """Build the lazily-built in-memory state (food search index, daily totals) ahead of the first request."""
+    _catalog.refresh().index
+    hoy = date.today()
+    _meals(atleta).daily_totals(hoy, hoy)
+
+
+def _parse_cursor(cursor: Optional[str]) -> int:
+    try:
+        return max(0, int(cursor)) if cursor else 0
+    except ValueError:
+        raise ValueError("cursor inválido")
+
+
+def _page_positions(catalog: _FoodCatalog, q: str, offset: int, limit: int) -> Tuple[Sequence[int], Optional[str]]:
     if not q:
-        return items[:limit]
-    filtered = [it for it in items if q in str(it["nombre"]).lower()]
-    return filtered[:limit]
+        positions: Sequence[int] = range(offset, min(offset + limit, len(catalog.foods)))
+        more = offset + limit < len(catalog.foods)
+    else:
+        # Pedir uno extra para saber si hay página siguiente
+        found = catalog.index.search(q, offset=offset, limit=limit + 1)
+        more = len(found) > limit
+        positions = found[:limit]
+    return positions, str(offset + limit) if more else None
+
+
+def search_foods_page(
+    query: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, float | str]], Optional[str]]:
+    """Ranked search over the catalog. Returns (items, next_cursor); the cursor is opaque to clients."""
+    offset = _parse_cursor(cursor)
+    catalog = _catalog.refresh()
+    positions, next_cursor = _page_positions(catalog, (query or "").strip(), offset, max(0, limit))
+    return [catalog.foods[i].to_dict() for i in positions], next_cursor
+
+
+def search_foods_json(
+    query: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None
+) -> Tuple[JSONPayload, Optional[str]]:
+    """`search_foods_page` already serialized as a `FoodItem` list.
+
+    Pages are kept in an LRU cache until the catalog changes (a rebuild starts
+    with an empty cache), so repeated requests for the same page cost a dict lookup.
+    """
+    offset = _parse_cursor(cursor)
+    limit = max(0, limit)
+    catalog = _catalog.refresh()
+    q = (query or "").strip()
+    key = (q, offset, limit)
+    pages = catalog.pages
+    with _catalog_lock:  # posiciones y fragmentos de la misma versión del catálogo
+        cached = pages.get(key)
+        if cached is not None:
+            pages.move_to_end(key)
+            return cached
+        positions, next_cursor = _page_positions(catalog, q, offset, limit)
+        fragments = catalog.fragments
+        result = (JSONPayload(b"[" + b",".join(fragments[i] for i in positions) + b"]"), next_cursor)
+        pages[key] = result
+        while len(pages) > MAX_CACHED_FOOD_PAGES:
+            pages.popitem(last=False)
+    return result
+
+
+def search_foods(query: Optional[str] = None, limit: int = 20, cursor: Optional[str] = None) -> List[Dict[str, float | str]]:
+    return search_foods_page(query, limit, cursor)[0]
 
 
 def _find_food(nombre: str) -> Optional[Food]:
-    nombre_l = nombre.strip().lower()
-    for f in load_foods():
-        if f.nombre.lower() == nombre_l:
-            return f
-    return None
+    return _catalog.refresh().by_name.get(nombre.strip().lower())
 
 
 def _normalize_off_product(p: dict) -> Optional[dict]:
@@ -228,22 +494,112 @@ def _normalize_off_product(p: dict) -> Optional[dict]:
         return None
 
 
-def off_lookup_barcode(barcode: str) -> Optional[dict]:
-    url = f"https://world.openfoodfacts.org/api/v2/product/{barcode}.json"
+# =====================
+# Cliente Open Food Facts (async, compartido)
+# =====================
+OFF_BASE_URL = os.environ.get("OFF_BASE_URL", "https://world.openfoodfacts.org").rstrip("/")
+OFF_USER_AGENT = "progreso-inteligente/0.1 (+https://github.com/Martincagliero/progreso-inteligente)"
+
+_off_client: Optional[httpx.AsyncClient] = None
+
+
+def _off_timeout() -> httpx.Timeout:
+    import httpx
+
+    return httpx.Timeout(
+        connect=float(os.environ.get("OFF_CONNECT_TIMEOUT", "3.0")),
+        read=float(os.environ.get("OFF_READ_TIMEOUT", "8.0")),
+        write=5.0,
+        pool=float(os.environ.get("OFF_POOL_TIMEOUT", "5.0")),
+    )
+
+
+def _off_http2() -> bool:
+    # HTTP/2 sólo si está instalado el extra httpx[http2]
+    return importlib.util.find_spec("h2") is not None
+
+
+def open_off_client() -> httpx.AsyncClient:
+    """Create (once) the shared OFF client, on the first OFF request or during warm-up."""
+    global _off_client
+    if _off_client is None or _off_client.is_closed:
+        import httpx
+
+        _off_client = httpx.AsyncClient(
+            base_url=OFF_BASE_URL,
+            timeout=_off_timeout(),
+            limits=httpx.Limits(
+                max_connections=int(os.environ.get("OFF_MAX_CONNECTIONS", "20")),
+                max_keepalive_connections=int(os.environ.get("OFF_MAX_KEEPALIVE", "10")),
+                keepalive_expiry=30.0,
+            ),
+            http2=_off_http2(),
+            headers={"User-Agent": OFF_USER_AGENT},
+        )
+    return _off_client
+
+
+async def close_off_client() -> None:
+    global _off_client
+    if _off_client is not None:
+        await _off_client.aclose()
+        _off_client = None
+
+
+def _off_cache_path() -> Optional[Path]:
+    # OFF_CACHE_PATH="" desactiva el nivel en disco
+    raw = os.environ.get("OFF_CACHE_PATH")
+    if raw is None:
+        return storage.data_dir() / "off_cache.sqlite3"
+    return Path(raw) if raw else None
+
+
+# El archivo se resuelve y se abre en el primer uso (respeta PI_DATA_DIR fijado después del import)
+_barcode_cache = TTLCache("barcode", max_entries=4096, ttl=7 * 24 * 3600, negative_ttl=6 * 3600, path=_off_cache_path)
+_search_cache = TTLCache("search", max_entries=1024, ttl=24 * 3600, negative_ttl=3600, path=_off_cache_path)
+
+
+def off_cache_stats() -> Dict[str, Dict[str, float | int]]:
+    return {
+        "barcode": _barcode_cache.stats(),
+        "search": _search_cache.stats(),
+        "singleflight": {"upstream_calls": _off_flight.leaders, "coalesced": _off_flight.followers},
+    }
+
+
+async def _off_get(endpoint: str, url: str, **kwargs: object) -> httpx.Response:
+    """GET to OFF recording latency and outcome (ok, not_found, http_error, timeout, transport_error)."""
+    client = open_off_client()
+    import httpx
+
+    start = time.perf_counter()
+    outcome = "transport_error"
     try:
-        resp = httpx.get(url, timeout=8.0)
-        if resp.status_code != 200:
-            return None
-        data = resp.json()
-        prod = data.get("product")
-        if not prod:
-            return None
-        return _normalize_off_product(prod)
-    except Exception:
+        resp = await client.get(url, **kwargs)
+        outcome = "ok" if resp.status_code < 400 else "not_found" if resp.status_code < 500 else "http_error"
+        return resp
+    except httpx.TimeoutException:
+        outcome = "timeout"
+        raise
+    finally:
+        metrics.OFF_LATENCY.observe(time.perf_counter() - start, endpoint)
+        metrics.OFF_REQUESTS.inc(endpoint, outcome)
+
+
+async def _off_fetch_barcode(barcode: str) -> Optional[dict]:
+    """Query OFF for one barcode. Returns None when OFF says it doesn't exist; raises on transport/5xx errors."""
+    resp = await _off_get("product", f"/api/v2/product/{barcode}.json")
+    if resp.status_code >= 500:
+        resp.raise_for_status()
+    if resp.status_code != 200:
+        return None
+    prod = resp.json().get("product")
+    if not prod:
         return None
+    return _normalize_off_product(prod)
 
 
-def off_search(query: str, limit: int = 5) -> list[dict]:
+async def _off_fetch_search(query: str, limit: int) -> list[dict]:
     params = {
         "search_terms": query,
         "search_simple": 1,
@@ -251,19 +607,114 @@ def off_search(query: str, limit: int = 5) -> list[dict]:
         "json": 1,
         "page_size": max(5, limit * 2),
     }
+    resp = await _off_get("search", "/cgi/search.pl", params=params)
+    resp.raise_for_status()
+    products = resp.json().get("products", [])
+    out: list[dict] = []
+    for p in products:
+        norm = _normalize_off_product(p)
+        if norm:
+            out.append(norm)
+        if len(out) >= limit:
+            break
+    return out
+
+
+class _SingleFlight:
+    """Coalesce concurrent calls with the same key into one in-flight coroutine.
+
+    The shared call runs as its own task, so a client disconnecting does not
+    cancel the request the other waiters depend on.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+
+_off_flight = _SingleFlight()
+
+
+@metrics.REGISTRY.collector
+def _off_metrics() -> Iterator[metrics.Family]:
+    caches = {"barcode": _barcode_cache.stats(), "search": _search_cache.stats()}
+    yield metrics.Family("pi_cache_lookups_total", "counter", "Consultas a las cachés de OFF por resultado", [
+        metrics.Sample("", {"cache": name, "result": result}, st[key])
+        for name, st in caches.items()
+        for result, key in (("hit", "hits"), ("miss", "misses"))
+    ])
+    # Subconjuntos de los aciertos: negativos cacheados y aciertos leídos del nivel en disco
+    yield metrics.Family("pi_cache_negative_hits_total", "counter", "Aciertos de \"no encontrado\" cacheado", [
+        metrics.Sample("", {"cache": name}, st["negative_hits"]) for name, st in caches.items()
+    ])
+    yield metrics.Family("pi_cache_disk_hits_total", "counter", "Aciertos servidos desde el nivel en disco", [
+        metrics.Sample("", {"cache": name}, st["disk_hits"]) for name, st in caches.items()
+    ])
+    yield metrics.Family("pi_cache_hit_ratio", "gauge", "Aciertos / consultas de cada caché de OFF", [
+        metrics.Sample("", {"cache": name}, st["hit_ratio"]) for name, st in caches.items()
+    ])
+    yield metrics.Family("pi_cache_entries", "gauge", "Entradas en memoria de cada caché de OFF", [
+        metrics.Sample("", {"cache": name}, st["entries"]) for name, st in caches.items()
+    ])
+    yield metrics.Family("pi_cache_evictions_total", "counter", "Entradas desalojadas por LRU", [
+        metrics.Sample("", {"cache": name}, st["evictions"]) for name, st in caches.items()
+    ])
+    yield metrics.Family("pi_off_singleflight_total", "counter", "Lookups a OFF que salieron a la red (leader) o esperaron uno en curso (follower)", [
+        metrics.Sample("", {"role": "leader"}, _off_flight.leaders),
+        metrics.Sample("", {"role": "follower"}, _off_flight.followers),
+    ])
+
+
+async def _lookup_and_cache(key: str) -> Optional[dict]:
+    prod = await _off_fetch_barcode(key)
+    _barcode_cache.set(key, prod)
+    return prod
+
+
+async def _search_and_cache(key: str, query: str, limit: int) -> list[dict]:
+    results = await _off_fetch_search(query, limit)
+    _search_cache.set(key, results or None)
+    return results
+
+
+async def off_lookup_barcode(barcode: str) -> Optional[dict]:
+    key = barcode.strip()
+    # Base local importada (python -m app.core.off_local import ...) antes que la red
+    local = off_local.lookup_barcode(key)
+    if local:
+        return local
+    found, cached = _barcode_cache.get(key)
+    if found:
+        return cached
+    try:
+        return await _off_flight.do(f"barcode:{key}", lambda: _lookup_and_cache(key))
+    except Exception:
+        # Errores de red no se cachean: el próximo intento vuelve a consultar
+        return None
+
+
+async def off_search(query: str, limit: int = 5) -> list[dict]:
+    local = off_local.search(query, limit)
+    if local:
+        return local
+    key = f"{normalize(query)}|{limit}"
+    found, cached = _search_cache.get(key)
+    if found:
+        return cached or []
     try:
-        resp = httpx.get("https://world.openfoodfacts.org/cgi/search.pl", params=params, timeout=8.0)
-        if resp.status_code != 200:
-            return []
-        products = resp.json().get("products", [])
-        out: list[dict] = []
-        for p in products:
-            norm = _normalize_off_product(p)
-            if norm:
-                out.append(norm)
-            if len(out) >= limit:
-                break
-        return out
+        return await _off_flight.do(f"search:{key}", lambda: _search_and_cache(key, query, limit))
     except Exception:
         return []
 
@@ -275,6 +726,30 @@ def add_or_update_food(nombre: str, kcal_100: float, prot_100: float, carb_100:
     if kcal_100 <= 0 or prot_100 < 0 or carb_100 < 0 or grasa_100 < 0:
         raise ValueError("valores nutricionales inválidos")
 
+    with _foods_lock():
+        updated = _rewrite_food(nombre, kcal_100, prot_100, carb_100, grasa_100)
+    _catalog.invalidate()
+    _versions().bump([CATALOG_KEY])
+
+    return {
+        "nombre": nombre.strip(),
+        "kcal_100": float(kcal_100),
+        "prot_100": float(prot_100),
+        "carb_100": float(carb_100),
+        "grasa_100": float(grasa_100),
+        "updated": updated,
+    }
+
+
+async def add_or_update_food_async(
+    nombre: str, kcal_100: float, prot_100: float, carb_100: float, grasa_100: float
+) -> Dict[str, float | str]:
+    """add_or_update_food run by the single writer, ordered with the other writes."""
+    return await submit_exclusive(partial(add_or_update_food, nombre, kcal_100, prot_100, carb_100, grasa_100))
+
+
+def _rewrite_food(nombre: str, kcal_100: float, prot_100: float, carb_100: float, grasa_100: float) -> bool:
+    """Rewrite alimentos.csv with the food added or replaced; caller holds the foods lock."""
     path = foods_path()
     _ensure_csv(path, FOODS_HEADERS)
 
@@ -305,35 +780,33 @@ def add_or_update_food(nombre: str, kcal_100: float, prot_100: float, carb_100:
             "grasa_100": str(grasa_100),
         })
 
-    with path.open("w", newline="", encoding="utf-8") as f:
+    # Archivo temporal + rename: los lectores nunca ven el catálogo a medio escribir
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=FOODS_HEADERS)
         writer.writeheader()
         for r in rows:
             writer.writerow(r)
-
-    return {
-        "nombre": nombre.strip(),
-        "kcal_100": float(kcal_100),
-        "prot_100": float(prot_100),
-        "carb_100": float(carb_100),
-        "grasa_100": float(grasa_100),
-        "updated": updated,
-    }
+        f.flush()
+        if fsync_enabled():
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return updated
 
 
-def add_meal(
-    alimento: str, 
-    cantidad_g: float, 
+def _prepare_meal(
+    alimento: str,
+    cantidad_g: float,
     fecha: Optional[date] = None,
-    # Parámetros opcionales para alimentos personalizados (no en CSV)
     kcal_100: Optional[float] = None,
     prot_100: Optional[float] = None,
     carb_100: Optional[float] = None,
     grasa_100: Optional[float] = None
 ) -> Dict[str, float | str]:
+    """Validate a meal and compute its macros; returns the entry without storing it."""
     if cantidad_g <= 0:
         raise ValueError("cantidad_g debe ser > 0")
-    
+
     # Si vienen macros custom, usar esos valores; sino buscar en CSV
     if all([kcal_100 is not None, prot_100 is not None, carb_100 is not None, grasa_100 is not None]):
         # Usar macros proporcionados (alimento personalizado)
@@ -349,70 +822,126 @@ def add_meal(
         food = _find_food(alimento)
         if not food:
             raise LookupError("alimento no encontrado")
-    
+
     fecha = fecha or date.today()
     factor = cantidad_g / 100.0
-    kcal = round(food.kcal_100 * factor, 2)
-    prot = round(food.prot_100 * factor, 2)
-    carb = round(food.carb_100 * factor, 2)
-    grasa = round(food.grasa_100 * factor, 2)
-
-
-    path = meals_path()
-    _upgrade_meals_csv_if_needed()
-    meal_id = str(uuid.uuid4())
-    with path.open("a", newline="", encoding="utf-8") as f:
-        csv.writer(f).writerow([meal_id, fecha.isoformat(), food.nombre, cantidad_g, kcal, prot, carb, grasa])
-
     return {
-        "id": meal_id,
+        "id": str(uuid.uuid4()),
         "fecha": fecha.isoformat(),
         "alimento": food.nombre,
         "cantidad_g": cantidad_g,
-        "kcal": kcal,
-        "prot": prot,
-        "carb": carb,
-        "grasa": grasa,
+        "kcal": round(food.kcal_100 * factor, 2),
+        "prot": round(food.prot_100 * factor, 2),
+        "carb": round(food.carb_100 * factor, 2),
+        "grasa": round(food.grasa_100 * factor, 2),
     }
 
 
-def day_summary(fecha: Optional[date] = None) -> Dict[str, float | str | List[Dict[str, float | str]]]:
-    fecha = fecha or date.today()
-    path = meals_path()
-    if not path.exists():
-        return {"fecha": fecha.isoformat(), "kcal": 0.0, "prot": 0.0, "carb": 0.0, "grasa": 0.0, "comidas": []}
+def _meal_row(entry: Dict[str, float | str]) -> List[float | str]:
+    return [entry[h] for h in MEALS_HEADERS]
+
+
+def add_meal(
+    alimento: str, 
+    cantidad_g: float, 
+    fecha: Optional[date] = None,
+    # Parámetros opcionales para alimentos personalizados (no en CSV)
+    kcal_100: Optional[float] = None,
+    prot_100: Optional[float] = None,
+    carb_100: Optional[float] = None,
+    grasa_100: Optional[float] = None,
+    *,
+    atleta: Optional[str] = None,
+) -> Dict[str, float | str]:
+    entry = _prepare_meal(alimento, cantidad_g, fecha, kcal_100, prot_100, carb_100, grasa_100)
+    _meal_sink(atleta).write_batch([_meal_row(entry)])
+    return entry
+
+
+async def add_meal_async(
+    alimento: str,
+    cantidad_g: float,
+    fecha: Optional[date] = None,
+    *,
+    atleta: Optional[str] = None,
+    **custom: Optional[float],
+) -> Dict[str, float | str]:
+    """add_meal through the group-commit writer: concurrent requests share one fsync."""
+    entry = _prepare_meal(alimento, cantidad_g, fecha, **custom)
+    await submit_append(_meal_sink(atleta), [_meal_row(entry)])
+    return entry
+
 
+def add_meals(items: Sequence[Dict[str, object]]) -> List[Dict[str, object]]:
+    """Log many meals with one append per day partition (and athlete shard).
+
+    Each item takes add_meal's keyword arguments. Returns one result per item, in
+    order: {"ok": True, "entry": ...} or {"ok": False, "error": ...}.
+    """
+    results, by_shard = _prepare_meals(items)
+    for atleta, rows in by_shard.items():
+        _meal_sink(atleta).write_batch(rows)
+    return results
+
+
+async def add_meals_async(items: Sequence[Dict[str, object]]) -> List[Dict[str, object]]:
+    results, by_shard = _prepare_meals(items)
+    for atleta, rows in by_shard.items():
+        await submit_append(_meal_sink(atleta), rows)
+    return results
+
+
+def _prepare_meals(
+    items: Sequence[Dict[str, object]],
+) -> Tuple[List[Dict[str, object]], Dict[Optional[str], List[List[float | str]]]]:
+    results: List[Dict[str, object]] = []
+    by_shard: Dict[Optional[str], List[List[float | str]]] = {}
+    for item in items:
+        item = dict(item)
+        atleta = item.pop("atleta", None)
+        try:
+            storage.shard_dir(atleta)  # type: ignore[arg-type]
+            entry = _prepare_meal(**item)  # type: ignore[arg-type]
+        except ValueError as ve:
+            results.append({"ok": False, "error": str(ve)})
+            continue
+        except LookupError:
+            results.append({"ok": False, "error": "alimento no encontrado"})
+            continue
+        by_shard.setdefault(atleta, []).append(_meal_row(entry))  # type: ignore[arg-type]
+        results.append({"ok": True, "entry": entry})
+    return results, by_shard
+
+
+def day_summary(fecha: Optional[date] = None, *, atleta: Optional[str] = None) -> Dict[str, float | str | List[Dict[str, float | str]]]:
+    fecha = fecha or date.today()
     total_kcal = total_prot = total_carb = total_grasa = 0.0
     comidas: List[Dict[str, float | str]] = []
 
-    _upgrade_meals_csv_if_needed()
-    with path.open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row.get("fecha") != fecha.isoformat():
-                continue
-            try:
-                kcal = float(row["kcal"])
-                prot = float(row["prot"])
-                carb = float(row["carb"])
-                grasa = float(row["grasa"])
-                cantidad = float(row["cantidad_g"])
-            except Exception:
-                continue
-            total_kcal += kcal
-            total_prot += prot
-            total_carb += carb
-            total_grasa += grasa
-            comidas.append({
-                "id": row.get("id"),
-                "fecha": row.get("fecha", fecha.isoformat()),
-                "alimento": row.get("alimento", ""),
-                "cantidad_g": cantidad,
-                "kcal": kcal,
-                "prot": prot,
-                "carb": carb,
-                "grasa": grasa,
-            })
+    # Sólo se lee la partición del día pedido
+    for row in _meals(atleta).read_day(fecha.isoformat()):
+        try:
+            kcal = float(row["kcal"])
+            prot = float(row["prot"])
+            carb = float(row["carb"])
+            grasa = float(row["grasa"])
+            cantidad = float(row["cantidad_g"])
+        except Exception:
+            continue
+        total_kcal += kcal
+        total_prot += prot
+        total_carb += carb
+        total_grasa += grasa
+        comidas.append({
+            "id": row.get("id"),
+            "fecha": row.get("fecha", fecha.isoformat()),
+            "alimento": row.get("alimento", ""),
+            "cantidad_g": cantidad,
+            "kcal": kcal,
+            "prot": prot,
+            "carb": carb,
+            "grasa": grasa,
+        })
 
     return {
         "fecha": fecha.isoformat(),
@@ -424,38 +953,68 @@ def day_summary(fecha: Optional[date] = None) -> Dict[str, float | str | List[Di
     }
 
 
-def remove_meal(meal_id: str) -> bool:
+def day_summary_json(fecha: Optional[date] = None, *, atleta: Optional[str] = None) -> JSONPayload:
+    """`day_summary` serialized as a `DaySummary` (its keys are already in schema order)."""
+    return JSONPayload(dumps(day_summary(fecha, atleta=atleta)))
+
+
+def range_summary(desde: date, hasta: date, *, atleta: Optional[str] = None) -> Dict[str, object]:
+    """Per-day and total macros between two dates (inclusive), from the incremental daily totals."""
+    if hasta < desde:
+        raise ValueError("rango inválido: 'to' es anterior a 'from'")
+    if (hasta - desde).days >= MAX_RANGE_DAYS:
+        raise ValueError(f"rango demasiado largo (máximo {MAX_RANGE_DAYS} días)")
+    dias: List[Dict[str, float | int | str]] = []
+    total = [0.0, 0.0, 0.0, 0.0, 0]
+    for fecha, vals in _meals(atleta).daily_totals(desde, hasta):
+        for i in range(5):
+            total[i] += vals[i]
+        dias.append({
+            "fecha": fecha,
+            "kcal": round(vals[0], 2),
+            "prot": round(vals[1], 2),
+            "carb": round(vals[2], 2),
+            "grasa": round(vals[3], 2),
+            "comidas": int(vals[4]),
+        })
+    return {
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "kcal": round(total[0], 2),
+        "prot": round(total[1], 2),
+        "carb": round(total[2], 2),
+        "grasa": round(total[3], 2),
+        "comidas": int(total[4]),
+        "dias": dias,
+    }
+
+
+def iter_meals(*, atleta: Optional[str] = None) -> Iterator[Dict[str, str]]:
+    """All stored meals, day by day (memory bounded by the largest day)."""
+    return _meals(atleta).iter_all()
+
+
+def import_meals(entries: Sequence[Dict[str, object]], *, atleta: Optional[str] = None) -> Tuple[int, int]:
+    """Store already-validated meal entries (MEALS_HEADERS keys), keeping their ids.
+
+    Entries whose id already exists are skipped. Returns (imported, duplicates).
+    """
+    rows = [[str(e.get("id") or uuid.uuid4())] + [e[h] for h in MEALS_HEADERS[1:]] for e in entries]
+    imported = _meals(atleta).append_new(rows)
+    if imported:
+        _bump_days(atleta, rows)
+    return imported, len(entries) - imported
+
+
+def remove_meal(meal_id: str, *, atleta: Optional[str] = None) -> bool:
     """Delete a meal by id. Returns True if a row was deleted."""
-    path = meals_path()
-    if not path.exists():
+    store = _meals(atleta)
+    fecha = store.fecha_of(meal_id)
+    if fecha is None or not store.remove(meal_id):
         return False
-    _upgrade_meals_csv_if_needed()
-    deleted = False
-    with path.open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        rows = [row for row in reader]
-        headers = reader.fieldnames or MEALS_HEADERS
-    kept: list[dict] = []
-    for row in rows:
-        if row.get("id") == meal_id:
-            deleted = True
-            continue
-        kept.append(row)
-    if not deleted:
-        return False
-    # Rewrite file with kept rows
-    with path.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=MEALS_HEADERS)
-        writer.writeheader()
-        for row in kept:
-            writer.writerow({
-                "id": row.get("id", str(uuid.uuid4())),
-                "fecha": row.get("fecha", ""),
-                "alimento": row.get("alimento", ""),
-                "cantidad_g": row.get("cantidad_g", 0),
-                "kcal": row.get("kcal", 0),
-                "prot": row.get("prot", 0),
-                "carb": row.get("carb", 0),
-                "grasa": row.get("grasa", 0),
-            })
+    _versions(atleta).bump([_day_key(fecha)])
     return True
+
+
+async def remove_meal_async(meal_id: str, *, atleta: Optional[str] = None) -> bool:
+    return await submit_exclusive(partial(remove_meal, meal_id, atleta=atleta))
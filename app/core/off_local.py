@@ -0,0 +1,286 @@
+"""Base local de productos Open Food Facts, importada desde un export completo.
+
+Uso:
+    python -m app.core.off_local import en.openfoodfacts.org.products.csv.gz
+    python -m app.core.off_local import openfoodfacts-products.jsonl.gz --db /data/off.sqlite3
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterator, List, Optional
+
+from app.core import storage
+from app.core.food_index import normalize
+
+# Columnas del export CSV de OFF (separado por tabs) que alimentan los nutrientes
+_CSV_NUTRIMENTS = ["energy-kcal_100g", "energy_100g", "proteins_100g", "carbohydrates_100g", "fat_100g"]
+_MAX_TOKENS = 12
+
+
+def local_db_path() -> Path:
+    raw = os.environ.get("OFF_LOCAL_DB")
+    if raw:
+        return Path(raw)
+    return storage.data_dir() / "off_products.sqlite3"
+
+
+def _open_text(path: Path) -> IO[str]:
+    raw = path.open("rb")
+    if raw.read(2) == b"\x1f\x8b":
+        raw.seek(0)
+        raw = gzip.GzipFile(fileobj=raw)  # type: ignore[assignment]
+    else:
+        raw.seek(0)
+    return io.TextIOWrapper(raw, encoding="utf-8", errors="replace", newline="")
+
+
+def _is_jsonl(path: Path) -> bool:
+    suffixes = [s.lower() for s in path.suffixes if s.lower() != ".gz"]
+    return bool(suffixes) and suffixes[-1] in (".jsonl", ".json", ".ndjson")
+
+
+def _csv_row_to_product(row: Dict[str, str]) -> dict:
+    nutriments = {k: row[k] for k in _CSV_NUTRIMENTS if row.get(k)}
+    return {
+        "code": row.get("code"),
+        "product_name": row.get("product_name"),
+        "generic_name": row.get("generic_name"),
+        "brands": row.get("brands"),
+        "nutriments": nutriments,
+    }
+
+
+def iter_dump_products(path: Path) -> Iterator[dict]:
+    """Recorre el export (JSONL o CSV/TSV, opcionalmente gzip) sin cargarlo en memoria."""
+    with _open_text(path) as f:
+        if _is_jsonl(path):
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+            return
+        csv.field_size_limit(sys.maxsize)
+        first = f.readline()
+        delimiter = "\t" if first.count("\t") > first.count(",") else ","
+        reader = csv.DictReader(f, fieldnames=next(csv.reader([first], delimiter=delimiter)), delimiter=delimiter)
+        for row in reader:
+            yield _csv_row_to_product(row)
+
+
+def _tokens(nombre: str, marca: Optional[str]) -> List[str]:
+    seen: Dict[str, None] = {}
+    for tok in normalize(f"{nombre} {marca or ''}").split():
+        seen.setdefault(tok, None)
+    return list(seen)[:_MAX_TOKENS]
+
+
+def _create_schema(db: sqlite3.Connection) -> None:
+    db.executescript(
+        """
+        CREATE TABLE products (
+            barcode TEXT PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            marca TEXT,
+            kcal_100 REAL NOT NULL,
+            prot_100 REAL NOT NULL,
+            carb_100 REAL NOT NULL,
+            grasa_100 REAL NOT NULL
+        ) WITHOUT ROWID;
+        CREATE TABLE tokens (
+            token TEXT NOT NULL,
+            barcode TEXT NOT NULL,
+            PRIMARY KEY (token, barcode)
+        ) WITHOUT ROWID;
+        CREATE INDEX tokens_by_barcode ON tokens (barcode, token);
+        """
+    )
+
+
+def import_dump(
+    path: Path,
+    *,
+    db_path: Optional[Path] = None,
+    batch_size: int = 5000,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, int]:
+    """Importa un export de OFF a una base SQLite nueva y la reemplaza de forma atómica.
+
+    La memoria usada es constante: se procesa por lotes de `batch_size` productos.
+    """
+    # Import diferido para no crear un ciclo con nutrition (que consulta esta base)
+    from app.core.nutrition import _normalize_off_product
+
+    db_path = db_path or local_db_path()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = db_path.with_name(db_path.name + ".importing")
+    tmp_path.unlink(missing_ok=True)
+    db = sqlite3.connect(str(tmp_path))
+    db.execute("PRAGMA journal_mode=OFF")
+    db.execute("PRAGMA synchronous=OFF")
+    _create_schema(db)
+
+    read = imported = 0
+    # Por código de barras: si el export repite un producto, gana la última versión
+    products: Dict[str, tuple] = {}
+    tokens: Dict[str, List[str]] = {}
+
+    def flush() -> None:
+        codes = [(code,) for code in products]
+        # Los tokens de una versión anterior del producto (otro nombre) no deben seguir apuntándole
+        db.executemany("DELETE FROM tokens WHERE barcode = ?", codes)
+        db.executemany("INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?, ?, ?, ?)", products.values())
+        db.executemany(
+            "INSERT OR IGNORE INTO tokens VALUES (?, ?)",
+            ((tok, code) for code, toks in tokens.items() for tok in toks),
+        )
+        db.commit()
+        products.clear()
+        tokens.clear()
+
+    try:
+        for raw in iter_dump_products(path):
+            read += 1
+            norm = _normalize_off_product(raw)
+            if not norm or not norm.get("barcode"):
+                continue
+            code = str(norm["barcode"]).strip()
+            products[code] = (
+                code, norm["nombre"], norm["marca"],
+                norm["kcal_100"], norm["prot_100"], norm["carb_100"], norm["grasa_100"],
+            )
+            tokens[code] = _tokens(norm["nombre"], norm["marca"])
+            imported += 1
+            if len(products) >= batch_size:
+                flush()
+                if progress:
+                    progress(read, imported)
+        flush()
+        db.execute("PRAGMA journal_mode=DELETE")
+        db.execute("ANALYZE")
+        db.close()
+    except BaseException:
+        db.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, db_path)
+    return {"read": read, "imported": imported}
+
+
+class _LocalProducts:
+    """Conexión de sólo lectura a la base local; se reabre si el import reemplaza el archivo."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._signature: Optional[tuple] = None
+
+    def connection(self) -> Optional[sqlite3.Connection]:
+        path = local_db_path()
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            self._close()
+            return None
+        signature = (str(path), st.st_ino, st.st_mtime_ns)
+        if signature != self._signature:
+            self._close()
+            # La base nunca se modifica en el lugar (el import la reemplaza), así que es inmutable
+            self._db = sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+            self._signature = signature
+        return self._db
+
+    def _close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+        self._db = None
+        self._signature = None
+
+
+_local = _LocalProducts()
+
+_COLUMNS = "p.barcode, p.nombre, p.marca, p.kcal_100, p.prot_100, p.carb_100, p.grasa_100"
+
+
+def _row_to_dict(row: tuple) -> dict:
+    return {
+        "nombre": row[1],
+        "marca": row[2],
+        "barcode": row[0],
+        "kcal_100": row[3],
+        "prot_100": row[4],
+        "carb_100": row[5],
+        "grasa_100": row[6],
+    }
+
+
+def lookup_barcode(barcode: str) -> Optional[dict]:
+    with _local._lock:
+        db = _local.connection()
+        if db is None:
+            return None
+        row = db.execute(f"SELECT {_COLUMNS} FROM products p WHERE p.barcode = ?", (barcode,)).fetchone()
+    return _row_to_dict(row) if row else None
+
+
+def search(query: str, limit: int = 5) -> List[dict]:
+    """Productos cuyo nombre/marca contiene todas las palabras de la consulta como prefijo."""
+    toks = normalize(query).split()[:_MAX_TOKENS]
+    if not toks or limit <= 0:
+        return []
+    # La palabra más larga suele ser la más selectiva: recorre su rango y verifica el resto por EXISTS
+    toks.sort(key=len, reverse=True)
+    sql = (
+        f"SELECT DISTINCT {_COLUMNS} FROM tokens t JOIN products p ON p.barcode = t.barcode"
+        " WHERE t.token >= ? AND t.token < ?"
+    )
+    params: List[object] = [toks[0], toks[0] + "\uffff"]
+    for tok in toks[1:]:
+        sql += " AND EXISTS (SELECT 1 FROM tokens o WHERE o.barcode = t.barcode AND o.token >= ? AND o.token < ?)"
+        params.extend((tok, tok + "\uffff"))
+    sql += " LIMIT ?"
+    params.append(limit)
+    with _local._lock:
+        db = _local.connection()
+        if db is None:
+            return []
+        rows = db.execute(sql, params).fetchall()
+    return [_row_to_dict(r) for r in rows]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.core.off_local", description=__doc__)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import", help="importar un export de Open Food Facts (JSONL o CSV, gz opcional)")
+    imp.add_argument("dump", type=Path)
+    imp.add_argument("--db", type=Path, default=None, help="destino (por defecto OFF_LOCAL_DB u off_products.sqlite3 en PI_DATA_DIR)")
+    imp.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+
+    def report(read: int, imported: int) -> None:
+        rate = read / max(time.perf_counter() - start, 1e-9)
+        print(f"\r{read:,} leídos, {imported:,} importados ({rate:,.0f}/s)", end="", file=sys.stderr)
+
+    counts = import_dump(args.dump, db_path=args.db, batch_size=args.batch_size, progress=report)
+    print(file=sys.stderr)
+    print(f"Importados {counts['imported']:,} de {counts['read']:,} productos en {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from typing import Union
+
+import numpy as np
+
+ArrayLike = Union[float, int, np.ndarray, list]
+
+# Límite de escenarios × semanas por simulación
+MAX_SCENARIO_WEEKS = 5_000_000
+
+
+def _round2(x: np.ndarray) -> np.ndarray:
+    """round(x, 2) elemento a elemento, idéntico al `round` de Python.
+
+    np.round escala por 100 y redondea, lo que puede diferir de Python justo en los
+    empates (…5 en el tercer decimal). Esos casos, raros, se recalculan con `round`.
+    """
+    out = np.round(x, 2)
+    scaled = x * 100.0
+    dudosos = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    if dudosos.size:
+        out[dudosos] = [round(float(v), 2) for v in x[dudosos]]
+    return out
+
+
+def _validar(pesos: np.ndarray, reps: np.ndarray, rpe: np.ndarray) -> None:
+    if not np.all(np.isfinite(pesos)) or np.any(pesos <= 0):
+        raise ValueError("peso_actual debe ser > 0")
+    if np.any(reps < 1):
+        raise ValueError("reps debe ser >= 1")
+    if np.any((rpe < 1) | (rpe > 10)):
+        raise ValueError("rpe debe estar entre 1 y 10")
+
+
+def _proximo(pesos: np.ndarray, reps: np.ndarray, rpe: np.ndarray) -> np.ndarray:
+    # Misma tabla y mismo orden que el if-chain de recomendar_proximo_peso
+    delta = np.select(
+        [
+            (rpe <= 7) & (reps == 10),
+            (rpe == 8) & (reps == 10),
+            rpe == 9,
+            rpe == 10,
+            reps >= 10,
+            reps >= 8,
+        ],
+        [5.0, 2.5, 0.0, -2.5, 2.5, 0.0],
+        default=-2.5,
+    )
+    return _round2(pesos + delta)
+
+
+def recomendar_lote(pesos: ArrayLike, reps: ArrayLike, rpe: ArrayLike) -> np.ndarray:
+    """`recomendar_proximo_peso` aplicado a arrays (con broadcasting) en una sola pasada."""
+    p = np.asarray(pesos, dtype=np.float64)
+    r = np.asarray(reps, dtype=np.int64)
+    e = np.asarray(rpe, dtype=np.int64)
+    p, r, e = np.broadcast_arrays(p, r, e)
+    _validar(p, r, e)
+    return _proximo(p, r, e)
+
+
+def simular(pesos: ArrayLike, reps: ArrayLike, rpe: ArrayLike, semanas: int) -> np.ndarray:
+    """Aplica las reglas semana a semana a muchos escenarios a la vez.
+
+    `pesos` es el peso inicial de cada escenario (S,). `reps` y `rpe` pueden ser un
+    escalar, uno por escenario (S,) o un plan por escenario y semana (S, semanas).
+    Devuelve la matriz (S, semanas + 1) de pesos: columna 0 el inicial, columna k
+    el recomendado tras la semana k.
+    """
+    if semanas < 1:
+        raise ValueError("semanas debe ser >= 1")
+    p0 = np.atleast_1d(np.asarray(pesos, dtype=np.float64))
+    if p0.ndim != 1:
+        raise ValueError("pesos debe ser un vector")
+    forma = (p0.size, semanas)
+    if p0.size * semanas > MAX_SCENARIO_WEEKS:
+        raise ValueError(f"demasiados escenarios × semanas (máximo {MAX_SCENARIO_WEEKS})")
+    r = _plan(reps, forma, "reps")
+    e = _plan(rpe, forma, "rpe")
+    _validar(p0, r, e)
+
+    out = np.empty((p0.size, semanas + 1), dtype=np.float64)
+    out[:, 0] = p0
+    for k in range(semanas):
+        # Una pasada vectorizada por semana sobre todos los escenarios
+        out[:, k + 1] = _proximo(out[:, k], r[:, k], e[:, k])
+    return out
+
+
+def _plan(values: ArrayLike, forma: tuple, nombre: str) -> np.ndarray:
+    arr = np.asarray(values, dtype=np.int64)
+    if arr.ndim == 1:
+        if arr.size != forma[0]:
+            raise ValueError(f"{nombre}: se esperaba un valor por escenario ({forma[0]})")
+        arr = arr[:, None]
+    elif arr.ndim == 2 and arr.shape != forma:
+        raise ValueError(f"{nombre}: se esperaba una matriz {forma[0]}×{forma[1]}")
+    elif arr.ndim > 2:
+        raise ValueError(f"{nombre}: demasiadas dimensiones")
+    return np.broadcast_to(arr, forma)
+
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from types import FrameType
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core import storage
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# Perfil del request en curso: asyncio.to_thread copia el contexto al hilo que hace el trabajo
+_current: contextvars.ContextVar[Optional["_Profile"]] = contextvars.ContextVar("pi_profile", default=None)
+
+# Cabecera para pedir el perfil de un request puntual (requiere PI_PROFILE_TOKEN)
+PROFILE_HEADER = b"x-profile"
+DEFAULT_INTERVAL_MS = 1.0
+
+
+def profile_rate() -> float:
+    # PI_PROFILE_RATE=0.01 perfila ~1 de cada 100 requests
+    return min(max(float(os.environ.get("PI_PROFILE_RATE", "0") or 0), 0.0), 1.0)
+
+
+def profile_token() -> Optional[str]:
+    return os.environ.get("PI_PROFILE_TOKEN") or None
+
+
+def profile_dir() -> Path:
+    raw = os.environ.get("PI_PROFILE_DIR")
+    return Path(raw) if raw else storage.data_dir() / "profiles"
+
+
+def enabled() -> bool:
+    """Si es False la app ni siquiera instala el middleware (costo cero)."""
+    return profile_rate() > 0 or profile_token() is not None
+
+
+@lru_cache(maxsize=1024)
+def _short_path(filename: str) -> str:
+    i = filename.rfind("site-packages" + os.sep)
+    if i >= 0:
+        return filename[i + len("site-packages") + 1:]
+    try:
+        return str(Path(filename).resolve().relative_to(_PROJECT_ROOT))
+    except ValueError:
+        return os.path.basename(filename)
+
+
+def _label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _worker_job(frame: Optional[FrameType]) -> Optional[Tuple[contextvars.Context, FrameType]]:
+    """Contexto y frame del ejecutor si el hilo está corriendo un trabajo de `to_thread`."""
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == "run":
+            if code.co_filename.endswith(os.path.join("concurrent", "futures", "thread.py")):
+                # asyncio.to_thread: _WorkItem.fn = partial(ctx.run, func, ...)
+                fn = getattr(frame.f_locals.get("self"), "fn", None)
+                ctx = getattr(fn.func, "__self__", None) if isinstance(fn, functools.partial) else None
+            elif code.co_filename.endswith(os.path.join("anyio", "_backends", "_asyncio.py")):
+                # Endpoints síncronos de Starlette: WorkerThread.run hace context.run(func, ...)
+                ctx = frame.f_locals.get("context")
+            else:
+                ctx = None
+            return (ctx, frame) if isinstance(ctx, contextvars.Context) else None
+        frame = frame.f_back
+    return None
+
+
+class _Profile:
+    """Muestras de un request: pila en CPU si está corriendo, o lo que está esperando si no."""
+
+    def __init__(self, task: asyncio.Task, root: FrameType, loop_thread: int) -> None:
+        self.task = task
+        self.root = root  # frame del middleware para este request
+        self.loop_thread = loop_thread
+        self.stacks: Counter = Counter()
+
+    def sample(self, frames: Dict[int, FrameType], workers: List[Tuple[FrameType, FrameType]]) -> None:
+        stack = self._running(frames.get(self.loop_thread))
+        if stack:
+            self.stacks[";".join(stack)] += 1
+            return
+        stack = self._suspended()
+        if not stack:
+            return
+        if not workers:
+            self.stacks[";".join(stack)] += 1
+            return
+        # Esperando un to_thread: la pila del hilo que hace el trabajo va bajo el await
+        if stack[-1].startswith("<await"):
+            stack = stack[:-1]
+        for frame, boundary in workers:
+            self.stacks[";".join([*stack, "<thread>", *self._thread_stack(frame, boundary)])] += 1
+
+    @staticmethod
+    def _thread_stack(frame: Optional[FrameType], boundary: FrameType) -> List[str]:
+        labels: List[str] = []
+        while frame is not None and frame is not boundary:
+            labels.append(_label(frame))
+            frame = frame.f_back
+        labels.reverse()
+        return labels
+
+    def _running(self, frame: Optional[FrameType]) -> Optional[List[str]]:
+        labels: List[str] = []
+        while frame is not None:
+            labels.append(_label(frame))
+            if frame is self.root:
+                labels.reverse()
+                return labels
+            frame = frame.f_back
+        return None  # el event loop está ocupado con otra cosa
+
+    def _suspended(self) -> Optional[List[str]]:
+        labels: List[str] = []
+        obj: object = self.task.get_coro()
+        inside = False
+        while obj is not None:
+            frame = getattr(obj, "cr_frame", None) or getattr(obj, "gi_frame", None) or getattr(obj, "ag_frame", None)
+            if frame is None and not hasattr(obj, "cr_await") and not hasattr(obj, "gi_yieldfrom"):
+                # Hoja: lo que se está esperando (Future de OFF, del writer, etc.)
+                if inside:
+                    labels.append(f"<await {type(obj).__name__}>")
+                break
+            if frame is self.root:
+                inside = True
+            if inside and frame is not None:
+                labels.append(_label(frame))
+            obj = getattr(obj, "cr_await", None) or getattr(obj, "gi_yieldfrom", None) or getattr(obj, "ag_await", None)
+        return labels if inside else None
+
+
+class _Sampler:
+    """Un único hilo que muestrea todas las pilas activas cada `interval` segundos."""
+
+    def __init__(self) -> None:
+        self._active: List[_Profile] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.interval = DEFAULT_INTERVAL_MS / 1000.0
+
+    def add(self, profile: _Profile) -> None:
+        with self._lock:
+            self._active.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+                self._thread.start()
+
+    def remove(self, profile: _Profile) -> None:
+        with self._lock:
+            self._active.remove(profile)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._thread = None
+                    return
+            frames = sys._current_frames()
+            workers = self._workers(frames, active)
+            for profile in active:
+                profile.sample(frames, workers.get(id(profile), []))
+            del frames, workers
+            time.sleep(self.interval)
+
+
+    @staticmethod
+    def _workers(frames: Dict[int, FrameType], active: List[_Profile]) -> Dict[int, List[Tuple[FrameType, FrameType]]]:
+        """Hilos que están corriendo trabajo de un request perfilado, por id del perfil."""
+        skip = {threading.get_ident(), *(p.loop_thread for p in active)}
+        ids = {id(p) for p in active}
+        found: Dict[int, List[Tuple[FrameType, FrameType]]] = {}
+        for ident, frame in frames.items():
+            if ident in skip:
+                continue
+            job = _worker_job(frame)
+            if job is None:
+                continue
+            profile = job[0].get(_current)
+            if profile is not None and id(profile) in ids:
+                found.setdefault(id(profile), []).append((frame, job[1]))
+        return found
+
+
+_sampler = _Sampler()
+
+
+def _route_slug(scope: dict) -> str:
+    path = getattr(scope.get("route"), "path", None)
+    if not path:
+        return "unmatched"
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", path).strip("_") or "index"
+
+
+class ProfilerMiddleware:
+    """Middleware ASGI que perfila una fracción de los requests (o los que traen X-Profile).
+
+    Cada request perfilado deja un archivo de pilas colapsadas (formato de
+    flamegraph.pl / speedscope) en `<PI_PROFILE_DIR>/<ruta>/`. El muestreo es por
+    tiempo de pared: incluye tanto el trabajo en CPU (parseo de CSV, construcción de
+    modelos) como las esperas (`<await …>` bajo la llamada a OFF o al writer).
+
+    El trabajo que el request manda a `asyncio.to_thread` (o a un endpoint síncrono)
+    se muestrea en el hilo que lo corre y aparece bajo `<thread>`. No se atribuye lo
+    que corre en hilos con otro contexto: el commit en grupo del writer sale como
+    `<await Future>`, porque lo lanza la tarea del writer y no la del request.
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        *,
+        rate: Optional[float] = None,
+        token: Optional[str] = None,
+        out: Optional[Path] = None,
+        interval_ms: Optional[float] = None,
+    ) -> None:
+        self.app = app
+        self.rate = profile_rate() if rate is None else rate
+        self.token = (token or profile_token() or "").encode()
+        self.out = out or profile_dir()
+        _sampler.interval = float(interval_ms or os.environ.get("PI_PROFILE_INTERVAL_MS") or DEFAULT_INTERVAL_MS) / 1000.0
+
+    def _wanted(self, scope: dict) -> bool:
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return hmac.compare_digest(value, self.token)
+        return self.rate > 0 and random.random() < self.rate
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+        task = asyncio.current_task()
+        assert task is not None
+        profile = _Profile(task, sys._getframe(), threading.get_ident())
+        started = time.perf_counter()
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S.%f")
+
+        async def send_wrapper(message: dict) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), (b"x-profile-id", stamp.encode())]
+            await send(message)
+
+        _sampler.add(profile)
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            _sampler.remove(profile)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            name = f"{stamp}-{scope['method']}-{elapsed_ms:.0f}ms.folded"
+            await asyncio.to_thread(self._write, _route_slug(scope), name, profile.stacks)
+
+    def _write(self, route: str, name: str, stacks: Counter) -> None:
+        folder = self.out / route
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / name).write_text("".join(f"{stack} {n}\n" for stack, n in stacks.most_common()), encoding="utf-8")
@@ -1,9 +1,17 @@
 from __future__ import annotations
 
+from bisect import bisect_left, bisect_right
 from datetime import date, timedelta
 from pathlib import Path
 import csv
-from typing import Iterable, List, Optional
+import io
+import os
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.core import metrics, storage
+from app.core.writer import fsync_enabled, process_lock, submit_append
 
 CSV_HEADERS = ["ejercicio", "peso_actual", "reps", "fecha"]
 
@@ -25,8 +33,8 @@ def recomendar_proximo_peso(peso_actual: float, reps: int, rpe: int) -> float:
     return round(peso_actual - 2.5, 2)
 
 
-def historial_path() -> Path:
-    return Path(__file__).resolve().parent.parent.parent / "historial.csv"
+def historial_path(atleta: Optional[str] = None) -> Path:
+    return storage.shard_dir(atleta) / "historial.csv"
 
 
 def _asegurar_csv(path: Path) -> None:
@@ -36,54 +44,287 @@ def _asegurar_csv(path: Path) -> None:
             csv.writer(f).writerow(CSV_HEADERS)
 
 
-def registrar(ejercicio: str, peso_actual: float, reps: int, fecha: date, *, path: Optional[Path] = None) -> None:
-    path = path or historial_path()
-    _asegurar_csv(path)
-    with path.open("a", newline="", encoding="utf-8") as f:
-        csv.writer(f).writerow([ejercicio, f"{peso_actual}", reps, fecha.isoformat()])
+def _fila(ejercicio: str, peso_actual: float, reps: int, fecha: date) -> List[object]:
+    return [ejercicio, f"{peso_actual}", reps, fecha.isoformat()]
+
+
+def registrar(
+    ejercicio: str, peso_actual: float, reps: int, fecha: date, *, path: Optional[Path] = None, atleta: Optional[str] = None
+) -> None:
+    _repo(path, atleta).write_batch([_fila(ejercicio, peso_actual, reps, fecha)])
+
+
+def registrar_lote(
+    filas: Iterable[Tuple[str, float, int, date]], *, path: Optional[Path] = None, atleta: Optional[str] = None
+) -> int:
+    """Registra varias series (ejercicio, peso, reps, fecha) con un solo append. Devuelve cuántas."""
+    nuevas = [_fila(*f) for f in filas]
+    if nuevas:
+        _repo(path, atleta).write_batch(nuevas)
+    return len(nuevas)
+
+
+async def registrar_async(
+    ejercicio: str, peso_actual: float, reps: int, fecha: date, *, path: Optional[Path] = None, atleta: Optional[str] = None
+) -> None:
+    """Como `registrar`, pero vía el writer con commit grupal (para handlers async)."""
+    await submit_append(_repo(path, atleta), [_fila(ejercicio, peso_actual, reps, fecha)])
+
+
+async def registrar_lote_async(
+    filas: Iterable[Tuple[str, float, int, date]], *, path: Optional[Path] = None, atleta: Optional[str] = None
+) -> int:
+    nuevas = [_fila(*f) for f in filas]
+    if nuevas:
+        await submit_append(_repo(path, atleta), nuevas)
+    return len(nuevas)
+
+
+def iter_historial(path: Optional[Path] = None, *, atleta: Optional[str] = None) -> Iterator[Dict[str, str]]:
+    """Recorre el historial fila por fila, sin cargarlo entero en memoria."""
+    return _repo(path, atleta).iter_rows()
 
 
 def _leer(path: Optional[Path] = None) -> List[dict]:
-    path = path or historial_path()
-    if not path.exists():
-        return []
-    rows: List[dict] = []
-    with path.open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            rows.append(r)
-    return rows
+    return list(iter_historial(path))
 
 
-def _filtrar_semana(rows: Iterable[dict], ejercicio: str) -> List[dict]:
-    hoy = date.today()
-    hace_7 = hoy - timedelta(days=7)
-    filtradas: List[dict] = []
-    for r in rows:
-        if r.get("ejercicio") != ejercicio:
-            continue
-        try:
-            f = date.fromisoformat(r.get("fecha", ""))
-        except Exception:
-            continue
-        if f >= hace_7:
-            filtradas.append(r)
-    return filtradas
-
-
-def promedio_reps_semana(ejercicio: str, *, path: Optional[Path] = None) -> Optional[float]:
-    rows = _leer(path)
-    semana = _filtrar_semana(rows, ejercicio)
-    if not semana:
-        return None
-    total = 0
-    count = 0
-    for r in semana:
+# =====================
+# Índice en memoria del historial
+# =====================
+class _Serie:
+    """Series de un ejercicio ordenada por fecha, con sumas acumuladas de reps.
+
+    Mantiene un puntero al inicio de la ventana móvil de 7 días: como la fecha de
+    corte sólo avanza, el puntero se mueve en O(1) amortizado por consulta.
+    """
+
+    __slots__ = ("fechas", "pesos", "reps", "reps_acum", "_desde", "_inicio")
+
+    def __init__(self) -> None:
+        self.fechas: List[int] = []  # ordinales de fecha, ordenados
+        self.pesos: List[float] = []
+        self.reps: List[int] = []
+        self.reps_acum: List[int] = [0]  # reps_acum[i] = sum(reps[:i])
+        self._desde = 0
+        self._inicio = 0
+
+    def agregar(self, ordinal: int, peso: float, reps: int) -> None:
+        if not self.fechas or ordinal >= self.fechas[-1]:
+            self.fechas.append(ordinal)
+            self.pesos.append(peso)
+            self.reps.append(reps)
+            self.reps_acum.append(self.reps_acum[-1] + reps)
+            return
+        # Fila fuera de orden (poco común): insertar y recalcular acumulados desde ahí
+        i = bisect_right(self.fechas, ordinal)
+        self.fechas.insert(i, ordinal)
+        self.pesos.insert(i, peso)
+        self.reps.insert(i, reps)
+        acum = self.reps_acum
+        del acum[i + 1:]
+        for r in self.reps[i:]:
+            acum.append(acum[-1] + r)
+        if ordinal < self._desde:
+            self._inicio += 1
+
+    def promedio_desde(self, desde: int) -> Optional[float]:
+        if desde < self._desde:
+            self._inicio = bisect_left(self.fechas, desde)
+        else:
+            fechas = self.fechas
+            i = self._inicio
+            while i < len(fechas) and fechas[i] < desde:
+                i += 1
+            self._inicio = i
+        self._desde = desde
+        count = len(self.fechas) - self._inicio
+        if count == 0:
+            return None
+        total = self.reps_acum[-1] - self.reps_acum[self._inicio]
+        return round(total / count, 2)
+
+
+class _HistorialStore:
+    """Índice por ejercicio de un historial CSV, cargado una sola vez.
+
+    Recuerda hasta qué byte leyó el archivo: si otro proceso (o `registrar`)
+    agrega filas, sólo se parsea la cola nueva. Si el archivo se achica o se
+    reemplaza, se recarga completo.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.series: Dict[str, _Serie] = {}
+        self._lock = threading.Lock()
+        self._campos: Optional[List[str]] = None
+        self._offset = 0
+        self._firma: Optional[tuple] = None
+
+    def write_batch(self, filas: List[List[object]]) -> None:
+        """Agrega filas con un solo write + fsync, bajo el lock entre procesos del archivo."""
+        with process_lock(self.path.with_name(self.path.name + ".lock")):
+            _asegurar_csv(self.path)
+            inicio = time.perf_counter()
+            with self.path.open("a", newline="", encoding="utf-8") as f:
+                offset = f.tell()
+                csv.writer(f).writerows(filas)
+                f.flush()
+                if fsync_enabled():
+                    os.fsync(f.fileno())
+                metrics.observe_io("progression", "write", inicio, f.tell() - offset)
+        # Lee sólo la cola recién agregada para mantener el índice al día
+        self.sincronizar()
+
+    def iter_rows(self) -> Iterator[Dict[str, str]]:
+        if not self.path.exists():
+            return
+        with self.path.open("r", newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+
+    def _reiniciar(self) -> None:
+        self.series = {}
+        self._campos = None
+        self._offset = 0
+        self._firma = None
+
+    def sincronizar(self) -> None:
+        with self._lock:
+            try:
+                st = self.path.stat()
+            except FileNotFoundError:
+                self._reiniciar()
+                return
+            firma = (st.st_mtime_ns, st.st_size)
+            if firma == self._firma:
+                return
+            if st.st_size < self._offset:
+                self._reiniciar()
+            inicio = time.perf_counter()
+            with self.path.open("rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+            metrics.observe_io("progression", "read", inicio, len(data))
+            # Sólo consumir líneas completas (un writer concurrente puede estar a mitad de fila)
+            fin = data.rfind(b"\n") + 1
+            if fin:
+                self._indexar(data[:fin].decode("utf-8"))
+                self._offset += fin
+            self._firma = firma if fin == len(data) else None
+
+    def _indexar(self, texto: str) -> None:
+        reader = csv.reader(io.StringIO(texto, newline=""))
+        if self._campos is None:
+            self._campos = next(reader, None)
+            if self._campos is None:
+                return
+        campos = self._campos
         try:
-            total += int(r.get("reps", 0))
-            count += 1
+            i_ej = campos.index("ejercicio")
+            i_peso = campos.index("peso_actual")
+            i_reps = campos.index("reps")
+            i_fecha = campos.index("fecha")
         except ValueError:
-            continue
-    if count == 0:
-        return None
-    return round(total / count, 2)
+            return
+        for r in reader:
+            try:
+                ordinal = date.fromisoformat(r[i_fecha]).toordinal()
+                reps = int(r[i_reps])
+            except (IndexError, ValueError):
+                continue
+            try:
+                peso = float(r[i_peso])
+            except ValueError:
+                peso = float("nan")
+            serie = self.series.get(r[i_ej])
+            if serie is None:
+                serie = self.series[r[i_ej]] = _Serie()
+            serie.agregar(ordinal, peso, reps)
+
+    def serie(self, ejercicio: str) -> Tuple[List[int], List[float], List[int]]:
+        """Copia de (ordinales de fecha, pesos, reps) del ejercicio, ordenada por fecha."""
+        self.sincronizar()
+        with self._lock:
+            serie = self.series.get(ejercicio)
+            if serie is None:
+                return [], [], []
+            return list(serie.fechas), list(serie.pesos), list(serie.reps)
+
+    def promedio_reps_desde(self, ejercicio: str, desde: date) -> Optional[float]:
+        self.sincronizar()
+        with self._lock:
+            serie = self.series.get(ejercicio)
+            if serie is None:
+                return None
+            return serie.promedio_desde(desde.toordinal())
+
+
+_stores: Dict[Path, _HistorialStore] = {}
+_stores_lock = threading.Lock()
+
+
+def _store_para(path: Optional[Path] = None) -> _HistorialStore:
+    path = (path or historial_path()).resolve()
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = _HistorialStore(path)
+        return store
+
+
+_sqlite_repos: Dict[Path, storage.SQLiteSessions] = {}
+_sqlite_lock = threading.Lock()
+
+
+def _repo(path: Optional[Path] = None, atleta: Optional[str] = None) -> storage.SessionRepository:
+    """Repositorio del historial del atleta según PI_STORAGE; un `path` explícito es siempre un CSV."""
+    if path is not None or storage.backend() == "csv":
+        return _store_para(path or historial_path(atleta))
+    db_path = storage.sqlite_path(atleta)
+    with _sqlite_lock:
+        repo = _sqlite_repos.get(db_path)
+        if repo is None:
+            db = storage.sqlite_database(db_path)
+            repo = storage.SQLiteSessions(db)
+            # Al pasar a SQLite se importa una vez el historial.csv existente del shard
+            legacy = _store_para(historial_path(atleta))
+            storage.import_rows(db, "import:historial.csv", repo, (
+                [r.get(h, "") for h in CSV_HEADERS] for r in legacy.iter_rows() if _fila_valida(r)
+            ))
+            repo = _sqlite_repos[db_path] = repo
+        return repo
+
+
+def prepare_historial(atleta: Optional[str] = None) -> None:
+    """Abre el historial del atleta; con SQLite, importa una vez el historial.csv existente."""
+    _repo(atleta=atleta)
+
+
+def warm_historial(atleta: Optional[str] = None) -> None:
+    """Carga de antemano el índice en memoria del historial CSV (si no, lo hace la primera consulta)."""
+    repo = _repo(atleta=atleta)
+    if isinstance(repo, _HistorialStore):
+        repo.sincronizar()
+
+
+def _fila_valida(r: Dict[str, str]) -> bool:
+    try:
+        date.fromisoformat(r.get("fecha") or "")
+        int(r.get("reps") or "")
+    except ValueError:
+        return False
+    return bool(r.get("ejercicio"))
+
+
+def serie_ejercicio(
+    ejercicio: str, *, path: Optional[Path] = None, atleta: Optional[str] = None
+) -> Tuple[List[int], List[float], List[int]]:
+    """Historial de un ejercicio como (ordinales de fecha, pesos, reps), ordenado por fecha."""
+    return _repo(path, atleta).serie(ejercicio)
+
+
+def promedio_reps_semana(
+    ejercicio: str, *, path: Optional[Path] = None, atleta: Optional[str] = None
+) -> Optional[float]:
+    hace_7 = date.today() - timedelta(days=7)
+    return _repo(path, atleta).promedio_reps_desde(ejercicio, hace_7)
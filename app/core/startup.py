@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Sequence, Tuple
+
+from app.core import metrics
+
+# Mismo logger que los mensajes de arranque de uvicorn, así el reporte sale junto a ellos
+logger = logging.getLogger("uvicorn.error")
+
+
+class StartupReport:
+    """Duración de cada fase del arranque (imports, migraciones, pre-calentado)."""
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def summary(self, names: Sequence[str]) -> str:
+        total = sum(self.phases.get(n, 0.0) for n in names)
+        parts = ", ".join(f"{n} {self.phases[n] * 1000:.0f} ms" for n in names if n in self.phases)
+        return f"{total * 1000:.0f} ms ({parts})"
+
+
+report = StartupReport()
+
+
+@metrics.REGISTRY.collector
+def _startup_metrics() -> Iterator[metrics.Family]:
+    yield metrics.Family("pi_startup_phase_seconds", "gauge", "Duración de cada fase del arranque", [
+        metrics.Sample("", {"phase": name}, seconds) for name, seconds in list(report.phases.items())
+    ])
+
+
+async def warm_up(steps: Sequence[Tuple[str, Callable[[], object]]]) -> None:
+    """Corre en segundo plano, ya aceptando requests, lo que sólo acelera el primer uso.
+
+    Cada paso va a un hilo; si uno falla se registra y se sigue con el resto (el
+    mismo trabajo se hará, perezosamente, en el primer request que lo necesite).
+    """
+    names = []
+    for name, fn in steps:
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(fn)
+        except Exception:
+            logger.warning("pre-calentado %s falló", name, exc_info=True)
+            continue
+        report.record(f"warmup:{name}", time.perf_counter() - start)
+        names.append(f"warmup:{name}")
+    logger.info("Pre-calentado en segundo plano: %s", report.summary(names))
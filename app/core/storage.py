@@ -0,0 +1,353 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Protocol, Sequence, Tuple
+
+from app.core.writer import fsync_enabled
+
+BACKENDS = ("csv", "sqlite")
+
+# Identificador de atleta: se usa como nombre de directorio, así que sin separadores
+ATLETA_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+
+# Columnas en el orden de CSV_HEADERS / MEALS_HEADERS
+_SESSION_COLS = ("ejercicio", "peso_actual", "reps", "fecha")
+_MEAL_COLS = ("id", "fecha", "alimento", "cantidad_g", "kcal", "prot", "carb", "grasa")
+
+
+def data_dir() -> Path:
+    """Directorio de datos (historial, alimentos, comidas). PI_DATA_DIR o la raíz del proyecto."""
+    env = os.environ.get("PI_DATA_DIR")
+    if env:
+        return Path(env).expanduser().resolve()
+    return Path(__file__).resolve().parent.parent.parent
+
+
+def backend() -> str:
+    """Backend de almacenamiento elegido con PI_STORAGE: `csv` (por defecto) o `sqlite`."""
+    name = os.environ.get("PI_STORAGE", "csv").strip().lower() or "csv"
+    if name not in BACKENDS:
+        raise ValueError(f"PI_STORAGE inválido: {name!r} (use {' o '.join(BACKENDS)})")
+    return name
+
+
+def shard_map_path() -> Path:
+    return Path(os.environ.get("PI_SHARD_MAP") or data_dir() / "shards.json")
+
+
+_shard_map_cache: Tuple[Optional[tuple], Dict[str, str]] = (None, {})
+_shard_map_lock = threading.Lock()
+
+
+def _shard_map() -> Dict[str, str]:
+    """Ubicaciones explícitas {atleta: directorio}; se relee sólo si el archivo cambia."""
+    global _shard_map_cache
+    path = shard_map_path()
+    try:
+        st = path.stat()
+        signature: Optional[tuple] = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        signature = None
+    with _shard_map_lock:
+        if signature != _shard_map_cache[0]:
+            mapping: Dict[str, str] = {}
+            if signature is not None:
+                with path.open("r", encoding="utf-8") as f:
+                    mapping = {str(k): str(v) for k, v in json.load(f).items()}
+            _shard_map_cache = (signature, mapping)
+        return _shard_map_cache[1]
+
+
+def shard_dir(atleta: Optional[str] = None) -> Path:
+    """Directorio con los datos de un atleta (historial, comidas, base SQLite).
+
+    Sin atleta se usa el shard por defecto, `data_dir()`, con el layout de siempre.
+    Cada atleta vive en `data_dir()/atletas/<atleta>` salvo que el mapa de shards
+    (`shards.json` o PI_SHARD_MAP) lo ubique en otro lado: para mover un atleta a
+    otro disco basta con mover su directorio y agregar la entrada al mapa.
+    """
+    if atleta is None:
+        return data_dir()
+    if not re.fullmatch(ATLETA_PATTERN, atleta):
+        raise ValueError("atleta inválido (letras, números, '_' o '-', hasta 64)")
+    mapped = _shard_map().get(atleta)
+    return Path(mapped).expanduser().resolve() if mapped else data_dir() / "atletas" / atleta
+
+
+def sqlite_path(atleta: Optional[str] = None) -> Path:
+    return shard_dir(atleta) / "progreso.sqlite3"
+
+
+class SessionRepository(Protocol):
+    """Historial de series. Las filas siguen CSV_HEADERS (peso y fecha ya como texto)."""
+
+    def write_batch(self, filas: List[List[object]]) -> None: ...
+
+    def iter_rows(self) -> Iterator[Dict[str, str]]: ...
+
+    def serie(self, ejercicio: str) -> Tuple[List[int], List[float], List[int]]: ...
+
+    def promedio_reps_desde(self, ejercicio: str, desde: date) -> Optional[float]: ...
+
+
+class MealRepository(Protocol):
+    """Registro de comidas. Las filas siguen MEALS_HEADERS."""
+
+    def write_batch(self, rows: List[Sequence[object]]) -> None: ...
+
+    def append(self, rows: Sequence[Sequence[object]]) -> None: ...
+
+    def append_new(self, rows: Sequence[Sequence[object]]) -> int: ...
+
+    def read_day(self, fecha: str) -> List[Dict[str, str]]: ...
+
+    def iter_all(self) -> Iterator[Dict[str, str]]: ...
+
+    def remove(self, meal_id: str) -> bool: ...
+
+    def fecha_of(self, meal_id: str) -> Optional[str]: ...
+
+    def daily_totals(self, desde: date, hasta: date) -> List[Tuple[str, List[float]]]: ...
+
+
+# =====================
+# Backend SQLite
+# =====================
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sesiones (
+    ejercicio TEXT NOT NULL,
+    peso_actual REAL,
+    reps INTEGER NOT NULL,
+    fecha TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sesiones_ejercicio_fecha ON sesiones (ejercicio, fecha);
+CREATE TABLE IF NOT EXISTS comidas (
+    id TEXT PRIMARY KEY,
+    fecha TEXT NOT NULL,
+    alimento TEXT NOT NULL,
+    cantidad_g REAL,
+    kcal REAL,
+    prot REAL,
+    carb REAL,
+    grasa REAL
+);
+CREATE INDEX IF NOT EXISTS comidas_fecha ON comidas (fecha);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class SQLiteDatabase:
+    """Una base SQLite en modo WAL con una conexión por hilo.
+
+    En WAL los lectores no bloquean al writer ni viceversa; entre procesos las
+    escrituras se serializan con el lock de SQLite (busy_timeout en lugar de error).
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._local = threading.local()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn().executescript(_SCHEMA)
+
+    def open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: fsync del WAL en cada commit; NORMAL si se desactivó fsync
+        conn.execute(f"PRAGMA synchronous={'FULL' if fsync_enabled() else 'NORMAL'}")
+        return conn
+
+    def conn(self) -> sqlite3.Connection:
+        """Conexión del hilo actual (consultas cortas)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self.open()
+        return conn
+
+    def transaction(self) -> "_Transaction":
+        return _Transaction(self.conn())
+
+    def iter_query(self, sql: str, params: Sequence[object] = ()) -> Iterator[tuple]:
+        """Recorre una consulta larga con su propia conexión.
+
+        Los exports se consumen desde el threadpool y cada paso puede correr en otro
+        hilo, así que no pueden usar la conexión por hilo.
+        """
+        conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+        try:
+            yield from conn.execute(sql, params)
+        finally:
+            conn.close()
+
+    def import_once(self, key: str, load: Callable[[], None]) -> None:
+        """Corre `load` una sola vez por base (p. ej. importar los CSV existentes)."""
+        with self.transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                return
+            load()
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, '1')", (key,))
+
+
+class _Transaction:
+    """`with db.transaction() as conn:` abre BEGIN IMMEDIATE y hace commit/rollback al salir."""
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self._conn = conn
+        self._depth = 0
+
+    def __enter__(self) -> sqlite3.Connection:
+        if not self._conn.in_transaction:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._depth = 1
+        return self._conn
+
+    def __exit__(self, exc_type: object, *exc: object) -> None:
+        if not self._depth:
+            return
+        self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class SQLiteSessions:
+    def __init__(self, db: SQLiteDatabase) -> None:
+        self.db = db
+
+    def write_batch(self, filas: List[List[object]]) -> None:
+        # Un lote = una transacción = un fsync del WAL
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO sesiones (ejercicio, peso_actual, reps, fecha) VALUES (?, ?, ?, ?)",
+                ((f[0], _num(f[1]), int(f[2]), str(f[3])) for f in filas),  # type: ignore[arg-type]
+            )
+
+    def iter_rows(self) -> Iterator[Dict[str, str]]:
+        for row in self.db.iter_query("SELECT ejercicio, peso_actual, reps, fecha FROM sesiones ORDER BY rowid"):
+            yield dict(zip(_SESSION_COLS, (_text(v) for v in row)))
+
+    def serie(self, ejercicio: str) -> Tuple[List[int], List[float], List[int]]:
+        # El índice (ejercicio, fecha) entrega las filas ya ordenadas; julianday -> ordinal de Python
+        cur = self.db.conn().execute(
+            "SELECT CAST(julianday(fecha) - 1721424.5 AS INTEGER), peso_actual, reps FROM sesiones"
+            " WHERE ejercicio = ? ORDER BY fecha",
+            (ejercicio,),
+        )
+        fechas: List[int] = []
+        pesos: List[float] = []
+        reps: List[int] = []
+        for f, p, r in cur:
+            fechas.append(f)
+            pesos.append(float("nan") if p is None else p)
+            reps.append(r)
+        return fechas, pesos, reps
+
+    def promedio_reps_desde(self, ejercicio: str, desde: date) -> Optional[float]:
+        # Usa el índice (ejercicio, fecha): sólo recorre la ventana pedida
+        total, count = self.db.conn().execute(
+            "SELECT SUM(reps), COUNT(*) FROM sesiones WHERE ejercicio = ? AND fecha >= ?",
+            (ejercicio, desde.isoformat()),
+        ).fetchone()
+        if not count:
+            return None
+        return round(total / count, 2)
+
+
+class SQLiteMeals:
+    def __init__(self, db: SQLiteDatabase) -> None:
+        self.db = db
+
+    def write_batch(self, rows: List[Sequence[object]]) -> None:
+        self.append(rows)
+
+    def append(self, rows: Sequence[Sequence[object]]) -> None:
+        if not rows:
+            return
+        with self.db.transaction() as conn:
+            conn.executemany(_INSERT_MEAL, (_meal_params(r) for r in rows))
+
+    def append_new(self, rows: Sequence[Sequence[object]]) -> int:
+        if not rows:
+            return 0
+        with self.db.transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(_INSERT_MEAL.replace("INSERT", "INSERT OR IGNORE", 1), (_meal_params(r) for r in rows))
+            return conn.total_changes - before
+
+    def read_day(self, fecha: str) -> List[Dict[str, str]]:
+        cur = self.db.conn().execute(f"{_SELECT_MEALS} WHERE fecha = ? ORDER BY rowid", (fecha,))
+        return [dict(zip(_MEAL_COLS, (_text(v) for v in row))) for row in cur]
+
+    def iter_all(self) -> Iterator[Dict[str, str]]:
+        for row in self.db.iter_query(f"{_SELECT_MEALS} ORDER BY fecha, rowid"):
+            yield dict(zip(_MEAL_COLS, (_text(v) for v in row)))
+
+    def remove(self, meal_id: str) -> bool:
+        with self.db.transaction() as conn:
+            return conn.execute("DELETE FROM comidas WHERE id = ?", (meal_id,)).rowcount > 0
+
+    def fecha_of(self, meal_id: str) -> Optional[str]:
+        row = self.db.conn().execute("SELECT fecha FROM comidas WHERE id = ?", (meal_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def daily_totals(self, desde: date, hasta: date) -> List[Tuple[str, List[float]]]:
+        cur = self.db.conn().execute(
+            "SELECT fecha, SUM(kcal), SUM(prot), SUM(carb), SUM(grasa), COUNT(*) FROM comidas"
+            " WHERE fecha BETWEEN ? AND ? GROUP BY fecha",
+            (desde.isoformat(), hasta.isoformat()),
+        )
+        found = {r[0]: [r[1] or 0.0, r[2] or 0.0, r[3] or 0.0, r[4] or 0.0, r[5]] for r in cur}
+        out: List[Tuple[str, List[float]]] = []
+        for ordinal in range(desde.toordinal(), hasta.toordinal() + 1):
+            fecha = date.fromordinal(ordinal).isoformat()
+            out.append((fecha, found.get(fecha, [0.0, 0.0, 0.0, 0.0, 0])))
+        return out
+
+
+_INSERT_MEAL = f"INSERT INTO comidas ({', '.join(_MEAL_COLS)}) VALUES ({', '.join('?' * len(_MEAL_COLS))})"
+_SELECT_MEALS = f"SELECT {', '.join(_MEAL_COLS)} FROM comidas"
+
+
+def _num(value: object) -> Optional[float]:
+    try:
+        return float(value)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value: object) -> str:
+    return "" if value is None else str(value)
+
+
+def _meal_params(row: Sequence[object]) -> Tuple[object, ...]:
+    return (str(row[0]), str(row[1]), str(row[2]), *(_num(v) for v in row[3:8]))
+
+
+_dbs: Dict[Path, SQLiteDatabase] = {}
+_dbs_lock = threading.Lock()
+
+
+def sqlite_database(path: Path) -> SQLiteDatabase:
+    path = path.resolve()
+    with _dbs_lock:
+        db = _dbs.get(path)
+        if db is None:
+            db = _dbs[path] = SQLiteDatabase(path)
+        return db
+
+
+def import_rows(db: SQLiteDatabase, key: str, target: "SQLiteSessions | SQLiteMeals", rows: Iterable[Sequence[object]], batch: int = 10_000) -> None:
+    """Importa una sola vez filas existentes (p. ej. desde los CSV) al pasar a SQLite."""
+
+    def load() -> None:
+        chunk: List[Sequence[object]] = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= batch:
+                target.write_batch(chunk)  # type: ignore[arg-type]
+                chunk = []
+        target.write_batch(chunk)  # type: ignore[arg-type]
+
+    db.import_once(key, load)
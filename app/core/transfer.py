@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import codecs
+import csv
+import io
+import json
+import math
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from app.core.meal_store import MEALS_HEADERS
+from app.core.progression import CSV_HEADERS
+
+FORMATS = ("ndjson", "csv")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+HEADERS = {"sessions": CSV_HEADERS, "meals": MEALS_HEADERS}
+
+# Tamaño aproximado de cada trozo emitido al exportar
+CHUNK_BYTES = 64 * 1024
+
+# Columnas numéricas: los CSV las guardan como texto, en NDJSON van como números
+NUMERIC: Dict[str, Callable] = {
+    "peso_actual": float, "reps": int,
+    "cantidad_g": float, "kcal": float, "prot": float, "carb": float, "grasa": float,
+}
+
+
+def _typed(value: object, cast: Callable) -> object:
+    """'20.0' -> 20.0, '10' -> 10; lo que no es un número finito queda como vino."""
+    if not isinstance(value, str):
+        return value
+    try:
+        num = float(value)
+    except ValueError:
+        return value
+    if not math.isfinite(num):
+        return value
+    if cast is int:
+        return int(num) if num.is_integer() else value
+    return num
+
+
+def typed_record(record: Dict[str, object]) -> Dict[str, object]:
+    return {k: _typed(v, NUMERIC[k]) if k in NUMERIC else v for k, v in record.items()}
+
+
+def export_chunks(rows: Iterable[Dict[str, str]], headers: List[str], fmt: str) -> Iterator[str]:
+    """Serializa filas a NDJSON o CSV en trozos de ~CHUNK_BYTES (memoria constante)."""
+    buf = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buf)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow([row.get(h, "") for h in headers])
+            if buf.tell() >= CHUNK_BYTES:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+    else:
+        for row in rows:
+            buf.write(json.dumps(typed_record({h: row.get(h, "") for h in headers}), ensure_ascii=False))
+            buf.write("\n")
+            if buf.tell() >= CHUNK_BYTES:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+class RecordDecoder:
+    """Decodifica un upload NDJSON o CSV que llega en trozos arbitrarios de bytes.
+
+    `feed()` devuelve los registros completos disponibles como (número de línea,
+    dict o None si la línea es ilegible). En CSV la primera línea es el encabezado;
+    no se admiten saltos de línea dentro de campos entrecomillados. Las columnas
+    numéricas se aceptan como número o como texto (exports anteriores) y salen tipadas.
+    """
+
+    def __init__(self, fmt: str) -> None:
+        self.fmt = fmt
+        self.line_no = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""
+        self._header: Optional[List[str]] = None
+
+    def feed(self, chunk: bytes, final: bool = False) -> List[tuple]:
+        text = self._pending + self._decoder.decode(chunk, final)
+        lines = text.split("\n")
+        self._pending = "" if final else lines.pop()
+        out: List[tuple] = []
+        for line in lines:
+            self.line_no += 1
+            line = line.rstrip("\r")
+            if not line.strip():
+                continue
+            record = self._parse(line)
+            if record is not _HEADER:
+                out.append((self.line_no, record))
+        return out
+
+    def _parse(self, line: str) -> object:
+        if self.fmt == "ndjson":
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                return None
+            return typed_record(obj) if isinstance(obj, dict) else None
+        values = next(csv.reader([line]))
+        if self._header is None:
+            self._header = values
+            return _HEADER
+        if len(values) != len(self._header):
+            return None
+        return typed_record(dict(zip(self._header, values)))
+
+
+_HEADER = object()
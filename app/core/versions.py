@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+from app.core.meal_store import AppendLog
+
+VERSIONS_HEADERS = ["clave", "version"]
+# Fila con la época del log (ver DataVersions)
+_EPOCH = "_epoch"
+# Filas reemplazadas (versiones viejas) a partir de las cuales se compacta el log
+COMPACT_SLACK = 4096
+
+
+class DataVersions:
+    """Versiones monótonas por clave (el catálogo, cada día), compartidas entre procesos.
+
+    Se guardan en un log append-only: subir una versión agrega una fila, y cada
+    proceso lee sólo la cola nueva, así que consultar la versión vigente cuesta un
+    stat. La primera fila es una época aleatoria: si el log se borra, las versiones
+    vuelven a empezar desde cero pero con otra época, y ninguna ETag vieja coincide.
+    """
+
+    def __init__(self, path: Path, *, durable: bool = True) -> None:
+        self.versions: Dict[str, int] = {}
+        self.epoch = ""
+        self._stale = 0
+        self.log = AppendLog(
+            path, VERSIONS_HEADERS,
+            on_row=self._apply, on_reset=self._reset, build=self._new_epoch, durable=durable,
+        )
+
+    def _apply(self, row: List[str]) -> None:
+        if len(row) < 2:
+            return
+        if row[0] == _EPOCH:
+            self.epoch = row[1]
+            return
+        try:
+            version = int(row[1])
+        except ValueError:
+            return
+        if row[0] in self.versions:
+            self._stale += 1
+        self.versions[row[0]] = max(version, self.versions.get(row[0], 0))
+
+    def _reset(self) -> None:
+        self.versions.clear()
+        self.epoch = ""
+        self._stale = 0
+
+    def _new_epoch(self) -> Iterator[Sequence[object]]:
+        yield _EPOCH, uuid.uuid4().hex[:8]
+
+    def get(self, clave: str) -> int:
+        self.log.sync()
+        with self.log.lock:
+            return self.versions.get(clave, 0)
+
+    def tag(self, clave: str) -> str:
+        """Época + versión vigente de `clave`, para usar en una ETag."""
+        self.log.sync()
+        with self.log.lock:
+            return f"{self.epoch}.{self.versions.get(clave, 0)}"
+
+    def bump(self, claves: Iterable[str]) -> None:
+        """Sube en uno la versión de cada clave (se llama después de escribir los datos)."""
+        claves = sorted(set(claves))
+        if not claves:
+            return
+        with self.log.guard:
+            # Con el lock tomado y el log al día, nadie más puede haber subido estas claves
+            self.log.sync()
+            self.log.append([(c, self.versions.get(c, 0) + 1) for c in claves])
+        if self._stale >= COMPACT_SLACK:
+            self.log.compact(_latest, after=self._compacted)
+
+    def _compacted(self) -> None:
+        self._stale = 0
+
+
+def _latest(rows: Iterator[List[str]]) -> Iterable[Sequence[object]]:
+    # La época queda primera: es la primera clave que se inserta
+    latest: Dict[str, str] = {}
+    for row in rows:
+        if len(row) >= 2:
+            latest[row[0]] = row[1]
+    return latest.items()
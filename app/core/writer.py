@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Protocol, Tuple, TypeVar
+
+from app.core import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: sólo exclusión dentro del proceso
+    fcntl = None  # type: ignore[assignment]
+
+T = TypeVar("T")
+
+# Operaciones que el writer toma de la cola por cada commit grupal
+MAX_GROUP = 512
+
+
+def fsync_enabled() -> bool:
+    # PI_FSYNC=0 desactiva fsync (desarrollo/benchmarks); por defecto las escrituras son durables
+    return os.environ.get("PI_FSYNC", "1") != "0"
+
+
+class ProcessLock:
+    """Lock reentrante entre hilos y entre procesos (flock sobre un archivo `.lock`).
+
+    Protege cada almacenamiento cuando uvicorn corre con `--workers N`: los appends
+    y las reescrituras completas de distintos procesos no se intercalan.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    def __enter__(self) -> "ProcessLock":
+        self._rlock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except BaseException:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._rlock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._rlock.release()
+
+
+_locks: Dict[Path, ProcessLock] = {}
+_locks_guard = threading.Lock()
+
+
+def process_lock(path: Path) -> ProcessLock:
+    """Un único ProcessLock por archivo de lock dentro del proceso."""
+    path = path.resolve()
+    with _locks_guard:
+        lock = _locks.get(path)
+        if lock is None:
+            lock = _locks[path] = ProcessLock(path)
+        return lock
+
+
+class AppendSink(Protocol):
+    """Destino de appends con commit grupal: escribe y hace fsync de todas las filas juntas."""
+
+    def write_batch(self, rows: List[Any]) -> None:
+        ...
+
+
+@dataclass
+class _Op:
+    future: asyncio.Future
+    sink: Optional[AppendSink] = None
+    rows: List[Any] = field(default_factory=list)
+    fn: Optional[Callable[[], Any]] = None
+
+
+class WriterStopped(RuntimeError):
+    """El writer murió por un error inesperado (en `__cause__`): la escritura no se confirmó."""
+
+
+def _stopped(cause: BaseException) -> WriterStopped:
+    err = WriterStopped(f"el writer se detuvo por un error: {cause!r}")
+    err.__cause__ = cause
+    return err
+
+
+class GroupCommitWriter:
+    """Único writer del proceso: una cola asyncio alimenta una tarea que escribe por lotes.
+
+    Los appends pendientes hacia un mismo destino se escriben con un solo write + fsync
+    (group commit); las operaciones exclusivas (borrados, reescrituras) se ejecutan en
+    orden entre medio. El trabajo de disco corre en un hilo, así el event loop sigue
+    atendiendo requests mientras tanto. Cada handler espera su future: cuando se
+    resuelve, sus datos ya están en disco.
+
+    Si la tarea muere por un error inesperado, los futures del grupo en curso y los
+    de la cola fallan con WriterStopped (nadie queda esperando), igual que los
+    envíos siguientes, que fallan enseguida en lugar de encolarse.
+    """
+
+    def __init__(self) -> None:
+        self._queue: Optional[asyncio.Queue[_Op]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.failure: Optional[BaseException] = None
+        self.commits = 0
+        self.ops = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self.failure = None
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._loop(), name="group-commit-writer")
+
+    async def stop(self) -> None:
+        if self._task is None or self._queue is None:
+            return
+        # Drena lo pendiente antes de cerrar (si el writer murió, la cola ya se vació)
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            pass  # ya registrado en `failure` y entregado a cada future
+        self._task = None
+
+    async def append(self, sink: AppendSink, rows: List[Any]) -> None:
+        await self._submit(_Op(asyncio.get_running_loop().create_future(), sink=sink, rows=list(rows)))
+
+    async def run(self, fn: Callable[[], T]) -> T:
+        return await self._submit(_Op(asyncio.get_running_loop().create_future(), fn=fn))
+
+    async def _submit(self, op: _Op) -> Any:
+        if self.failure is not None:
+            raise _stopped(self.failure)
+        assert self._queue is not None
+        # Sin await entre el chequeo y el encolado: la tarea no puede morir en el medio
+        self._queue.put_nowait(op)
+        return await op.future
+
+    async def _loop(self) -> None:
+        assert self._queue is not None
+        group: List[_Op] = []
+        try:
+            while True:
+                group = [await self._queue.get()]
+                while len(group) < MAX_GROUP and not self._queue.empty():
+                    group.append(self._queue.get_nowait())
+                try:
+                    results = await asyncio.to_thread(_commit_group, group)
+                    for op, (ok, value) in zip(group, results):
+                        if op.future.done():
+                            continue
+                        if ok:
+                            op.future.set_result(value)
+                        else:
+                            op.future.set_exception(value)
+                finally:
+                    self.commits += 1
+                    self.ops += len(group)
+                    for _ in group:
+                        self._queue.task_done()
+                group = []
+        except asyncio.CancelledError:
+            raise
+        except BaseException as exc:
+            self.failure = exc
+            self._fail_pending(group, exc)
+            raise
+
+    def _fail_pending(self, group: List[_Op], exc: BaseException) -> None:
+        assert self._queue is not None
+        pending = list(group)
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+            self._queue.task_done()
+        for op in pending:
+            if not op.future.done():
+                op.future.set_exception(_stopped(exc))
+
+
+def _commit_group(group: List[_Op]) -> List[Tuple[bool, Any]]:
+    """Escribe un grupo respetando el orden: appends consecutivos por destino se juntan."""
+    results: List[Tuple[bool, Any]] = [(True, None)] * len(group)
+    pending: Dict[int, Tuple[AppendSink, List[int], List[Any]]] = {}
+
+    def flush() -> None:
+        for sink, idxs, rows in pending.values():
+            try:
+                sink.write_batch(rows)
+            except Exception as exc:
+                for i in idxs:
+                    results[i] = (False, exc)
+        pending.clear()
+
+    for i, op in enumerate(group):
+        if op.sink is not None:
+            entry = pending.setdefault(id(op.sink), (op.sink, [], []))
+            entry[1].append(i)
+            entry[2].extend(op.rows)
+            continue
+        flush()
+        try:
+            results[i] = (True, op.fn() if op.fn else None)
+        except Exception as exc:
+            results[i] = (False, exc)
+    flush()
+    return results
+
+
+_writer = GroupCommitWriter()
+
+
+def start_writer() -> GroupCommitWriter:
+    _writer.start()
+    return _writer
+
+
+async def stop_writer() -> None:
+    await _writer.stop()
+
+
+def writer_stats() -> Dict[str, int]:
+    return {"commits": _writer.commits, "ops": _writer.ops}
+
+
+@metrics.REGISTRY.collector
+def _writer_metrics() -> Iterator[metrics.Family]:
+    yield metrics.Family("pi_writer_commits_total", "counter", "Grupos confirmados por el writer", [
+        metrics.Sample("", {}, _writer.commits),
+    ])
+    yield metrics.Family("pi_writer_ops_total", "counter", "Escrituras confirmadas por el writer", [
+        metrics.Sample("", {}, _writer.ops),
+    ])
+    yield metrics.Family("pi_writer_queue_depth", "gauge", "Escrituras esperando al writer", [
+        metrics.Sample("", {}, _writer._queue.qsize() if _writer._queue is not None else 0),
+    ])
+
+
+async def submit_append(sink: AppendSink, rows: List[Any]) -> None:
+    """Append durable vía el writer; si no está corriendo (CLI, scripts), escribe en un hilo."""
+    if _writer.running or _writer.failure is not None:
+        await _writer.append(sink, rows)
+    else:
+        await asyncio.to_thread(sink.write_batch, list(rows))
+
+
+async def submit_exclusive(fn: Callable[[], T]) -> T:
+    if _writer.running or _writer.failure is not None:
+        return await _writer.run(fn)
+    return await asyncio.to_thread(fn)
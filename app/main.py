@@ -1,40 +1,136 @@
 from __future__ import annotations
 
+import time
+
+# Inicio de los imports de la app, para el reporte de arranque
+_IMPORTS_STARTED = time.perf_counter()
+
+import asyncio
 import os
 import sys
+from contextlib import asynccontextmanager
+from functools import partial
 from datetime import date
-from fastapi import FastAPI
+from typing import Any
+from fastapi import Body, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 
 # Permite ejecutar como script: python app/main.py
 if __package__ is None or __package__ == "":
     sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from app.api.models import SessionInput, SessionOutput
+from pydantic import ValidationError
+
+from app.api.models import (
+    SessionInput,
+    SessionOutput,
+    SessionBatchOutput,
+    SessionRecord,
+    ProgressOutput,
+    RecommendBatchInput,
+    RecommendBatchOutput,
+    SimulationInput,
+    SimulationOutput,
+)
+from app.core import analytics, fastjson, metrics, profiler, startup
+from app.core.assets import assets, load_assets, negotiate
+from app.core.metrics import MetricsMiddleware
 from app.core.progression import (
     recomendar_proximo_peso,
-    registrar,
+    registrar_async,
+    registrar_lote,
+    registrar_lote_async,
     promedio_reps_semana,
+    prepare_historial,
+    warm_historial,
+    serie_ejercicio,
+    iter_historial,
 )
 from app.api.nutrition_models import (
     FoodItem,
     MealInput,
     MealEntry,
+    MealBatchOutput,
     DaySummary,
+    RangeSummary,
     ProductInfo,
 )
+from app.core.transfer import FORMATS, HEADERS, MEDIA_TYPES, RecordDecoder, export_chunks
 from app.core.nutrition import (
-    search_foods,
-    add_meal,
-    day_summary,
-    remove_meal,
+    prepare_foods_catalog,
+    prepare_meals_storage,
+    load_foods,
+    warm_caches,
+    search_foods_json,
+    catalog_version,
+    add_meal_async,
+    add_meals_async,
+    day_summary_json,
+    day_etag,
+    range_summary,
+    remove_meal_async,
+    iter_meals,
+    import_meals,
     off_lookup_barcode,
     off_search,
+    off_cache_stats,
+    close_off_client,
 )
+from app.core.storage import ATLETA_PATTERN
+from app.core.writer import start_writer, stop_writer, submit_exclusive
+
+startup.report.record("imports", time.perf_counter() - _IMPORTS_STARTED)
+
+_STARTUP_PHASES = ("imports", "foods_catalog", "meals_storage", "historial", "assets")
+
+
+def _import_numpy() -> None:
+    # numpy (/progress, /recommend/batch, /simulate) se importa en el primer uso
+    import app.core.planning  # noqa: F401
+
+
+def _import_httpx() -> None:
+    import httpx  # noqa: F401
 
-app = FastAPI(title="Progressive Overload Helper API", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    report = startup.report
+    # Seed/migraciones una sola vez, antes de aceptar requests
+    with report.phase("foods_catalog"):
+        prepare_foods_catalog()
+        load_foods()
+    with report.phase("meals_storage"):
+        prepare_meals_storage()
+    with report.phase("historial"):
+        prepare_historial()
+    # Frontend leído y comprimido una sola vez
+    with report.phase("assets"):
+        load_assets()
+    # Writer único con commit grupal para todas las escrituras del proceso
+    start_writer()
+    startup.logger.info("Arranque: %s", report.summary(_STARTUP_PHASES))
+    # Lo que sólo acelera el primer uso se hace ya sirviendo requests
+    warmup = asyncio.create_task(startup.warm_up([
+        ("historial", warm_historial),
+        ("caches", warm_caches),
+        ("numpy", _import_numpy),
+        ("httpx", _import_httpx),
+        ("brotli", lambda: assets().add_brotli()),
+    ]))
+    try:
+        yield
+    finally:
+        warmup.cancel()
+        await stop_writer()
+        await close_off_client()
+
+
+# Parámetro opcional de los endpoints de lectura: qué shard de atleta consultar
+_ATLETA = Query(default=None, pattern=ATLETA_PATTERN)
+
+app = FastAPI(title="Progressive Overload Helper API", version="0.1.0", lifespan=lifespan)
 
 # CORS liberal para pruebas locales y despliegues simples
 app.add_middleware(
@@ -44,9 +140,12 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Último en agregarse = más externo: mide también lo que hace CORS
+app.add_middleware(MetricsMiddleware)
+# Profiler por muestreo sólo si se pidió (PI_PROFILE_RATE / PI_PROFILE_TOKEN): si no, ni se instala
+if profiler.enabled():
+    app.add_middleware(profiler.ProfilerMiddleware)
 
-# Servir frontend estático simple
-app.mount("/static", StaticFiles(directory="app/frontend"), name="static")
 
 
 @app.get("/health")
@@ -54,11 +153,22 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    # Formato de texto de Prometheus; cada worker expone sus propias métricas
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/cache-stats")
+async def cache_stats():
+    return {"off": off_cache_stats()}
+
+
 @app.post("/session", response_model=SessionOutput)
 async def post_session(data: SessionInput):
     proximo = recomendar_proximo_peso(data.peso_actual, data.reps, data.rpe)
-    registrar(data.ejercicio, data.peso_actual, data.reps, date.today())
-    promedio = promedio_reps_semana(data.ejercicio)
+    await registrar_async(data.ejercicio, data.peso_actual, data.reps, date.today(), atleta=data.atleta)
+    promedio = promedio_reps_semana(data.ejercicio, atleta=data.atleta)
     return SessionOutput(
         ejercicio=data.ejercicio,
         peso_actual=data.peso_actual,
@@ -69,21 +179,137 @@ async def post_session(data: SessionInput):
     )
 
 
-@app.get("/", response_class=HTMLResponse)
-async def index():
-    # Redirigir a frontend estático minimalista
-    with open("app/frontend/index.html", "r", encoding="utf-8") as f:
-        return HTMLResponse(content=f.read(), status_code=200)
+MAX_BATCH_ITEMS = 1000
+
+
+def _validation_error(exc: ValidationError) -> str:
+    err = exc.errors()[0]
+    loc = ".".join(str(p) for p in err.get("loc", ()))
+    return f"{loc}: {err.get('msg')}" if loc else str(err.get("msg"))
+
+
+@app.post("/sessions/batch", response_model=SessionBatchOutput)
+async def post_sessions_batch(items: list[dict[str, Any]] = Body(max_length=MAX_BATCH_ITEMS)):
+    # Validación por ítem: un ítem inválido no rechaza el lote entero
+    hoy = date.today()
+    validas: list[tuple[int, SessionInput]] = []
+    resultados: list[dict[str, Any]] = [{"ok": False} for _ in items]
+    for i, raw in enumerate(items):
+        try:
+            validas.append((i, SessionInput.model_validate(raw)))
+        except ValidationError as ve:
+            resultados[i]["error"] = _validation_error(ve)
+    # Un append por shard de atleta presente en el lote
+    for atleta in {d.atleta for _, d in validas}:
+        await registrar_lote_async(
+            ((d.ejercicio, d.peso_actual, d.reps, hoy) for _, d in validas if d.atleta == atleta), atleta=atleta
+        )
+    # Un promedio por (atleta, ejercicio), calculado después de escribir todo el lote
+    promedios = {
+        (atleta, ej): promedio_reps_semana(ej, atleta=atleta)
+        for atleta, ej in {(d.atleta, d.ejercicio) for _, d in validas}
+    }
+    for i, d in validas:
+        resultados[i] = {"ok": True, "item": SessionOutput(
+            ejercicio=d.ejercicio,
+            peso_actual=d.peso_actual,
+            reps=d.reps,
+            rpe=d.rpe,
+            proximo_peso=recomendar_proximo_peso(d.peso_actual, d.reps, d.rpe),
+            promedio_reps_semana=promedios[(d.atleta, d.ejercicio)],
+        )}
+    return {"ok": len(validas) == len(items), "registradas": len(validas), "resultados": resultados}
+
+
+@app.get("/progress/{ejercicio}", response_model=ProgressOutput)
+async def get_progress(
+    ejercicio: str,
+    atleta: str | None = _ATLETA,
+    puntos: int = Query(default=analytics.DEFAULT_POINTS, ge=3, le=5000),
+    ventana: int = Query(default=analytics.DEFAULT_WINDOW, ge=1, le=365),
+    desde: date | None = None,
+    hasta: date | None = None,
+):
+    """e1RM, tonelaje, media móvil y tendencia del ejercicio, con la curva reducida a `puntos`."""
+    fechas, pesos, reps = serie_ejercicio(ejercicio, atleta=atleta)
+    resumen = analytics.progress(fechas, pesos, reps, points=puntos, window=ventana, desde=desde, hasta=hasta)
+    return {"ejercicio": ejercicio, **resumen}
+
+
+# Máximo de valores (escenarios × semanas) devueltos con trayectorias=true
+MAX_TRAJECTORY_VALUES = 200_000
+
+
+@app.post("/recommend/batch", response_model=RecommendBatchOutput)
+async def post_recommend_batch(data: RecommendBatchInput):
+    """Mismas reglas que /session aplicadas a columnas enteras en una pasada vectorizada."""
+    if not len(data.peso_actual) == len(data.reps) == len(data.rpe):
+        raise HTTPException(status_code=400, detail="peso_actual, reps y rpe deben tener el mismo largo")
+    from app.core import planning
+
+    try:
+        proximo = planning.recomendar_lote(data.peso_actual, data.reps, data.rpe)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    return {"proximo_peso": proximo.tolist()}
+
+
+@app.post("/simulate", response_model=SimulationOutput)
+async def post_simulate(data: SimulationInput):
+    if data.trayectorias and len(data.peso_inicial) * (data.semanas + 1) > MAX_TRAJECTORY_VALUES:
+        raise HTTPException(status_code=400, detail="trayectorias demasiado grandes: pedí menos escenarios o semanas")
+    from app.core import planning
+
+    try:
+        matriz = planning.simular(data.peso_inicial, data.reps, data.rpe, data.semanas)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    return {
+        "escenarios": matriz.shape[0],
+        "semanas": data.semanas,
+        "peso_final": matriz[:, -1].tolist(),
+        "trayectorias": matriz.tolist() if data.trayectorias else None,
+    }
+
+
+# Frontend estático: en memoria, precomprimido y con ETag (ver app.core.assets)
+def _asset_response(request: Request, rel: str) -> Response:
+    asset = assets().get(rel)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Con la huella actual en la URL el contenido no cambia nunca: caché inmutable
+    immutable = request.query_params.get("v") == asset.version
+    status, body, headers = negotiate(asset, request.headers, immutable=immutable)
+    return Response(content=body, status_code=status, headers=headers)
+
+
+@app.api_route("/", methods=["GET", "HEAD"], response_class=HTMLResponse)
+async def index(request: Request):
+    return _asset_response(request, "index.html")
+
+
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def static_file(request: Request, path: str):
+    return _asset_response(request, path)
 
 
 # =====================
 # Nutrición (Comidas + Macros)
 # =====================
 @app.get("/foods", response_model=list[FoodItem])
-async def get_foods(query: str | None = None):
-    items = search_foods(query)
-    # Convert dicts to Pydantic models
-    return [FoodItem(**it) for it in items]
+async def get_foods(request: Request, query: str | None = None, limit: int = 20, cursor: str | None = None):
+    version = catalog_version()
+    if fastjson.not_modified(version, request.headers):
+        return Response(status_code=304, headers=fastjson.validators(version))
+    try:
+        payload, next_cursor = search_foods_json(query, limit=min(max(limit, 1), 200), cursor=cursor)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    body, headers = fastjson.encode(payload, request.headers, version=version)
+    # Paginación por cursor en cabecera para no cambiar el esquema de la respuesta
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=body, headers=headers)
 
 
 # Eliminado: persistencia de alimentos personalizados
@@ -99,7 +325,7 @@ async def post_meal(data: MealInput):
         except Exception:
             return {"ok": False, "error": "fecha inválida (use YYYY-MM-DD)"}
     try:
-        entry = add_meal(
+        entry = await add_meal_async(
             data.alimento, 
             float(data.cantidad_g), 
             fecha_obj,
@@ -107,7 +333,8 @@ async def post_meal(data: MealInput):
             kcal_100=data.kcal_100,
             prot_100=data.prot_100,
             carb_100=data.carb_100,
-            grasa_100=data.grasa_100
+            grasa_100=data.grasa_100,
+            atleta=data.atleta,
         )
     except ValueError as ve:
         return {"ok": False, "error": str(ve)}
@@ -116,26 +343,69 @@ async def post_meal(data: MealInput):
     return {"ok": True, "entry": MealEntry(**entry)}
 
 
+@app.post("/meals/batch", response_model=MealBatchOutput)
+async def post_meals_batch(items: list[dict[str, Any]] = Body(max_length=MAX_BATCH_ITEMS)):
+    resultados: list[dict[str, Any]] = [{"ok": False} for _ in items]
+    pendientes: list[int] = []
+    kwargs: list[dict[str, Any]] = []
+    for i, raw in enumerate(items):
+        try:
+            data = MealInput.model_validate(raw)
+            fecha_obj = date.fromisoformat(data.fecha) if data.fecha else None
+        except ValidationError as ve:
+            resultados[i]["error"] = _validation_error(ve)
+            continue
+        except ValueError:
+            resultados[i]["error"] = "fecha inválida (use YYYY-MM-DD)"
+            continue
+        pendientes.append(i)
+        kwargs.append({
+            "alimento": data.alimento,
+            "cantidad_g": float(data.cantidad_g),
+            "fecha": fecha_obj,
+            "kcal_100": data.kcal_100,
+            "prot_100": data.prot_100,
+            "carb_100": data.carb_100,
+            "grasa_100": data.grasa_100,
+            "atleta": data.atleta,
+        })
+    for i, res in zip(pendientes, await add_meals_async(kwargs)):
+        resultados[i] = res
+    registradas = sum(1 for r in resultados if r["ok"])
+    return {"ok": registradas == len(items), "registradas": registradas, "resultados": resultados}
+
+
 @app.get("/day-summary", response_model=DaySummary)
-async def get_day_summary(fecha: str | None = None):
-    fecha_obj = None
+async def get_day_summary(request: Request, fecha: str | None = None, atleta: str | None = _ATLETA):
+    # Sin fecha, o si es inválida, se usa hoy
+    fecha_obj = date.today()
     if fecha:
         try:
             fecha_obj = date.fromisoformat(fecha)
         except Exception:
-            # Si fecha inválida, usar hoy
-            fecha_obj = date.today()
-    summary = day_summary(fecha_obj)
-    # Convert dict to Pydantic model with nested items
-    meals = [MealEntry(**m) for m in summary.get("comidas", [])]
-    return DaySummary(
-        fecha=summary["fecha"],
-        kcal=summary["kcal"],
-        prot=summary["prot"],
-        carb=summary["carb"],
-        grasa=summary["grasa"],
-        comidas=meals,
-    )
+            pass
+    version = day_etag(fecha_obj, atleta=atleta)
+    # Sin cambios en el día desde la última vez: 304 sin leer las comidas
+    if fastjson.not_modified(version, request.headers):
+        return Response(status_code=304, headers=fastjson.validators(version))
+    # Ya serializado con el esquema de DaySummary: sin pasar por los modelos
+    body, headers = fastjson.encode(day_summary_json(fecha_obj, atleta=atleta), request.headers, version=version)
+    return Response(content=body, headers=headers)
+
+
+@app.get("/range-summary", response_model=RangeSummary)
+async def get_range_summary(
+    desde: str = Query(alias="from"), hasta: str = Query(alias="to"), atleta: str | None = _ATLETA
+):
+    try:
+        desde_obj = date.fromisoformat(desde)
+        hasta_obj = date.fromisoformat(hasta)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="fecha inválida (use YYYY-MM-DD)")
+    try:
+        return range_summary(desde_obj, hasta_obj, atleta=atleta)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
 
 
 # =====================
@@ -143,7 +413,7 @@ async def get_day_summary(fecha: str | None = None):
 # =====================
 @app.get("/product-lookup")
 async def product_lookup(barcode: str):
-    prod = off_lookup_barcode(barcode)
+    prod = await off_lookup_barcode(barcode)
     if not prod:
         return {"ok": False, "error": "producto no encontrado"}
     return {"ok": True, "item": ProductInfo(**prod)}
@@ -151,19 +421,110 @@ async def product_lookup(barcode: str):
 
 @app.get("/product-search", response_model=list[ProductInfo])
 async def product_search(query: str, limit: int = 5):
-    results = off_search(query, limit=limit)
+    results = await off_search(query, limit=limit)
     return [ProductInfo(**r) for r in results]
 
 
 @app.delete("/meal/{meal_id}")
-async def delete_meal(meal_id: str):
+async def delete_meal(meal_id: str, atleta: str | None = _ATLETA):
     try:
-        ok = remove_meal(meal_id)
+        ok = await remove_meal_async(meal_id, atleta=atleta)
         return {"ok": ok}
     except Exception:
         return {"ok": False}
 
 
+# =====================
+# Export / Import
+# =====================
+IMPORT_BATCH = 1000
+MAX_IMPORT_ERRORS = 50
+
+
+def _check_transfer_params(kind: str, format: str) -> None:
+    if kind not in HEADERS:
+        raise HTTPException(status_code=400, detail="kind debe ser 'sessions' o 'meals'")
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail="format debe ser 'ndjson' o 'csv'")
+
+
+@app.get("/export")
+async def export_data(kind: str = "sessions", format: str = "ndjson", atleta: str | None = _ATLETA):
+    _check_transfer_params(kind, format)
+    rows = iter_historial(atleta=atleta) if kind == "sessions" else iter_meals(atleta=atleta)
+    ext = "ndjson" if format == "ndjson" else "csv"
+    # Generador síncrono: Starlette lo recorre en el threadpool, sin bloquear el event loop
+    return StreamingResponse(
+        export_chunks(rows, HEADERS[kind], format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{kind}.{ext}"'},
+    )
+
+
+def _flush_import(kind: str, batch: list[dict[str, Any]], atleta: str | None) -> tuple[int, int]:
+    if kind == "sessions":
+        filas = ((r["ejercicio"], r["peso_actual"], r["reps"], r["fecha"]) for r in batch)
+        return registrar_lote(filas, atleta=atleta), 0
+    return import_meals(batch, atleta=atleta)
+
+
+@app.post("/import")
+async def import_data(
+    request: Request, kind: str = "sessions", format: str = "ndjson", atleta: str | None = _ATLETA
+):
+    """Ingesta en streaming: valida registro por registro y escribe por lotes de IMPORT_BATCH."""
+    _check_transfer_params(kind, format)
+    decoder = RecordDecoder(format)
+    batch: list[dict[str, Any]] = []
+    importadas = duplicadas = errores = 0
+    detalle: list[dict[str, Any]] = []
+
+    def validar(linea: int, record: Any) -> None:
+        nonlocal errores
+        try:
+            if record is None:
+                raise ValueError("registro ilegible")
+            if kind == "sessions":
+                batch.append(SessionRecord.model_validate(record).model_dump())
+            else:
+                # El id es opcional al importar: si falta, import_meals genera uno
+                entry = MealEntry.model_validate({"id": "", **record})
+                try:
+                    date.fromisoformat(entry.fecha)
+                except ValueError:
+                    raise ValueError("fecha inválida (use YYYY-MM-DD)")
+                batch.append(entry.model_dump())
+        except (ValidationError, ValueError) as exc:
+            errores += 1
+            if len(detalle) < MAX_IMPORT_ERRORS:
+                msg = _validation_error(exc) if isinstance(exc, ValidationError) else str(exc)
+                detalle.append({"linea": linea, "error": msg})
+
+    async def flush() -> None:
+        nonlocal importadas, duplicadas
+        if batch:
+            ok, dup = await submit_exclusive(partial(_flush_import, kind, list(batch), atleta))
+            importadas += ok
+            duplicadas += dup
+            batch.clear()
+
+    async for chunk in request.stream():
+        for linea, record in decoder.feed(chunk):
+            validar(linea, record)
+        if len(batch) >= IMPORT_BATCH:
+            await flush()
+    for linea, record in decoder.feed(b"", final=True):
+        validar(linea, record)
+    await flush()
+    return {
+        "ok": errores == 0,
+        "importadas": importadas,
+        "duplicadas": duplicadas,
+        "errores": errores,
+        "detalle_errores": detalle,
+    }
+
+
 if __name__ == "__main__":
     # Permite: python app/main.py
     import uvicorn
@@ -0,0 +1,114 @@
+"""Generador determinista de datos sintéticos para los benchmarks.
+
+Escribe `historial.csv`, `comidas.csv` (formato legacy de un solo archivo, que la
+app migra a particiones al arrancar) y `alimentos.csv` con N filas cada uno. La
+misma semilla y el mismo N producen siempre los mismos archivos.
+
+    python -m benchmarks.generate --rows 100000 --out /tmp/bench-data
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import random
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterator, List, Sequence
+
+from app.core.meal_store import MEALS_HEADERS
+from app.core.nutrition import FOODS_HEADERS, _EXTRA_FOODS, _SEED_FOODS
+from app.core.progression import CSV_HEADERS
+
+DEFAULT_SEED = 1234
+
+EJERCICIOS = [
+    "Sentadilla", "Press banca", "Peso muerto", "Press militar", "Remo con barra",
+    "Dominadas", "Fondos", "Hip thrust", "Curl bíceps", "Extensión tríceps",
+    "Prensa", "Zancadas", "Press inclinado", "Jalón al pecho", "Peso muerto rumano",
+]
+
+# Vocabulario para nombres de alimentos sintéticos (con acentos, como los reales)
+_BASES = [
+    "Yogur", "Galletitas", "Queso", "Jamón", "Pan", "Cereal", "Barra", "Leche", "Bebida",
+    "Salsa", "Atún", "Arroz", "Fideos", "Pechuga", "Manteca", "Dulce", "Café", "Té",
+]
+_VARIANTES = [
+    "natural", "light", "integral", "descremado", "con azúcar", "sin azúcar", "de maní",
+    "de avena", "de almendras", "frutilla", "chocolate", "vainilla", "orgánico", "proteico",
+]
+_MARCAS = ["La Serenísima", "Arcor", "Granix", "Molto", "Sancor", "Gallo", "Lucchetti", "Ser", "Vital"]
+
+FECHA_FIN = date(2025, 12, 31)
+
+
+def _fechas(rng: random.Random, rows: int) -> Iterator[date]:
+    """Fechas crecientes repartidas en ~5 años, con varias filas por día."""
+    dias = 5 * 365
+    for i in range(rows):
+        base = FECHA_FIN - timedelta(days=dias - (i * dias) // max(rows, 1))
+        yield base if rng.random() < 0.9 else base - timedelta(days=rng.randint(1, 3))
+
+
+def historial_rows(rows: int, seed: int = DEFAULT_SEED) -> Iterator[List[object]]:
+    rng = random.Random(seed)
+    for fecha in _fechas(rng, rows):
+        ejercicio = rng.choice(EJERCICIOS)
+        peso = round(rng.uniform(20, 180) / 2.5) * 2.5
+        yield [ejercicio, f"{peso}", rng.randint(3, 15), fecha.isoformat()]
+
+
+def alimentos_rows(rows: int, seed: int = DEFAULT_SEED) -> Iterator[List[object]]:
+    """Primero el catálogo real (seed + extras) y después variantes sintéticas únicas."""
+    reales = list(_SEED_FOODS) + list(_EXTRA_FOODS)
+    for r in reales[:rows]:
+        yield list(r)
+    rng = random.Random(seed + 1)
+    for i in range(max(rows - len(reales), 0)):
+        nombre = f"{rng.choice(_BASES)} {rng.choice(_VARIANTES)} {rng.choice(_MARCAS)} {i}"
+        kcal = round(rng.uniform(20, 600), 1)
+        yield [nombre, kcal, round(rng.uniform(0, 30), 1), round(rng.uniform(0, 80), 1), round(rng.uniform(0, 40), 1)]
+
+
+def comidas_rows(rows: int, seed: int = DEFAULT_SEED) -> Iterator[List[object]]:
+    rng = random.Random(seed + 2)
+    ids = random.Random(seed + 3)
+    reales: Sequence[tuple] = list(_SEED_FOODS) + list(_EXTRA_FOODS)
+    for fecha in _fechas(rng, rows):
+        nombre, kcal, prot, carb, grasa = rng.choice(reales)
+        gramos = float(rng.choice([30, 50, 80, 100, 120, 150, 200, 250]))
+        f = gramos / 100.0
+        yield [
+            str(uuid.UUID(int=ids.getrandbits(128), version=4)), fecha.isoformat(), nombre, gramos,
+            round(kcal * f, 2), round(prot * f, 2), round(carb * f, 2), round(grasa * f, 2),
+        ]
+
+
+def _write(path: Path, headers: Sequence[str], rows: Iterator[List[object]]) -> None:
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(headers)
+        w.writerows(rows)
+
+
+def generate(out: Path, rows: int, seed: int = DEFAULT_SEED) -> Path:
+    """Crea el directorio de datos `out` con los tres CSV de `rows` filas."""
+    out.mkdir(parents=True, exist_ok=True)
+    _write(out / "historial.csv", CSV_HEADERS, historial_rows(rows, seed))
+    _write(out / "alimentos.csv", FOODS_HEADERS, alimentos_rows(rows, seed))
+    _write(out / "comidas.csv", MEALS_HEADERS, comidas_rows(rows, seed))
+    return out
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, required=True, help="filas por archivo")
+    parser.add_argument("--out", type=Path, required=True, help="directorio de datos a crear")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args(argv)
+    generate(args.out, args.rows, args.seed)
+    print(f"datos generados en {args.out} ({args.rows} filas por archivo)")
+
+
+if __name__ == "__main__":
+    main()
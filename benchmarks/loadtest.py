@@ -0,0 +1,320 @@
+"""Prueba de carga de punta a punta contra la API, con Open Food Facts simulado.
+
+Levanta el stub de OFF (benchmarks.off_stub) en un proceso aparte, apunta la app
+a él con OFF_BASE_URL y a un directorio de datos temporal, y dispara una mezcla
+configurable de /session, /meal, /day-summary, /foods y /product-lookup con N
+clientes concurrentes. Reporta throughput y latencias p50/p90/p99 por ruta.
+
+  --mode asgi  la app corre en este mismo proceso (httpx.ASGITransport): mide la
+               app sin red ni servidor, pero comparte el event loop con el generador.
+  --mode http  la app corre en uvicorn (subproceso, --workers N) y se le habla por HTTP.
+
+    python -m benchmarks.loadtest --mode asgi --duration 10 --concurrency 32
+    python -m benchmarks.loadtest --mode http --workers 2 --off-latency-ms 300 --off-failure-rate 0.1
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from benchmarks import off_stub
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_OUTPUT = ROOT / "benchmarks" / "results" / "loadtest.json"
+
+ROUTES = ("session", "meal", "day-summary", "foods", "product-lookup")
+DEFAULT_MIX = "session=3,meal=2,day-summary=3,foods=4,product-lookup=1"
+# Mismas consultas que benchmarks.run (no se importa: cargaría la app antes de configurar el entorno)
+SEARCH_QUERIES = ["arroz", "yog", "pollo", "leche desc", "avna", "queso", "pan integral", "banana"]
+EJERCICIOS = ["Sentadilla", "Press banca", "Peso muerto", "Press militar", "Remo con barra", "Dominadas"]
+ALIMENTOS = ["Arroz blanco cocido", "Pechuga de pollo", "Avena", "Banana", "Huevo (entero)", "Manzana"]
+# Días hacia atrás sobre los que se reparten comidas y consultas de resumen
+DIAS = 30
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """`session=3,foods=1` → pesos por ruta (las rutas omitidas no se usan)."""
+    mix: Dict[str, float] = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        route, _, weight = part.partition("=")
+        if route not in ROUTES:
+            raise ValueError(f"ruta desconocida: {route} (opciones: {', '.join(ROUTES)})")
+        mix[route] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("la mezcla no tiene rutas con peso > 0")
+    return mix
+
+
+class Traffic:
+    """Arma requests aleatorios (pero reproducibles por semilla) para cada ruta."""
+
+    def __init__(self, barcodes: int, atletas: int, seed: int) -> None:
+        rng = random.Random(seed)
+        # Pool acotado de códigos: cuanto más chico, más aciertos en la caché de OFF
+        self.barcodes = [f"779{rng.randrange(10**10):010d}" for _ in range(max(barcodes, 1))]
+        self.atletas = [f"atleta-{i}" for i in range(atletas)]
+        self.hoy = date.today()
+
+    def _fecha(self, rng: random.Random) -> str:
+        return (self.hoy - timedelta(days=rng.randrange(DIAS))).isoformat()
+
+    def _atleta(self, rng: random.Random) -> Optional[str]:
+        return rng.choice(self.atletas) if self.atletas else None
+
+    def build(self, route: str, rng: random.Random) -> Tuple[str, str, dict]:
+        atleta = self._atleta(rng)
+        if route == "session":
+            body = {
+                "ejercicio": rng.choice(EJERCICIOS),
+                "peso_actual": round(rng.uniform(20, 180) / 2.5) * 2.5,
+                "reps": rng.randint(3, 12),
+                "rpe": rng.randint(6, 10),
+                "atleta": atleta,
+            }
+            return "POST", "/session", {"json": body}
+        if route == "meal":
+            body = {
+                "alimento": rng.choice(ALIMENTOS),
+                "cantidad_g": float(rng.choice([50, 100, 150, 200])),
+                "fecha": self._fecha(rng),
+                "atleta": atleta,
+            }
+            return "POST", "/meal", {"json": body}
+        if route == "day-summary":
+            params = {"fecha": self._fecha(rng)}
+            if atleta:
+                params["atleta"] = atleta
+            return "GET", "/day-summary", {"params": params}
+        if route == "foods":
+            return "GET", "/foods", {"params": {"query": rng.choice(SEARCH_QUERIES), "limit": 20}}
+        return "GET", "/product-lookup", {"params": {"barcode": rng.choice(self.barcodes)}}
+
+
+class RouteStats:
+    def __init__(self) -> None:
+        self.latencias_ns: List[int] = []
+        self.status: Counter = Counter()
+        self.errores = 0
+        self.ok_false = 0  # respuestas 200 con {"ok": false} (p. ej. OFF caído o sin producto)
+
+    def add(self, ns: int, status: int, ok_false: bool) -> None:
+        self.latencias_ns.append(ns)
+        self.status[status] += 1
+        if status == 0 or status >= 400:
+            self.errores += 1
+        elif ok_false:
+            self.ok_false += 1
+
+    def summary(self, elapsed_s: float) -> Dict[str, object]:
+        lat = sorted(self.latencias_ns)
+
+        def pct(q: float) -> Optional[float]:
+            if not lat:
+                return None
+            i = min(len(lat) - 1, max(0, round(q * (len(lat) - 1))))
+            return round(lat[i] / 1e6, 2)
+
+        return {
+            "count": len(lat),
+            "errors": self.errores,
+            "ok_false": self.ok_false,
+            "rps": round(len(lat) / elapsed_s, 1) if elapsed_s > 0 else None,
+            "p50_ms": pct(0.50),
+            "p90_ms": pct(0.90),
+            "p99_ms": pct(0.99),
+            "max_ms": round(lat[-1] / 1e6, 2) if lat else None,
+            "status": {str(k): v for k, v in sorted(self.status.items())},
+        }
+
+
+async def drive(client: httpx.AsyncClient, mix: Dict[str, float], traffic: Traffic, args: argparse.Namespace) -> Tuple[Dict[str, RouteStats], float]:
+    """Corre `concurrency` clientes hasta agotar `--requests` o `--duration`."""
+    routes, weights = list(mix), list(mix.values())
+    stats = {route: RouteStats() for route in routes}
+    issued = 0
+    deadline = time.perf_counter() + args.duration
+
+    async def worker(n: int) -> None:
+        nonlocal issued
+        rng = random.Random(args.seed * 1000 + n)
+        while time.perf_counter() < deadline and (not args.requests or issued < args.requests):
+            issued += 1
+            route = rng.choices(routes, weights)[0]
+            method, url, kwargs = traffic.build(route, rng)
+            t0 = time.perf_counter_ns()
+            ok_false = False
+            try:
+                resp = await client.request(method, url, **kwargs)
+                status = resp.status_code
+                if route in ("meal", "product-lookup") and status == 200:
+                    ok_false = resp.json().get("ok") is False
+            except httpx.HTTPError:
+                status = 0
+            stats[route].add(time.perf_counter_ns() - t0, status, ok_false)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(args.concurrency)))
+    return stats, time.perf_counter() - start
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _spawn(cmd: List[str], url: str, env: Dict[str, str], timeout: float = 30.0) -> subprocess.Popen:
+    """Arranca un servidor y espera a que `url` responda."""
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env)
+    deadline = time.monotonic() + timeout
+    while True:
+        if proc.poll() is not None:
+            raise SystemExit(f"{cmd[2]} terminó al arrancar (código {proc.returncode})")
+        try:
+            httpx.get(url, timeout=1.0)
+            return proc
+        except httpx.HTTPError:
+            if time.monotonic() > deadline:
+                proc.kill()
+                raise SystemExit(f"{cmd[2]} no respondió en {timeout:.0f} s")
+            time.sleep(0.1)
+
+
+def _stop(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+async def _run_asgi(mix: Dict[str, float], traffic: Traffic, args: argparse.Namespace) -> Tuple[Dict[str, RouteStats], float]:
+    # La app lee OFF_BASE_URL y PI_DATA_DIR al importarse: el entorno ya está configurado
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60.0) as client:
+            return await drive(client, mix, traffic, args)
+
+
+async def _run_http(base_url: str, mix: Dict[str, float], traffic: Traffic, args: argparse.Namespace) -> Tuple[Dict[str, RouteStats], float]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        return await drive(client, mix, traffic, args)
+
+
+def _print_table(report: Dict[str, object]) -> None:
+    print(f"{'ruta':<16} {'reqs':>8} {'req/s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'máx ms':>9} {'errores':>8} {'ok=false':>9}")
+    rows = list(report["routes"].items()) + [("TOTAL", report["total"])]  # type: ignore[union-attr]
+    for route, r in rows:
+        print(
+            f"{route:<16} {r['count']:>8} {r['rps'] or 0:>9.1f} {r['p50_ms'] or 0:>9.2f} {r['p90_ms'] or 0:>9.2f}"
+            f" {r['p99_ms'] or 0:>9.2f} {r['max_ms'] or 0:>9.2f} {r['errors']:>8} {r['ok_false']:>9}"
+        )
+    upstream = report.get("upstream") or {}
+    print(f"OFF stub: {upstream.get('requests', 0)} requests, {upstream.get('failures', 0)} fallas simuladas")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("asgi", "http"), default="asgi")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"pesos por ruta (por defecto {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=16, help="clientes concurrentes")
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos de carga")
+    parser.add_argument("--requests", type=int, default=0, help="cortar tras N requests (0 = solo --duration)")
+    parser.add_argument("--workers", type=int, default=1, help="workers de uvicorn (solo --mode http)")
+    parser.add_argument("--barcodes", type=int, default=200, help="tamaño del pool de códigos de barra")
+    parser.add_argument("--atletas", type=int, default=0, help="repartir escrituras entre N atletas (0 = historial compartido)")
+    parser.add_argument("--rows", type=int, default=0, help="precargar N filas con benchmarks.generate")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    off_stub.add_arguments(parser, prefix="off-")
+    args = parser.parse_args(argv)
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as ve:
+        parser.error(str(ve))
+
+    stub_config = off_stub.config_from_args(args, prefix="off-", seed=args.seed)
+    traffic = Traffic(args.barcodes, args.atletas, args.seed)
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as tmp:
+        data = Path(tmp)
+        stub_port = _free_port()
+        stub_url = f"http://127.0.0.1:{stub_port}"
+        # Sin caché de OFF en disco ni base local: cada lookup nuevo pasa por el stub
+        app_env = {"PI_DATA_DIR": str(data), "OFF_BASE_URL": stub_url, "OFF_CACHE_PATH": "", "OFF_LOCAL_DB": str(data / "no-off.sqlite3")}
+        if args.rows:
+            # En otro proceso: benchmarks.generate importa la app, que fija su configuración
+            # al importarse y en modo asgi tiene que ver app_env
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.generate", "--rows", str(args.rows), "--out", str(data), "--seed", str(args.seed)],
+                cwd=ROOT, env=dict(os.environ, **app_env), check=True, stdout=subprocess.DEVNULL,
+            )
+        stub = _spawn(
+            [sys.executable, "-m", "benchmarks.off_stub", "--port", str(stub_port), "--seed", str(args.seed), "--log-level", "warning",
+             "--latency-ms", str(stub_config.latency_ms), "--jitter-ms", str(stub_config.jitter_ms),
+             "--failure-rate", str(stub_config.failure_rate), "--missing-rate", str(stub_config.missing_rate)],
+            f"{stub_url}/__stats", dict(os.environ),
+        )
+        try:
+            if args.mode == "asgi":
+                os.environ.update(app_env)
+                stats, elapsed = asyncio.run(_run_asgi(mix, traffic, args))
+            else:
+                port = _free_port()
+                server = _spawn(
+                    [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+                     "--workers", str(args.workers), "--log-level", "warning"],
+                    f"http://127.0.0.1:{port}/health", dict(os.environ, **app_env),
+                )
+                try:
+                    stats, elapsed = asyncio.run(_run_http(f"http://127.0.0.1:{port}", mix, traffic, args))
+                finally:
+                    _stop(server)
+            upstream = httpx.get(f"{stub_url}/__stats", timeout=5.0).json()
+        finally:
+            _stop(stub)
+
+    total = RouteStats()
+    for s in stats.values():
+        total.latencias_ns += s.latencias_ns
+        total.status.update(s.status)
+        total.errores += s.errores
+        total.ok_false += s.ok_false
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "mode": args.mode,
+        "workers": args.workers if args.mode == "http" else None,
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "mix": mix,
+        "rows": args.rows,
+        "storage": os.environ.get("PI_STORAGE", "csv"),
+        "off_stub": stub_config.__dict__,
+        "routes": {route: s.summary(elapsed) for route, s in stats.items()},
+        "total": total.summary(elapsed),
+        "upstream": upstream,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    _print_table(report)
+    print(f"resultados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
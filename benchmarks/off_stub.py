@@ -0,0 +1,139 @@
+"""Servidor local que imita los endpoints de Open Food Facts que usa la app.
+
+Responde `/api/v2/product/<barcode>.json` y `/cgi/search.pl` con productos
+deterministas (derivados del código o de la búsqueda), con latencia y tasas de
+error configurables, para medir la app con un upstream lento o inestable sin
+salir a la red. Apuntar la app con OFF_BASE_URL=http://127.0.0.1:<puerto>.
+
+    python -m benchmarks.off_stub --port 8765 --latency-ms 200 --failure-rate 0.05
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import random
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+_NOMBRES = ["Galletitas", "Yogur", "Queso", "Leche", "Cereal", "Barra", "Mermelada", "Atún", "Fideos", "Jugo"]
+_MARCAS = ["Arcor", "Sancor", "Molto", "Granix", "Gallo", "Ser", "Vital", "Lucchetti"]
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 50.0
+    jitter_ms: float = 0.0
+    failure_rate: float = 0.0  # fracción de respuestas 503
+    missing_rate: float = 0.1  # fracción de códigos inexistentes (404)
+    seed: int = 0
+
+
+@dataclass
+class StubStats:
+    requests: int = 0
+    failures: int = 0
+    missing: int = 0
+    by_path: Dict[str, int] = field(default_factory=dict)
+
+
+def _product(code: str) -> dict:
+    h = hashlib.sha256(code.encode()).digest()
+    return {
+        "code": code,
+        "product_name": f"{_NOMBRES[h[0] % len(_NOMBRES)]} {h[1]}",
+        "brands": _MARCAS[h[2] % len(_MARCAS)],
+        "nutriments": {
+            "energy-kcal_100g": 20 + h[3] * 2,
+            "proteins_100g": h[4] % 30,
+            "carbohydrates_100g": h[5] % 80,
+            "fat_100g": h[6] % 40,
+        },
+    }
+
+
+def create_app(config: StubConfig) -> Starlette:
+    stats = StubStats()
+    rng = random.Random(config.seed)
+
+    async def _delay_or_fail(path: str) -> Optional[JSONResponse]:
+        stats.requests += 1
+        stats.by_path[path] = stats.by_path.get(path, 0) + 1
+        delay = config.latency_ms + (rng.uniform(-1, 1) * config.jitter_ms if config.jitter_ms else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+        if rng.random() < config.failure_rate:
+            stats.failures += 1
+            return JSONResponse({"status": 0, "status_verbose": "stub failure"}, status_code=503)
+        return None
+
+    async def product(request: Request) -> JSONResponse:
+        failed = await _delay_or_fail("product")
+        if failed is not None:
+            return failed
+        code = request.path_params["barcode"]
+        # Inexistencia determinista por código, así los negativos se pueden cachear
+        if int(hashlib.sha256(code.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF < config.missing_rate:
+            stats.missing += 1
+            return JSONResponse({"status": 0, "status_verbose": "product not found"}, status_code=404)
+        return JSONResponse({"status": 1, "code": code, "product": _product(code)})
+
+    async def search(request: Request) -> JSONResponse:
+        failed = await _delay_or_fail("search")
+        if failed is not None:
+            return failed
+        terms = request.query_params.get("search_terms", "")
+        size = min(int(request.query_params.get("page_size", 10) or 10), 100)
+        seed = hashlib.sha256(terms.encode()).hexdigest()[:10]
+        products = [_product(f"{int(seed, 16) + i:013d}"[-13:]) for i in range(size)]
+        return JSONResponse({"count": size, "page_size": size, "products": products})
+
+    async def stub_stats(request: Request) -> JSONResponse:
+        return JSONResponse(stats.__dict__)
+
+    app = Starlette(routes=[
+        Route("/api/v2/product/{barcode}.json", product),
+        Route("/cgi/search.pl", search),
+        Route("/__stats", stub_stats),
+    ])
+    app.state.stats = stats
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser, prefix: str = "") -> None:
+    parser.add_argument(f"--{prefix}latency-ms", type=float, default=50.0, help="latencia de cada respuesta (ms)")
+    parser.add_argument(f"--{prefix}jitter-ms", type=float, default=0.0, help="variación ± de la latencia (ms)")
+    parser.add_argument(f"--{prefix}failure-rate", type=float, default=0.0, help="fracción de respuestas 503")
+    parser.add_argument(f"--{prefix}missing-rate", type=float, default=0.1, help="fracción de códigos inexistentes")
+
+
+def config_from_args(args: argparse.Namespace, prefix: str = "", seed: int = 0) -> StubConfig:
+    p = prefix.replace("-", "_")
+    return StubConfig(
+        latency_ms=getattr(args, f"{p}latency_ms"),
+        jitter_ms=getattr(args, f"{p}jitter_ms"),
+        failure_rate=getattr(args, f"{p}failure_rate"),
+        missing_rate=getattr(args, f"{p}missing_rate"),
+        seed=seed,
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="info")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    uvicorn.run(create_app(config_from_args(args, seed=args.seed)), host=args.host, port=args.port, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Benchmarks de los caminos calientes de almacenamiento.
+
+Para cada tamaño genera datos deterministas (ver benchmarks.generate) en un
+directorio temporal y mide, en un proceso aparte por tamaño, cada operación:
+ops/seg, latencias p50/p99, la primera llamada (en frío) y el pico de memoria
+asignada. El resultado se guarda en JSON; con --baseline se compara contra una
+corrida anterior y se sale con código 1 si alguna operación empeoró.
+
+    python -m benchmarks.run --sizes 1000,100000,1000000
+    python -m benchmarks.run --sizes 1000 --baseline benchmarks/results/latest.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from benchmarks.generate import DEFAULT_SEED, EJERCICIOS, FECHA_FIN, alimentos_rows, comidas_rows, generate
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_OUTPUT = ROOT / "benchmarks" / "results" / "latest.json"
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+
+OPS = (
+    "load_foods", "load_foods_cold", "search_foods", "search_index", "promedio_reps_semana",
+    "registrar", "day_summary", "add_meal", "remove_meal",
+)
+SEARCH_QUERIES = ["arroz", "yog", "pollo", "leche desc", "avna", "queso", "pan integral", "banana"]
+# Llamadas con tracemalloc activo para medir el pico de memoria de cada operación
+TRACED_CALLS = 3
+
+
+def _percentile(sorted_ns: Sequence[int], q: float) -> float:
+    i = min(len(sorted_ns) - 1, max(0, round(q * (len(sorted_ns) - 1))))
+    return sorted_ns[i] / 1000.0
+
+
+def measure(name: str, fn: Callable[[int], object], max_ops: int, budget_s: float) -> Dict[str, object]:
+    """Corre `fn(i)` hasta `max_ops` veces o `budget_s` segundos y resume latencias (µs)."""
+    t0 = time.perf_counter_ns()
+    fn(0)
+    first_us = (time.perf_counter_ns() - t0) / 1000.0
+    lat: List[int] = []
+    deadline = time.perf_counter() + budget_s
+    start = time.perf_counter_ns()
+    for i in range(1, max_ops + 1):
+        t = time.perf_counter_ns()
+        fn(i)
+        lat.append(time.perf_counter_ns() - t)
+        if time.perf_counter() > deadline:
+            break
+    total_s = (time.perf_counter_ns() - start) / 1e9
+    tracemalloc.start()
+    for i in range(max_ops + 1, max_ops + 1 + TRACED_CALLS):
+        fn(i)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    lat.sort()
+    return {
+        "op": name,
+        "calls": len(lat),
+        "ops_per_sec": round(len(lat) / total_s, 1) if total_s > 0 else None,
+        "first_us": round(first_us, 1),
+        "p50_us": round(_percentile(lat, 0.50), 1) if lat else None,
+        "p99_us": round(_percentile(lat, 0.99), 1) if lat else None,
+        "peak_alloc_kib": round(peak / 1024, 1),
+    }
+
+
+def run_size(rows: int, ops: Sequence[str], max_ops: int, budget_s: float, seed: int) -> Dict[str, object]:
+    """Se ejecuta en el proceso worker, con PI_DATA_DIR apuntando a los datos generados."""
+    from app.core import nutrition, progression
+    from app.core.food_index import FoodSearchIndex
+
+    t0 = time.perf_counter()
+    nutrition.prepare_foods_catalog()
+    nutrition.prepare_meals_storage()  # incluye la migración de comidas.csv a particiones
+    nutrition.load_foods()
+    # El catálogo de la app sólo publica los alimentos permitidos, así que search_foods
+    # no crece con `rows`; search_index mide el índice sobre todos los nombres generados.
+    index = FoodSearchIndex([row[0] for row in alimentos_rows(rows, seed)]) if "search_index" in ops else None
+    setup_s = time.perf_counter() - t0
+
+    rng = random.Random(seed)
+    span = 5 * 365
+    fechas = [date.fromordinal(FECHA_FIN.toordinal() - rng.randrange(span)) for _ in range(1024)]
+    ids = [row[0] for row in islice(comidas_rows(rows, seed), min(rows, max_ops + 1 + TRACED_CALLS))]
+    hoy = date.today()
+
+    def remove(i: int) -> object:
+        return nutrition.remove_meal(ids[i % len(ids)])
+
+    bench: Dict[str, Callable[[int], object]] = {
+        "load_foods": lambda i: nutrition.load_foods(),
+        "load_foods_cold": lambda i: (nutrition._catalog.invalidate(), nutrition.load_foods()),
+        "search_foods": lambda i: nutrition.search_foods(SEARCH_QUERIES[i % len(SEARCH_QUERIES)]),
+        "search_index": lambda i: index.search(SEARCH_QUERIES[i % len(SEARCH_QUERIES)]),  # type: ignore[union-attr]
+        "promedio_reps_semana": lambda i: progression.promedio_reps_semana(EJERCICIOS[i % len(EJERCICIOS)]),
+        "registrar": lambda i: progression.registrar(EJERCICIOS[i % len(EJERCICIOS)], 100.0, 8, hoy),
+        "day_summary": lambda i: nutrition.day_summary(fechas[i % len(fechas)]),
+        "add_meal": lambda i: nutrition.add_meal("Arroz blanco cocido", 100.0, fechas[i % len(fechas)]),
+        "remove_meal": remove,
+    }
+    # remove_meal borra cada id una sola vez: no más llamadas que ids generados
+    limits = {"remove_meal": max(len(ids) - 1 - TRACED_CALLS, 1)}
+    results = [measure(op, bench[op], min(max_ops, limits.get(op, max_ops)), budget_s) for op in ops]
+    return {
+        "rows": rows,
+        "setup_s": round(setup_s, 3),
+        "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "results": results,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def _spawn(rows: int, args: argparse.Namespace) -> Dict[str, object]:
+    with tempfile.TemporaryDirectory(prefix=f"bench-{rows}-") as tmp:
+        data = generate(Path(tmp), rows, args.seed)
+        env = dict(os.environ, PI_DATA_DIR=str(data), OFF_CACHE_PATH="", OFF_LOCAL_DB=str(data / "no-off.sqlite3"))
+        cmd = [
+            sys.executable, "-m", "benchmarks.run", "--worker", "--sizes", str(rows),
+            "--ops", ",".join(args.ops), "--max-ops", str(args.max_ops),
+            "--budget", str(args.budget), "--seed", str(args.seed),
+        ]
+        proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise SystemExit(f"worker {rows} falló:\n{proc.stderr}")
+        return json.loads(proc.stdout)
+
+
+def compare(current: Dict[str, object], baseline: Dict[str, object], tolerance: float) -> List[str]:
+    """Operaciones cuyo ops/seg cayó más de `tolerance` respecto de la línea base."""
+    def index(report: Dict[str, object]) -> Dict[tuple, float]:
+        return {
+            (size["rows"], r["op"]): r["ops_per_sec"]
+            for size in report["sizes"]  # type: ignore[union-attr]
+            for r in size["results"]
+            if r.get("ops_per_sec")
+        }
+
+    base = index(baseline)
+    regressions = []
+    for key, ops in index(current).items():
+        before = base.get(key)
+        if before and ops < before * (1 - tolerance):
+            regressions.append(f"{key[1]} @ {key[0]} filas: {ops:.1f} ops/s (antes {before:.1f}, {ops / before - 1:+.0%})")
+    return regressions
+
+
+def _print_table(report: Dict[str, object]) -> None:
+    print(f"{'filas':>9} {'operación':<22} {'ops/s':>11} {'p50 µs':>10} {'p99 µs':>10} {'1ra µs':>12} {'pico KiB':>10}")
+    for size in report["sizes"]:  # type: ignore[union-attr]
+        for r in size["results"]:
+            print(
+                f"{size['rows']:>9} {r['op']:<22} {r['ops_per_sec'] or 0:>11.1f} {r['p50_us'] or 0:>10.1f}"
+                f" {r['p99_us'] or 0:>10.1f} {r['first_us']:>12.1f} {r['peak_alloc_kib']:>10.1f}"
+            )
+        print(f"{size['rows']:>9} setup {size['setup_s']} s, RSS máx {size['max_rss_kib']} KiB")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="filas por archivo, separadas por coma")
+    parser.add_argument("--ops", default=",".join(OPS), help="operaciones a medir")
+    parser.add_argument("--max-ops", type=int, default=1000, help="máximo de llamadas por operación")
+    parser.add_argument("--budget", type=float, default=5.0, help="segundos máximos por operación")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=Path, help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="caída de ops/s tolerada (0.25 = 25%%)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    args.ops = [op for op in args.ops.split(",") if op]
+    unknown = set(args.ops) - set(OPS)
+    if unknown:
+        parser.error(f"operaciones desconocidas: {', '.join(sorted(unknown))}")
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+
+    if args.worker:
+        json.dump(run_size(sizes[0], args.ops, args.max_ops, args.budget, args.seed), sys.stdout)
+        return
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "storage": os.environ.get("PI_STORAGE", "csv"),
+        "fsync": os.environ.get("PI_FSYNC", "1") != "0",
+        "seed": args.seed,
+        "sizes": [_spawn(rows, args) for rows in sizes],
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    _print_table(report)
+    print(f"resultados en {args.output}")
+
+    if args.baseline:
+        regressions = compare(report, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        for line in regressions:
+            print(f"REGRESIÓN {line}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
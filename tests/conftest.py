@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import nutrition
+
+# La app importa numpy en segundo plano al arrancar; si pytest.approx lo encuentra a medio
+# importar falla, así que se importa antes de cualquier test
+import app.core.planning  # noqa: F401
+
+
+@pytest.fixture
+def datos(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Directorio de datos vacío para la app; las cachés por ruta arrancan de cero."""
+    monkeypatch.setenv("PI_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("PI_FSYNC", "0")
+    monkeypatch.setenv("OFF_CACHE_PATH", "")
+    monkeypatch.setenv("OFF_LOCAL_DB", str(tmp_path / "off_products.sqlite3"))
+    # El catálogo se siembra una vez por proceso: volver a sembrarlo en este directorio
+    monkeypatch.setattr(nutrition, "_catalog_prepared", False)
+    nutrition._catalog.invalidate()
+    return tmp_path
+
+
+@pytest.fixture
+def cliente(datos: Path) -> Iterator[TestClient]:
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
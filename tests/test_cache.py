@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+from app.core import cache
+from app.core.cache import TTLCache, _DiskTier
+
+
+@pytest.fixture
+def reloj(monkeypatch: pytest.MonkeyPatch) -> List[float]:
+    """Hora controlada por el test para los vencimientos (reloj[0] += segundos)."""
+    ahora = [1_000_000.0]
+    monkeypatch.setattr(cache, "time", SimpleNamespace(time=lambda: ahora[0]))
+    return ahora
+
+
+def _filas(path: Path) -> List[tuple]:
+    with sqlite3.connect(str(path)) as db:
+        return db.execute("SELECT ns, key FROM cache ORDER BY key").fetchall()
+
+
+def test_los_negativos_vencen_con_su_propio_ttl(reloj):
+    c = TTLCache("t", ttl=100, negative_ttl=10)
+    c.set("existe", {"nombre": "Avena"})
+    c.set("no-existe", None)
+    assert c.get("no-existe") == (True, None)
+    assert c.negative_hits == 1
+
+    reloj[0] += 10
+    assert c.get("no-existe") == (False, None)
+    assert c.get("existe") == (True, {"nombre": "Avena"})
+    reloj[0] += 90
+    assert c.get("existe") == (False, None)
+    assert c.stats()["hits"] == 2 and c.stats()["misses"] == 2
+
+
+def test_lru_en_memoria_descarta_el_menos_usado():
+    c = TTLCache("t", max_entries=2)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == (True, 1)
+    c.set("c", 3)
+    assert c.get("b") == (False, None)
+    assert c.get("a") == (True, 1) and c.get("c") == (True, 3)
+    assert c.evictions == 1
+
+
+def test_el_nivel_en_disco_se_abre_recien_al_usarlo_y_promueve_a_memoria(tmp_path, reloj):
+    path = tmp_path / "sub" / "cache.sqlite3"
+    pedidos = []
+
+    def ruta() -> Path:
+        pedidos.append(1)
+        return path
+
+    c = TTLCache("barcode", ttl=100, path=ruta)
+    assert not pedidos and not path.exists()
+    c.set("123", {"nombre": "Yogur"})
+    assert pedidos == [1] and path.exists()
+
+    # Otra instancia (p. ej. otro proceso) con la memoria vacía lee del disco y promueve
+    otra = TTLCache("barcode", ttl=100, path=path)
+    assert otra.get("123") == (True, {"nombre": "Yogur"})
+    assert otra.get("123") == (True, {"nombre": "Yogur"})
+    assert otra.disk_hits == 1
+    # Las cachés que comparten archivo no se pisan: el nombre es el espacio de claves
+    assert TTLCache("search", path=path).get("123") == (False, None)
+
+    reloj[0] += 100
+    assert TTLCache("barcode", path=path).get("123") == (False, None)
+    assert _filas(path) == []
+
+
+def test_poda_vencidos_y_excedentes_cada_prune_every_escrituras(tmp_path, reloj, monkeypatch):
+    monkeypatch.setattr(cache, "PRUNE_EVERY", 10)
+    path = tmp_path / "cache.sqlite3"
+    disk = _DiskTier(path, max_entries=5)
+    ahora = reloj[0]
+    for i in range(3):
+        disk.put("t", f"vencida{i}", (ahora - 1, i))
+    for i in range(6):
+        disk.put("t", f"viva{i}", (ahora + 10 + i, i))
+    assert len(_filas(path)) == 9
+
+    # La décima escritura poda: los 3 vencidos y, de las 7 vivas, las 2 que vencen antes
+    disk.put("t", "viva6", (ahora + 100, 6))
+    assert [k for _, k in _filas(path)] == [f"viva{i}" for i in range(2, 7)]
+    assert disk.prune() == 0
+
+    # Al abrir el archivo también se purgan los vencidos
+    reloj[0] += 13
+    assert [k for _, k in _filas(path) if k in ("viva2", "viva3")] == ["viva2", "viva3"]
+    assert _DiskTier(path, max_entries=5).prune() == 0
+    assert [k for _, k in _filas(path)] == ["viva4", "viva5", "viva6"]
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from typing import List
+
+from app.core.food_index import FoodSearchIndex, normalize
+
+NOMBRES = [
+    "Lecha",             # similitud por trigramas con 'leche'
+    "Café conleche",     # subcadena
+    "Dulce de leche",    # prefijo de otra palabra
+    "Leche descremada",  # el nombre empieza con la consulta
+    "Leche",             # exacta
+    "Salmón",
+    "Pasta de maní",
+    "Maní tostado",
+    "Arroz yamaní",
+]
+
+
+def _buscar(index: FoodSearchIndex, q: str, **kw) -> List[str]:
+    return [NOMBRES[i] for i in index.search(q, **kw)]
+
+
+def test_niveles_de_ranking_en_orden():
+    index = FoodSearchIndex(NOMBRES)
+    assert _buscar(index, "leche") == ["Leche", "Leche descremada", "Dulce de leche", "Café conleche", "Lecha"]
+
+
+def test_consultas_sin_tildes_encuentran_nombres_con_tildes():
+    index = FoodSearchIndex(NOMBRES)
+    assert normalize("Salmón (fresco)") == "salmon fresco"
+    assert _buscar(index, "salmon") == ["Salmón"]
+    assert _buscar(index, "SALMÓN") == ["Salmón"]
+    assert _buscar(index, "mani") == ["Maní tostado", "Pasta de maní", "Arroz yamaní"]
+
+
+def test_palabras_cortas_buscan_por_subcadena():
+    index = FoodSearchIndex(NOMBRES)
+    assert "Café conleche" in _buscar(index, "nl")
+    assert _buscar(index, "xq") == []
+    assert set(_buscar(index, "z", limit=50)) == {"Arroz yamaní"}
+
+
+def test_las_paginas_siguientes_continuan_el_mismo_ranking():
+    nombres = [f"Yogur {sabor} {i}" for i in range(300) for sabor in ("frutilla", "vainilla")]
+    index = FoodSearchIndex(nombres)
+    completo = FoodSearchIndex(nombres).search("yog", limit=len(nombres))
+    paginas = [p for offset in range(0, len(nombres), 50) for p in index.search("yog", offset=offset, limit=50)]
+    assert paginas == completo
+    assert len(set(completo)) == len(nombres)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import gzip
+import json
+import re
+
+from app.api.nutrition_models import FoodItem
+from app.core import nutrition
+from app.core.assets import AssetStore, negotiate
+from app.core.httpcache import IMMUTABLE, REVALIDATE, accepted_encodings, etag_matches
+
+
+def test_comparacion_debil_de_etags_y_accept_encoding():
+    assert etag_matches('W/"abc"', '"abc"') and etag_matches('"abc"', 'W/"abc"')
+    assert etag_matches('"x", W/"abc"', 'W/"abc"') and etag_matches("*", '"abc"')
+    assert not etag_matches('"abcd"', '"abc"')
+    assert accepted_encodings("gzip;q=0, br, *;q=0.5") == {"gzip": 0.0, "br": 1.0, "*": 0.5}
+
+
+def test_assets_con_huella_variantes_y_304(tmp_path):
+    (tmp_path / "app.js").write_text("console.log('hola');\n" * 200, encoding="utf-8")
+    (tmp_path / "index.html").write_text('<script src="/static/app.js"></script>', encoding="utf-8")
+    store = AssetStore(tmp_path)
+    js = store.get("app.js")
+    html = store.get("index.html").variants[""][0].decode()
+    assert html == f'<script src="/static/app.js?v={js.version}"></script>'
+
+    status, body, headers = negotiate(js, {"accept-encoding": "gzip, deflate"}, immutable=True)
+    assert status == 200 and headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body) == js.variants[""][0]
+    assert headers["Cache-Control"] == IMMUTABLE and headers["Vary"] == "Accept-Encoding"
+
+    # Cada variante tiene su ETag: el 304 sólo vale para la representación que el cliente tiene
+    assert negotiate(js, {"accept-encoding": "gzip", "if-none-match": headers["ETag"]})[0] == 304
+    status, body, plain = negotiate(js, {"accept-encoding": "gzip;q=0", "if-none-match": headers["ETag"]})
+    assert status == 200 and "Content-Encoding" not in plain and plain["Cache-Control"] == REVALIDATE
+
+
+def test_frontend_responde_304_y_cachea_inmutable_con_huella(cliente):
+    r = cliente.get("/", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200 and r.headers["content-encoding"] == "gzip"
+    assert r.headers["cache-control"] == REVALIDATE
+    r304 = cliente.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": r.headers["etag"]})
+    assert r304.status_code == 304 and r304.content == b""
+
+    img = re.search(r"/static/images/barbell\.jpg\?v=\w+", r.text).group(0)
+    r = cliente.get(img)
+    assert r.status_code == 200 and r.headers["cache-control"] == IMMUTABLE
+    assert cliente.get("/static/images/barbell.jpg").headers["cache-control"] == REVALIDATE
+    assert cliente.get("/static/no-existe.js").status_code == 404
+
+
+def _paginas() -> list:
+    return [k[0] for k in nutrition._catalog.refresh().pages]
+
+
+def test_las_paginas_de_foods_son_un_lru_de_max_cached_food_pages(cliente, monkeypatch):
+    monkeypatch.setattr(nutrition, "MAX_CACHED_FOOD_PAGES", 3)
+    primeras = {q: cliente.get("/foods", params={"query": q}).content for q in ("arroz", "pan", "leche")}
+    assert _paginas() == ["arroz", "pan", "leche"]
+
+    # Un acierto pasa al final: al desbordar se descarta la menos usada, no la más vieja
+    assert cliente.get("/foods", params={"query": "arroz"}).content == primeras["arroz"]
+    assert _paginas() == ["pan", "leche", "arroz"]
+    cliente.get("/foods", params={"query": "avena"})
+    assert _paginas() == ["leche", "arroz", "avena"]
+
+    # La página descartada se vuelve a armar igual, y coincide con serializar los modelos
+    assert cliente.get("/foods", params={"query": "pan"}).content == primeras["pan"]
+    items, _ = nutrition.search_foods_page("pan")
+    assert json.loads(primeras["pan"]) == [FoodItem(**i).model_dump() for i in items]
+    assert len(_paginas()) == 3
+
+
+def _etag(cliente, url: str, **params) -> str:
+    r = cliente.get(url, params=params)
+    assert r.status_code == 200
+    return r.headers["etag"]
+
+
+def _condicional(cliente, url: str, etag: str, **params) -> int:
+    return cliente.get(url, params=params, headers={"If-None-Match": etag}).status_code
+
+
+def test_day_summary_responde_304_hasta_que_cambian_las_comidas_del_dia(cliente):
+    dia, otro = {"fecha": "2025-05-20"}, {"fecha": "2025-05-21"}
+    etag, etag_otro = _etag(cliente, "/day-summary", **dia), _etag(cliente, "/day-summary", **otro)
+    assert etag.startswith('W/"') and etag != etag_otro
+    r = cliente.get("/day-summary", params=dia, headers={"If-None-Match": etag})
+    assert r.status_code == 304 and r.content == b"" and r.headers["etag"] == etag
+    # Débil: identidad y gzip comparten la ETag
+    assert cliente.get("/day-summary", params=dia, headers={"Accept-Encoding": "identity"}).headers["etag"] == etag
+
+    alta = cliente.post("/meal", json={"alimento": "Avena", "cantidad_g": 60, "fecha": dia["fecha"]}).json()
+    assert _condicional(cliente, "/day-summary", etag, **dia) == 200
+    tras_alta = _etag(cliente, "/day-summary", **dia)
+    assert tras_alta != etag
+    assert _condicional(cliente, "/day-summary", tras_alta, **dia) == 304
+    # Los demás días no se invalidan
+    assert _condicional(cliente, "/day-summary", etag_otro, **otro) == 304
+
+    assert cliente.delete(f"/meal/{alta['entry']['id']}").json() == {"ok": True}
+    assert _condicional(cliente, "/day-summary", tras_alta, **dia) == 200
+    assert _etag(cliente, "/day-summary", **dia) not in (etag, tras_alta)
+    assert _condicional(cliente, "/day-summary", etag_otro, **otro) == 304
+
+
+def test_foods_cambia_de_etag_cuando_cambia_el_catalogo(cliente, datos):
+    etag = _etag(cliente, "/foods", query="arroz")
+    assert etag == f'W/"{nutrition.catalog_version()}"'
+    assert _condicional(cliente, "/foods", etag, query="arroz") == 304
+    # La versión es del catálogo entero: otra consulta también está al día
+    assert _condicional(cliente, "/foods", etag, query="pan") == 304
+
+    # Editar alimentos.csv a mano (sin pasar por la app) también cambia la ETag
+    csv_path = datos / "alimentos.csv"
+    csv_path.write_text(csv_path.read_text(encoding="utf-8") + "Arroz blanco cocido,131,2.7,28,0.3\n", encoding="utf-8")
+    assert _condicional(cliente, "/foods", etag, query="arroz") == 200
+    editado = _etag(cliente, "/foods", query="arroz")
+    assert editado != etag
+
+    nutrition.add_or_update_food("Arroz blanco cocido", 130, 2.7, 28, 0.3)
+    assert _condicional(cliente, "/foods", editado, query="arroz") == 200
+    assert _condicional(cliente, "/foods", _etag(cliente, "/foods", query="arroz"), query="arroz") == 304
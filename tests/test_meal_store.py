@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import random
+import threading
+import uuid
+from datetime import date
+
+import pytest
+
+from app.core.meal_store import MealStore
+
+DIAS = [date(2025, 1, d).isoformat() for d in range(1, 8)]
+
+
+def _fila(rng: random.Random, fecha: str) -> list:
+    cantidad = rng.randint(10, 400)
+    return [str(uuid.uuid4()), fecha, "Avena", float(cantidad),
+            round(cantidad * 3.89, 2), round(cantidad * 0.17, 2), round(cantidad * 0.66, 2), round(cantidad * 0.07, 2)]
+
+
+def _recalcular(store: MealStore) -> dict:
+    """Totales por día leyendo todas las particiones (sin el log incremental)."""
+    out = {}
+    for fecha in store.days():
+        rows = store.read_day(fecha)
+        if rows:
+            out[fecha] = [sum(float(r[h]) for r in rows) for h in ("kcal", "prot", "carb", "grasa")] + [len(rows)]
+    return out
+
+
+def _incrementales(store: MealStore) -> dict:
+    totales = store.daily_totals(date.fromisoformat(DIAS[0]), date.fromisoformat(DIAS[-1]))
+    return {fecha: vals for fecha, vals in totales if vals[4] > 0}
+
+
+def _iguales(a: dict, b: dict) -> None:
+    assert a.keys() == b.keys()
+    for fecha in a:
+        assert a[fecha][4] == b[fecha][4], fecha
+        assert a[fecha][:4] == pytest.approx(b[fecha][:4], abs=1e-6), fecha
+
+
+def _correr(errores: list, fn, *args) -> threading.Thread:
+    def target() -> None:
+        try:
+            fn(*args)
+        except BaseException as exc:  # se reporta en el hilo principal
+            errores.append(exc)
+
+    t = threading.Thread(target=target)
+    t.start()
+    return t
+
+
+def test_altas_bajas_y_compactacion_concurrentes_mantienen_los_totales(tmp_path):
+    store = MealStore(tmp_path / "comidas", durable=False)
+    vivos: list = []
+    vivos_lock = threading.Lock()
+    errores: list = []
+    stop = threading.Event()
+
+    def altas(seed: int) -> None:
+        rng = random.Random(seed)
+        for _ in range(60):
+            filas = [_fila(rng, rng.choice(DIAS)) for _ in range(rng.randint(1, 5))]
+            store.append(filas)
+            with vivos_lock:
+                vivos.extend(f[0] for f in filas)
+
+    def bajas(seed: int) -> None:
+        rng = random.Random(seed)
+        for _ in range(120):
+            with vivos_lock:
+                meal_id = vivos.pop(rng.randrange(len(vivos))) if vivos else None
+            if meal_id is not None:
+                assert store.remove(meal_id)
+
+    def compactar() -> None:
+        while not stop.is_set():
+            store.compact()
+
+    compactador = _correr(errores, compactar)
+    trabajo = [_correr(errores, altas, s) for s in range(4)] + [_correr(errores, bajas, 100 + s) for s in range(3)]
+    for t in trabajo:
+        t.join()
+    stop.set()
+    compactador.join()
+    assert not errores
+
+    # Las bajas ya hechas no vuelven y lo que quedó vivo está todo
+    guardados = {r["id"] for r in store.iter_all()}
+    assert guardados == set(vivos)
+    _iguales(_incrementales(store), _recalcular(store))
+
+    store.compact()
+    assert store.pending_tombstones() == 0
+    _iguales(_incrementales(store), _recalcular(store))
+
+    # Otra instancia (otro proceso) reconstruye lo mismo desde los logs
+    otro = MealStore(tmp_path / "comidas", durable=False)
+    assert {r["id"] for r in otro.iter_all()} == set(vivos)
+    _iguales(_incrementales(otro), _recalcular(store))
+
+
+def test_compactacion_en_otra_instancia_no_duplica_ni_pierde_filas(tmp_path):
+    a = MealStore(tmp_path / "comidas", durable=False)
+    b = MealStore(tmp_path / "comidas", durable=False)
+    rng = random.Random(7)
+    filas = [_fila(rng, rng.choice(DIAS)) for _ in range(200)]
+    a.append(filas[:100])
+    b.append(filas[100:])
+    for fila in filas[::3]:
+        assert (a if rng.random() < 0.5 else b).remove(fila[0])
+
+    errores: list = []
+    for t in [_correr(errores, s.compact) for s in (a, b)]:
+        t.join()
+    assert not errores
+
+    esperados = {f[0] for i, f in enumerate(filas) if i % 3}
+    for store in (a, b):
+        ids = [r["id"] for r in store.iter_all()]
+        assert len(ids) == len(set(ids))
+        assert set(ids) == esperados
+        _iguales(_incrementales(store), _recalcular(store))
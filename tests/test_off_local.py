@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import List
+
+from app.core import off_local
+
+
+def _producto(code: str, nombre: str, marca: str = "Granix") -> dict:
+    return {
+        "code": code,
+        "product_name": nombre,
+        "brands": marca,
+        "nutriments": {"energy-kcal_100g": 400, "proteins_100g": 8, "carbohydrates_100g": 70, "fat_100g": 10},
+    }
+
+
+def _export(path: Path, productos: List[dict]) -> Path:
+    path.write_text("".join(json.dumps(p) + "\n" for p in productos), encoding="utf-8")
+    return path
+
+
+def _tablas(db_path: Path) -> tuple:
+    with sqlite3.connect(str(db_path)) as db:
+        return (
+            db.execute("SELECT * FROM products ORDER BY barcode").fetchall(),
+            db.execute("SELECT * FROM tokens ORDER BY barcode, token").fetchall(),
+        )
+
+
+def _codigos(query: str) -> List[str]:
+    return sorted(p["barcode"] for p in off_local.search(query, limit=10))
+
+
+def test_sin_off_local_db_la_base_va_en_el_directorio_de_datos(tmp_path, monkeypatch):
+    monkeypatch.delenv("OFF_LOCAL_DB", raising=False)
+    monkeypatch.setenv("PI_DATA_DIR", str(tmp_path))
+    assert off_local.local_db_path() == tmp_path.resolve() / "off_products.sqlite3"
+
+
+def test_importar_dos_veces_el_mismo_export_da_la_misma_base(tmp_path, monkeypatch):
+    db_path = tmp_path / "off.sqlite3"
+    monkeypatch.setenv("OFF_LOCAL_DB", str(db_path))
+    dump = _export(tmp_path / "off.jsonl", [_producto("1", "Galletitas de avena"), _producto("2", "Barra de cereal")])
+
+    assert off_local.import_dump(dump) == {"read": 2, "imported": 2}
+    primera = _tablas(db_path)
+    off_local.import_dump(dump, batch_size=1)
+    assert _tablas(db_path) == primera
+    assert _codigos("avena") == ["1"]
+    assert _codigos("granix") == ["1", "2"]
+
+
+def test_un_producto_renombrado_no_conserva_los_tokens_del_nombre_viejo(tmp_path, monkeypatch):
+    db_path = tmp_path / "off.sqlite3"
+    monkeypatch.setenv("OFF_LOCAL_DB", str(db_path))
+    # El mismo código dos veces en el export, en lotes distintos y en el mismo lote
+    productos = [_producto("1", "Galletitas de avena"), _producto("2", "Yogur"), _producto("1", "Barra de chocolate")]
+    for batch_size in (1, 5000):
+        off_local.import_dump(_export(tmp_path / "off.jsonl", productos), batch_size=batch_size)
+        assert _codigos("galletitas") == []
+        assert _codigos("avena") == []
+        assert _codigos("chocolate") == ["1"]
+        assert off_local.lookup_barcode("1")["nombre"] == "Barra de chocolate"
+        tokens = _tablas(db_path)[1]
+        assert sorted(t for t, code in tokens if code == "1") == ["barra", "chocolate", "de", "granix"]
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from app.core.planning import recomendar_lote, simular
+from app.core.progression import recomendar_proximo_peso
+
+SEED = 20240917
+
+
+def _pesos(rng: np.random.Generator, n: int) -> np.ndarray:
+    # Mezcla de pesos de gimnasio, valores con 3 decimales (empates de redondeo) y extremos
+    return np.concatenate([
+        rng.integers(1, 200, n) * 2.5,
+        np.round(rng.uniform(0.001, 300, n), 3),
+        np.round(rng.integers(1, 30000, n) / 100 + 0.005, 3),
+        rng.uniform(1e-3, 1e4, n),
+    ])
+
+
+def test_recomendar_lote_coincide_con_la_regla_escalar():
+    rng = np.random.default_rng(SEED)
+    pesos = _pesos(rng, 5000)
+    reps = rng.integers(1, 16, pesos.size)
+    rpe = rng.integers(1, 11, pesos.size)
+    out = recomendar_lote(pesos, reps, rpe)
+    esperado = [recomendar_proximo_peso(float(p), int(r), int(e)) for p, r, e in zip(pesos, reps, rpe)]
+    assert out.tolist() == esperado
+
+
+def test_recomendar_lote_cubre_toda_la_tabla_con_broadcasting():
+    reps = np.arange(1, 16)[:, None]
+    rpe = np.arange(1, 11)[None, :]
+    out = recomendar_lote(102.5, reps, rpe)
+    assert out.shape == (15, 10)
+    for i, r in enumerate(range(1, 16)):
+        for j, e in enumerate(range(1, 11)):
+            assert out[i, j] == recomendar_proximo_peso(102.5, r, e)
+
+
+def _por_semana(plan: object, forma: tuple) -> np.ndarray:
+    arr = np.asarray(plan)
+    return np.broadcast_to(arr[:, None] if arr.ndim == 1 else arr, forma)
+
+
+@pytest.mark.parametrize("forma_plan", ["escalar", "por_escenario", "por_semana"])
+def test_simular_coincide_con_aplicar_la_regla_semana_a_semana(forma_plan):
+    rng = np.random.default_rng(SEED + 1)
+    semanas = 12
+    pesos = _pesos(rng, 50)
+    if forma_plan == "escalar":
+        reps, rpe = 10, 8
+    elif forma_plan == "por_escenario":
+        reps, rpe = rng.integers(1, 16, pesos.size), rng.integers(1, 11, pesos.size)
+    else:
+        reps = rng.integers(1, 16, (pesos.size, semanas))
+        rpe = rng.integers(1, 11, (pesos.size, semanas))
+    out = simular(pesos, reps, rpe, semanas)
+    assert out.shape == (pesos.size, semanas + 1)
+
+    r_plan, e_plan = (_por_semana(plan, out[:, 1:].shape) for plan in (reps, rpe))
+    for s, p0 in enumerate(pesos):
+        esperado = [float(p0)]
+        for k in range(semanas):
+            esperado.append(recomendar_proximo_peso(esperado[-1], int(r_plan[s, k]), int(e_plan[s, k])))
+        assert out[s].tolist() == esperado, s
+
+
+def test_entradas_invalidas():
+    with pytest.raises(ValueError):
+        recomendar_lote([100.0, 0.0], 8, 8)
+    with pytest.raises(ValueError):
+        recomendar_lote(100.0, 0, 8)
+    with pytest.raises(ValueError):
+        recomendar_lote(100.0, 8, 11)
+    with pytest.raises(ValueError):
+        simular([100.0], 8, 8, 0)
+    with pytest.raises(ValueError):
+        simular([100.0, 90.0], [8, 8, 8], 8, 4)
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from pathlib import Path
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.profiler import ProfilerMiddleware
+
+
+def _trabajo_en_hilo(segundos: float = 0.2) -> int:
+    fin, n = time.perf_counter() + segundos, 0
+    while time.perf_counter() < fin:
+        n += 1
+    return n
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/hilo")
+    async def hilo() -> dict:
+        return {"n": await asyncio.to_thread(_trabajo_en_hilo)}
+
+    @app.get("/sincrono")
+    def sincrono() -> dict:
+        return {"n": _trabajo_en_hilo()}
+
+    return app
+
+
+def _pilas(out: Path, ruta: str) -> List[str]:
+    (archivo,) = (out / ruta).iterdir()
+    return [linea.rsplit(" ", 1)[0] for linea in archivo.read_text(encoding="utf-8").splitlines()]
+
+
+def test_el_trabajo_en_to_thread_aparece_bajo_el_await_del_request(tmp_path):
+    app = ProfilerMiddleware(_app(), rate=1.0, out=tmp_path, interval_ms=1)
+    with TestClient(app) as cliente:
+        assert cliente.get("/hilo").status_code == 200
+        assert cliente.get("/sincrono").status_code == 200
+
+    for ruta in ("hilo", "sincrono"):
+        en_hilo = [p for p in _pilas(tmp_path, ruta) if "_trabajo_en_hilo" in p]
+        assert en_hilo, ruta
+        # La pila del hilo cuelga del request: middleware → … → <thread> → … → trabajo
+        for pila in en_hilo:
+            marcos = pila.split(";")
+            assert marcos[0].startswith("__call__ (app/core/profiler.py")
+            assert marcos.index("<thread>") < marcos.index(next(m for m in marcos if m.startswith("_trabajo_en_hilo")))
+        if ruta == "hilo":
+            # El await del endpoint queda arriba del hilo, en lugar de un `<await Future>` opaco
+            assert all("hilo (tests/test_profiler.py" in p and "<await" not in p for p in en_hilo)
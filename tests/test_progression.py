@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import csv
+import random
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+from app.core import progression
+from app.core.progression import _Serie
+
+BASE = date(2025, 3, 1).toordinal()
+
+
+def _recalcular(filas: List[Tuple[int, int]], desde: int) -> Optional[float]:
+    """Promedio de reps desde `desde` recorriendo todas las filas (sin ventana móvil)."""
+    reps = [r for ordinal, r in filas if ordinal >= desde]
+    return round(sum(reps) / len(reps), 2) if reps else None
+
+
+def test_ventana_movil_coincide_con_recalcular_todo():
+    rng = random.Random(7)
+    for _ in range(20):
+        serie = _Serie()
+        filas: List[Tuple[int, int]] = []
+        hoy = BASE
+        desde = BASE - 7
+        for _ in range(400):
+            accion = rng.random()
+            if accion < 0.5:
+                # Casi siempre en orden; a veces una fila vieja (antes o dentro de la ventana)
+                ordinal = hoy if rng.random() < 0.8 else hoy - rng.randint(0, 20)
+                reps = rng.randint(1, 15)
+                serie.agregar(ordinal, 100.0, reps)
+                filas.append((ordinal, reps))
+            elif accion < 0.6:
+                hoy += rng.randint(1, 3)
+            else:
+                # El corte casi siempre avanza; a veces retrocede o cae justo en el borde de una fila
+                if filas and rng.random() < 0.3:
+                    desde = rng.choice(filas)[0] + rng.choice((0, 1))
+                elif rng.random() < 0.1:
+                    desde -= rng.randint(1, 10)
+                else:
+                    desde = max(desde, hoy - 7)
+                assert serie.promedio_desde(desde) == _recalcular(filas, desde), (desde, filas)
+        assert serie.fechas == sorted(serie.fechas)
+        assert serie.reps_acum[-1] == sum(r for _, r in filas)
+
+
+def test_promedio_semanal_del_historial_coincide_con_recalcular(tmp_path, monkeypatch):
+    monkeypatch.setenv("PI_FSYNC", "0")
+    path = tmp_path / "historial.csv"
+    hoy = date.today()
+    rng = random.Random(11)
+    filas: List[Tuple[str, int, int]] = []
+
+    def esperado(ejercicio: str) -> Optional[float]:
+        return _recalcular([(o, r) for e, o, r in filas if e == ejercicio], (hoy - timedelta(days=7)).toordinal())
+
+    for ronda in range(30):
+        lote = []
+        for _ in range(rng.randint(1, 5)):
+            # Incluye los bordes de la ventana: hace 7 días entra, hace 8 no
+            dias = rng.choice((0, 1, 6, 7, 8, 30, rng.randint(0, 40)))
+            ejercicio = rng.choice(("Sentadilla", "Press banca"))
+            lote.append((ejercicio, 100.0, rng.randint(1, 12), hoy - timedelta(days=dias)))
+        if ronda % 3 == 2:
+            # Otro proceso agrega filas directo al archivo: se leen sólo al sincronizar la cola
+            with path.open("a", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerows([e, f"{p}", r, d.isoformat()] for e, p, r, d in lote)
+        else:
+            progression.registrar_lote(lote, path=path)
+        filas.extend((e, d.toordinal(), r) for e, _, r, d in lote)
+        for ejercicio in ("Sentadilla", "Press banca", "Dominadas"):
+            assert progression.promedio_reps_semana(ejercicio, path=path) == esperado(ejercicio)
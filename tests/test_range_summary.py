@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from typing import Dict, List
+
+import pytest
+from fastapi.testclient import TestClient
+
+MACROS = ("kcal", "prot", "carb", "grasa")
+
+
+def _comer(cliente: TestClient, fecha: str, alimento: str, gramos: float) -> Dict[str, object]:
+    r = cliente.post("/meal", json={"alimento": alimento, "cantidad_g": gramos, "fecha": fecha})
+    assert r.json()["ok"], r.json()
+    return r.json()["entry"]
+
+
+def _rango(cliente: TestClient, desde: str, hasta: str) -> Dict[str, object]:
+    r = cliente.get("/range-summary", params={"from": desde, "to": hasta})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _sumar(entries: List[Dict[str, object]]) -> Dict[str, float]:
+    return {m: sum(float(e[m]) for e in entries) for m in MACROS}
+
+
+def test_rango_sin_comidas(cliente):
+    out = _rango(cliente, "2025-01-01", "2025-01-03")
+    assert (out["desde"], out["hasta"], out["comidas"]) == ("2025-01-01", "2025-01-03", 0)
+    assert [out[m] for m in MACROS] == [0, 0, 0, 0]
+    assert [d["fecha"] for d in out["dias"]] == ["2025-01-01", "2025-01-02", "2025-01-03"]
+    assert all(d["comidas"] == 0 and d["kcal"] == 0 for d in out["dias"])
+
+
+def test_un_solo_dia(cliente):
+    del_dia = [_comer(cliente, "2025-03-10", "Avena", 80), _comer(cliente, "2025-03-10", "Banana", 120)]
+    _comer(cliente, "2025-03-11", "Avena", 50)
+    out = _rango(cliente, "2025-03-10", "2025-03-10")
+    assert out["comidas"] == 2 and len(out["dias"]) == 1
+    esperado = _sumar(del_dia)
+    for m in MACROS:
+        assert out[m] == pytest.approx(esperado[m], abs=0.01)
+        assert out["dias"][0][m] == pytest.approx(esperado[m], abs=0.01)
+
+
+def test_rango_que_cruza_particiones_de_mes(cliente):
+    enero = [_comer(cliente, "2025-01-31", "Avena", 100), _comer(cliente, "2025-01-31", "Huevo (entero)", 60)]
+    febrero = [_comer(cliente, "2025-02-01", "Banana", 150)]
+    fuera = _comer(cliente, "2025-02-03", "Avena", 40)
+
+    out = _rango(cliente, "2025-01-30", "2025-02-02")
+    assert [(d["fecha"], d["comidas"]) for d in out["dias"]] == [
+        ("2025-01-30", 0), ("2025-01-31", 2), ("2025-02-01", 1), ("2025-02-02", 0),
+    ]
+    esperado = _sumar(enero + febrero)
+    assert out["comidas"] == 3
+    for m in MACROS:
+        assert out[m] == pytest.approx(esperado[m], abs=0.01)
+
+    # Borrar descuenta del día y del total; lo de fuera del rango no cuenta
+    assert cliente.delete(f"/meal/{enero[0]['id']}").json() == {"ok": True}
+    out = _rango(cliente, "2025-01-30", "2025-02-03")
+    esperado = _sumar(enero[1:] + febrero + [fuera])
+    assert out["comidas"] == 3
+    for m in MACROS:
+        assert out[m] == pytest.approx(esperado[m], abs=0.01)
+
+
+def test_rango_invertido_o_fecha_invalida(cliente):
+    assert cliente.get("/range-summary", params={"from": "2025-02-02", "to": "2025-02-01"}).status_code == 400
+    assert cliente.get("/range-summary", params={"from": "ayer", "to": "2025-02-01"}).status_code == 400
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, List, Optional
+
+import pytest
+
+from app.core import nutrition
+from app.core.cache import TTLCache
+from app.core.nutrition import _SingleFlight
+
+N = 50
+
+
+class _Upstream:
+    """Llamada lenta que cuenta cuántas veces se ejecutó; responde cuando se la suelta."""
+
+    def __init__(self, resultado: Any = None, error: Optional[Exception] = None) -> None:
+        self.llamadas = 0
+        self.soltar = asyncio.Event()
+        self.resultado = resultado
+        self.error = error
+
+    async def __call__(self) -> Any:
+        self.llamadas += 1
+        await self.soltar.wait()
+        if self.error is not None:
+            raise self.error
+        return self.resultado
+
+
+async def _en_vuelo(flight: _SingleFlight, key: str, upstream: _Upstream, n: int = N) -> List[asyncio.Task]:
+    tareas = [asyncio.ensure_future(flight.do(key, upstream)) for _ in range(n)]
+    await asyncio.sleep(0)
+    return tareas
+
+
+async def _soltado(upstream: _Upstream) -> Any:
+    upstream.soltar.set()
+    return await upstream()
+
+
+def test_n_pedidos_concurrentes_hacen_una_sola_llamada():
+    async def escenario() -> None:
+        flight = _SingleFlight()
+        upstream = _Upstream({"nombre": "Yogur"})
+        tareas = await _en_vuelo(flight, "barcode:1", upstream)
+        # Otra clave no espera a la que está en vuelo
+        otra = _Upstream("otro")
+        assert await asyncio.wait_for(flight.do("barcode:2", lambda: _soltado(otra)), 5) == "otro"
+        upstream.soltar.set()
+        resultados = await asyncio.wait_for(asyncio.gather(*tareas), 5)
+        assert resultados == [{"nombre": "Yogur"}] * N
+        assert upstream.llamadas == 1
+        assert (flight.leaders, flight.followers) == (2, N - 1)
+        assert flight._inflight == {}
+
+        # Terminada la llamada, el próximo pedido vuelve a ir a upstream
+        upstream.soltar.set()
+        assert await flight.do("barcode:1", upstream) == {"nombre": "Yogur"}
+        assert upstream.llamadas == 2
+
+    asyncio.run(escenario())
+
+
+def test_el_error_llega_a_todos_los_que_esperan_y_no_queda_en_vuelo():
+    async def escenario() -> None:
+        flight = _SingleFlight()
+        upstream = _Upstream(error=ConnectionError("OFF caído"))
+        tareas = await _en_vuelo(flight, "search:avena|5", upstream)
+        upstream.soltar.set()
+        resultados = await asyncio.wait_for(asyncio.gather(*tareas, return_exceptions=True), 5)
+        assert all(isinstance(r, ConnectionError) for r in resultados)
+        assert upstream.llamadas == 1
+        assert flight._inflight == {}
+
+    asyncio.run(escenario())
+
+
+def test_cancelar_a_un_cliente_no_cancela_la_llamada_compartida():
+    async def escenario() -> None:
+        flight = _SingleFlight()
+        upstream = _Upstream(42)
+        tareas = await _en_vuelo(flight, "k", upstream, n=3)
+        tareas[0].cancel()
+        await asyncio.sleep(0)
+        upstream.soltar.set()
+        resultados = await asyncio.wait_for(asyncio.gather(*tareas, return_exceptions=True), 5)
+        assert isinstance(resultados[0], asyncio.CancelledError)
+        assert resultados[1:] == [42, 42]
+        assert upstream.llamadas == 1
+
+    asyncio.run(escenario())
+
+
+def test_lookups_concurrentes_del_mismo_codigo_van_una_vez_a_off(datos, monkeypatch):
+    monkeypatch.setattr(nutrition, "_barcode_cache", TTLCache("barcode"))
+    monkeypatch.setattr(nutrition, "_off_flight", _SingleFlight())
+    llamadas: List[str] = []
+
+    async def fetch(barcode: str) -> Optional[dict]:
+        llamadas.append(barcode)
+        await asyncio.sleep(0.05)
+        return None if barcode == "000" else {"barcode": barcode, "nombre": "Galletitas"}
+
+    monkeypatch.setattr(nutrition, "_off_fetch_barcode", fetch)
+
+    async def escenario() -> None:
+        res = await asyncio.gather(*(nutrition.off_lookup_barcode(c) for c in ["779"] * N + [" 000 "] * N))
+        assert res[:N] == [{"barcode": "779", "nombre": "Galletitas"}] * N
+        assert res[N:] == [None] * N
+        assert sorted(llamadas) == ["000", "779"]
+        # Ya cacheados (incluido el negativo): no vuelven a OFF
+        assert await nutrition.off_lookup_barcode("000") is None
+        assert await nutrition.off_lookup_barcode("779") == res[0]
+        assert len(llamadas) == 2
+
+    asyncio.run(escenario())
+
+
+@pytest.mark.parametrize("error", [ConnectionError("timeout"), ValueError("json inválido")])
+def test_un_error_de_red_no_se_cachea(datos, monkeypatch, error):
+    monkeypatch.setattr(nutrition, "_barcode_cache", TTLCache("barcode"))
+    monkeypatch.setattr(nutrition, "_off_flight", _SingleFlight())
+    llamadas: List[str] = []
+
+    async def fetch(barcode: str) -> Optional[dict]:
+        llamadas.append(barcode)
+        await asyncio.sleep(0.01)
+        raise error
+
+    monkeypatch.setattr(nutrition, "_off_fetch_barcode", fetch)
+
+    async def escenario() -> None:
+        assert await asyncio.gather(*(nutrition.off_lookup_barcode("779") for _ in range(10))) == [None] * 10
+        assert await nutrition.off_lookup_barcode("779") is None
+        assert len(llamadas) == 2
+
+    asyncio.run(escenario())
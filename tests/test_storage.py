@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from datetime import date
+from typing import Dict, Iterable, List
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import nutrition, progression, storage
+from app.core.meal_store import MEALS_HEADERS, MealStore
+from benchmarks.generate import EJERCICIOS, generate
+
+DESDE, HASTA = date(2021, 1, 1), date(2025, 12, 31)
+
+
+def _comidas(rows: Iterable[Dict[str, str]]) -> List[tuple]:
+    return sorted((r["id"], r["fecha"], r["alimento"], *(float(r[h]) for h in MEALS_HEADERS[3:])) for r in rows)
+
+
+def _sesiones(rows: Iterable[Dict[str, str]]) -> List[tuple]:
+    return sorted((r["ejercicio"], float(r["peso_actual"]), int(r["reps"]), r["fecha"]) for r in rows)
+
+
+def _contar(db: storage.SQLiteDatabase) -> tuple:
+    conn = db.conn()
+    return tuple(conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in ("comidas", "sesiones"))
+
+
+def _abrir_sqlite(monkeypatch: pytest.MonkeyPatch) -> tuple:
+    """Abre el shard por defecto con PI_STORAGE=sqlite, como al arrancar un proceso nuevo."""
+    monkeypatch.setenv("PI_STORAGE", "sqlite")
+    monkeypatch.setattr(storage, "_dbs", {})
+    monkeypatch.setattr(nutrition, "_meals_stores", {})
+    monkeypatch.setattr(progression, "_sqlite_repos", {})
+    meals = nutrition.prepare_meals_storage()
+    progression.prepare_historial()
+    sesiones = progression._repo()
+    assert isinstance(meals, storage.SQLiteMeals) and isinstance(sesiones, storage.SQLiteSessions)
+    return meals, sesiones
+
+
+def test_importa_los_csv_una_sola_vez_y_coinciden(datos, monkeypatch):
+    generate(datos, 500)
+    meals, sesiones = _abrir_sqlite(monkeypatch)
+
+    csv_meals = MealStore(nutrition.meals_dir())
+    csv_sesiones = progression._store_para(progression.historial_path())
+    assert _comidas(meals.iter_all()) == _comidas(csv_meals.iter_all())
+    assert len(_comidas(meals.iter_all())) == 500
+    assert _sesiones(sesiones.iter_rows()) == _sesiones(csv_sesiones.iter_rows())
+    for ejercicio in EJERCICIOS:
+        fechas, pesos, reps = sesiones.serie(ejercicio)
+        csv_fechas, csv_pesos, csv_reps = csv_sesiones.serie(ejercicio)
+        assert fechas == csv_fechas
+        # Mismo día: el orden entre filas puede variar, el contenido no
+        assert sorted(zip(fechas, pesos, reps)) == sorted(zip(csv_fechas, csv_pesos, csv_reps))
+        assert sesiones.promedio_reps_desde(ejercicio, date(2025, 6, 1)) == csv_sesiones.promedio_reps_desde(
+            ejercicio, date(2025, 6, 1)
+        )
+    for (fecha, vals), (csv_fecha, csv_vals) in zip(
+        meals.daily_totals(DESDE, HASTA), csv_meals.daily_totals(DESDE, HASTA)
+    ):
+        assert fecha == csv_fecha
+        assert vals == pytest.approx(csv_vals, abs=1e-6), fecha
+
+    # import_once es idempotente: ni repetirlo ni reabrir la base vuelve a importar
+    db = meals.db
+    antes = _contar(db)
+    storage.import_rows(db, "import:comidas", meals, ([r.get(h, "") for h in MEALS_HEADERS] for r in csv_meals.iter_all()))
+    assert _contar(db) == antes
+    meals, _ = _abrir_sqlite(monkeypatch)
+    assert meals.db is not db
+    assert _contar(meals.db) == antes == (500, 500)
+
+
+def test_alta_y_baja_de_comidas_con_sqlite(datos, monkeypatch):
+    monkeypatch.setenv("PI_STORAGE", "sqlite")
+    from app.main import app
+
+    with TestClient(app) as cliente:
+        ids = [
+            cliente.post("/meal", json={"alimento": "Avena", "cantidad_g": g, "fecha": "2025-04-02"}).json()["entry"]["id"]
+            for g in (50, 80)
+        ]
+        assert isinstance(nutrition._meals(), storage.SQLiteMeals)
+        assert cliente.delete(f"/meal/{ids[0]}").json() == {"ok": True}
+        assert cliente.delete(f"/meal/{ids[0]}").json() == {"ok": False}
+
+        dia = cliente.get("/day-summary", params={"fecha": "2025-04-02"}).json()
+        assert [c["id"] for c in dia["comidas"]] == [ids[1]]
+        rango = cliente.get("/range-summary", params={"from": "2025-04-02", "to": "2025-04-02"}).json()
+        assert rango["comidas"] == 1
+        assert rango["kcal"] == pytest.approx(dia["kcal"])
+    db = storage.sqlite_database(storage.sqlite_path())
+    assert db.conn().execute("SELECT id FROM comidas").fetchall() == [(ids[1],)]
+    # Con SQLite no se escriben particiones CSV
+    assert not nutrition.meals_dir().exists()
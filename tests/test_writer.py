@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import Counter
+from typing import Any, List
+
+import pytest
+
+from app.core import writer
+from app.core.writer import GroupCommitWriter, WriterStopped
+
+
+class _Sink:
+    """Destino en memoria que registra cada lote (como un append + fsync)."""
+
+    def __init__(self, falla_con: Any = None) -> None:
+        self.lotes: List[List[Any]] = []
+        self.falla_con = falla_con
+        self._lock = threading.Lock()
+
+    def write_batch(self, rows: List[Any]) -> None:
+        time.sleep(0.001)
+        if self.falla_con is not None and self.falla_con in rows:
+            raise ValueError("fila rechazada")
+        with self._lock:
+            self.lotes.append(list(rows))
+
+    @property
+    def filas(self) -> List[Any]:
+        return [r for lote in self.lotes for r in lote]
+
+
+def _correr(coro_fn) -> Any:
+    async def main() -> Any:
+        w = GroupCommitWriter()
+        w.start()
+        try:
+            return await asyncio.wait_for(coro_fn(w), timeout=10)
+        finally:
+            await asyncio.wait_for(w.stop(), timeout=10)
+
+    return asyncio.run(main())
+
+
+def test_envios_concurrentes_se_escriben_una_sola_vez_y_en_orden():
+    sinks = [_Sink(), _Sink()]
+    exclusivas: List[int] = []
+
+    async def cliente(w: GroupCommitWriter, n: int) -> int:
+        for i in range(25):
+            await w.append(sinks[(n + i) % 2], [(n, i)])
+            if i % 10 == 0:
+                await w.run(lambda: exclusivas.append(n))
+        return n
+
+    async def escenario(w: GroupCommitWriter) -> List[int]:
+        return await asyncio.gather(*(cliente(w, n) for n in range(40)))
+
+    assert _correr(escenario) == list(range(40))
+
+    filas = sinks[0].filas + sinks[1].filas
+    assert Counter(filas) == Counter((n, i) for n in range(40) for i in range(25))
+    for sink in sinks:
+        for n in range(40):
+            # Cada cliente espera su future antes de seguir: sus filas quedan en orden
+            propias = [i for (m, i) in sink.filas if m == n]
+            assert propias == sorted(propias)
+    assert Counter(exclusivas) == Counter({n: 3 for n in range(40)})
+    # Hubo commit grupal: menos lotes que filas
+    assert sum(len(s.lotes) for s in sinks) < len(filas)
+
+
+def test_un_lote_que_falla_no_afecta_a_los_demas_destinos():
+    malo, bueno = _Sink(falla_con="x"), _Sink()
+
+    async def escenario(w: GroupCommitWriter) -> list:
+        return await asyncio.gather(
+            w.append(malo, ["x"]), w.append(bueno, ["ok"]), w.run(lambda: 42), return_exceptions=True
+        )
+
+    res = _correr(escenario)
+    assert isinstance(res[0], ValueError)
+    assert res[1:] == [None, 42]
+    assert bueno.filas == ["ok"]
+
+
+def test_si_el_writer_muere_ningun_future_queda_colgado(monkeypatch):
+    sink = _Sink()
+    commits = 0
+    original = writer._commit_group
+
+    def commit_group(group):
+        nonlocal commits
+        commits += 1
+        if commits == 2:
+            raise MemoryError("falla inesperada")
+        return original(group)
+
+    monkeypatch.setattr(writer, "_commit_group", commit_group)
+    # Grupos chicos: al morir hay un grupo en curso y el resto todavía en la cola
+    monkeypatch.setattr(writer, "MAX_GROUP", 5)
+
+    async def escenario(w: GroupCommitWriter) -> None:
+        await w.append(sink, [0])
+        res = await asyncio.gather(*(w.append(sink, [i]) for i in range(1, 50)), return_exceptions=True)
+        assert all(isinstance(r, WriterStopped) for r in res)
+        assert isinstance(res[0].__cause__, MemoryError)
+        assert not w.running and isinstance(w.failure, MemoryError)
+        with pytest.raises(WriterStopped):
+            await w.append(sink, [99])
+        with pytest.raises(WriterStopped):
+            await w.run(lambda: None)
+
+    _correr(escenario)
+    assert sink.filas == [0]
+
+
+def test_submit_falla_rapido_con_el_writer_del_proceso_caido(monkeypatch):
+    w = GroupCommitWriter()
+    w.failure = RuntimeError("murió")
+    monkeypatch.setattr(writer, "_writer", w)
+
+    async def escenario() -> None:
+        with pytest.raises(WriterStopped):
+            await writer.submit_append(_Sink(), [1])
+        with pytest.raises(WriterStopped):
+            await writer.submit_exclusive(lambda: None)
+
+    asyncio.run(escenario())